@@ -0,0 +1,71 @@
+"""Benchmark：GET /api/books/ 深層分頁的延遲（頁碼 vs ?cursor=）。
+
+    cd backend && python benchmarks/bench_book_pagination.py --books 200000
+
+透過 API 走 BookViewSet：頁碼模式每頁都做 OFFSET + COUNT(*)，cursor 模式以
+(title, id) keyset 接續，量測不同深度的單頁延遲。
+"""
+import argparse
+import random
+import statistics
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+CJK = "天地玄黃宇宙洪荒日月盈昃辰宿列張寒來暑往秋收冬藏閏餘成歲律呂調陽雲騰致雨露結為霜金生麗水玉出崑岡"
+
+
+def seed(n_books: int) -> None:
+    from books.models import Book
+
+    rnd = random.Random(7)
+    for start in range(0, n_books, 5000):
+        Book.objects.bulk_create(
+            Book(title="".join(rnd.choices(CJK, k=rnd.randint(2, 6))), author=f"Writer{i:06d}")
+            for i in range(start, min(start + 5000, n_books))
+        )
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        fn()
+        samples.append((perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django("book_pagination")
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    seed(args.books)
+    client = Client()
+    url = "/api/books/"
+
+    # 先以 cursor 走到各深度，記下該頁的 cursor 連結
+    depths = [1, 10, 100, 1000, args.books // args.page_size // 2]
+    links = {}
+    link, page = f"{url}?cursor=&page_size={args.page_size}", 1
+    while link and page <= max(depths):
+        if page in depths:
+            links[page] = link
+        link = client.get(link).json()["next"]
+        page += 1
+
+    for depth in depths:
+        offset_ms = timed(lambda: client.get(url, {"page": depth, "page_size": args.page_size}), args.repeat)
+        cursor_ms = timed(lambda: client.get(links[depth]), args.repeat) if depth in links else float("nan")
+        print(f"page {depth:>6}   page-number {offset_ms:8.2f} ms   cursor {cursor_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark：GET /api/books/?query= 的全文檢索延遲。
+
+    cd backend && python benchmarks/bench_book_search.py --books 1000000
+
+以隨機中英文書名灌入書籍後，比較資料庫全文索引（search_books）、行程內倒排索引
+（books.catalog_index）與舊的 icontains 查詢，量測「取第一頁 + count」的延遲。
+"""
+import argparse
+import random
+import statistics
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+CJK = "天地玄黃宇宙洪荒日月盈昃辰宿列張寒來暑往秋收冬藏閏餘成歲律呂調陽雲騰致雨露結為霜金生麗水玉出崑岡"
+LATIN = ["history", "science", "galaxy", "library", "python", "django", "garden", "ocean",
+         "music", "theory", "design", "atlas", "journey", "mystery", "kitchen", "planet"]
+
+
+def seed(n_books: int) -> None:
+    from books.models import Book, Category
+    from books.search import build_document
+
+    rnd = random.Random(7)
+    categories = [Category.objects.create(name=f"分類{i:02d}") for i in range(40)]
+    for start in range(0, n_books, 5000):
+        rows = []
+        for i in range(start, min(start + 5000, n_books)):
+            title = "".join(rnd.choices(CJK, k=rnd.randint(4, 10))) + " " + " ".join(rnd.choices(LATIN, k=2))
+            author = f"{rnd.choice(LATIN).title()} Writer{i % 5000:04d}"
+            category = rnd.choice(categories)
+            rows.append(Book(title=title, author=author, category=category,
+                             search_document=build_document(title, author, category.name)))
+        Book.objects.bulk_create(rows)
+
+    from books.fuzzy import rebuild_trigrams, uses_database_trigrams
+    from books.models import BookTrigram
+
+    if not uses_database_trigrams("default"):
+        from django.db import transaction
+
+        with transaction.atomic():
+            rebuild_trigrams(Book.objects.values_list("id", "title", "author").iterator(), BookTrigram)
+
+
+def timed(fn, repeat: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        fn()
+        samples.append((perf_counter() - t0) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django("book_search")
+    from books.models import Book
+    from books.fuzzy import fuzzy_search
+    from books.search import _icontains, search_books
+
+    t0 = perf_counter()
+    seed(args.books)
+    print(f"seeded {args.books} books in {perf_counter() - t0:.1f}s")
+
+    base = Book.objects.select_related("category")
+
+    def page(qs):
+        def run():
+            list(qs.order_by("-search_rank", "title")[:10])
+            qs.count()
+        return run
+
+    cases = {
+        "fts rare (CJK+code)": page(search_books(base, "玄黃 writer0042")),
+        "fts prefix (histor)": page(search_books(base, "histor")),
+        "fts common (galaxy)": page(search_books(base, "galaxy")),
+        "icontains (玄黃)": page(_icontains(base, "玄黃")),
+        "fuzzy typo (Writr0042)": page(fuzzy_search(base, "Writr0042")),
+    }
+    from books.catalog_index import get_index
+
+    t0 = perf_counter()
+    index = get_index()
+    print(f"loaded memory index ({len(index)} books) in {perf_counter() - t0:.1f}s")
+    cases.update({
+        "memory rare (CJK+code)": lambda: index.search(["玄黃", "writer0042"], 1000),
+        "memory prefix (histor)": lambda: index.search(["histor"], 1000),
+    })
+    for name, fn in cases.items():
+        fn()
+        median, worst = timed(fn, args.repeat)
+        print(f"{name:<22} median {median:8.1f} ms   max {worst:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
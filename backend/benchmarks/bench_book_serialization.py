@@ -0,0 +1,68 @@
+"""Benchmark：書籍列表一頁的序列化成本（BookSerializer vs values_list + row mapper）。
+
+    cd backend && python benchmarks/bench_book_serialization.py --books 20000 --page-size 100
+
+同一頁資料分別以 BookSerializer(many=True) 與 books.views.book_list_rows()（一般列表的快速
+路徑）轉成 dict，量測「查詢 + 轉換」的延遲，並確認兩者輸出相同。
+"""
+import argparse
+import random
+import statistics
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+
+def seed(n_books: int) -> None:
+    from books.models import Book, Category
+
+    rnd = random.Random(7)
+    categories = [Category.objects.create(name=f"分類{i:02d}") for i in range(40)]
+    for start in range(0, n_books, 5000):
+        Book.objects.bulk_create(
+            Book(title=f"Book {i:07d}", author=f"Writer{i % 5000:04d}",
+                 category=rnd.choice(categories + [None]), total_copies=3, available_copies=rnd.randint(0, 3))
+            for i in range(start, min(start + 5000, n_books))
+        )
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        fn()
+        samples.append((perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django("book_serialization")
+    from books.models import Book
+    from books.serializers import BookSerializer
+    from books.views import book_list_rows
+
+    seed(args.books)
+    queryset = Book.objects.select_related("category").order_by("title")
+    offset = args.books // 2
+    rows = book_list_rows()
+
+    def serializer_page():
+        return BookSerializer(list(queryset[offset:offset + args.page_size]), many=True).data
+
+    def fast_page():
+        return rows.map(queryset.values_list(*rows.columns)[offset:offset + args.page_size])
+
+    assert [dict(r) for r in serializer_page()] == fast_page()
+    slow = timed(serializer_page, args.repeat)
+    fast = timed(fast_page, args.repeat)
+    print(f"page_size={args.page_size}  BookSerializer {slow:7.2f} ms   row mapper {fast:7.2f} ms   ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark：books.suggest.SuggestIndex 的自動完成延遲與 key 數。
+
+    cd backend && python benchmarks/bench_book_suggest.py --titles 1000000
+
+直接以合成的書名／作者／分類標籤建索引（不經資料庫），量測各種長度前綴的查詢延遲。
+"""
+import argparse
+import random
+import statistics
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+CJK = "天地玄黃宇宙洪荒日月盈昃辰宿列張寒來暑往秋收冬藏閏餘成歲律呂調陽雲騰致雨露結為霜金生麗水玉出崑岡"
+LATIN = ["history", "science", "galaxy", "library", "python", "django", "garden", "ocean",
+         "music", "theory", "design", "atlas", "journey", "mystery", "kitchen", "planet"]
+
+
+def labels(n_titles: int):
+    rnd = random.Random(7)
+    for i in range(40):
+        yield "category", f"分類{i:02d}", n_titles // 40
+    for i in range(n_titles // 10):
+        yield "author", f"{rnd.choice(LATIN).title()} Writer{i:06d}", 10
+    for _ in range(n_titles):
+        if rnd.random() < 0.7:
+            yield "title", "".join(rnd.choices(CJK, k=rnd.randint(4, 10))), 1
+        else:
+            yield "title", " ".join(w.title() for w in rnd.choices(LATIN, k=rnd.randint(2, 5))), 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--max-keys", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django("book_suggest")
+    from books.suggest import SuggestIndex
+
+    index = SuggestIndex(max_keys=args.max_keys)
+    t0 = perf_counter()
+    index.load(labels(args.titles))
+    print(f"loaded {len(index)} keys (cap {args.max_keys}) in {perf_counter() - t0:.1f}s")
+
+    for prefix in ("天", "天地", "gal", "galaxy mys", "writer0004", "分類"):
+        samples = []
+        for _ in range(args.repeat):
+            t0 = perf_counter()
+            index.suggest(prefix, 8)
+            samples.append((perf_counter() - t0) * 1000)
+        print(f"{prefix!r:<14} median {statistics.median(samples):6.3f} ms   max {max(samples):6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Micro-benchmark：chat.services.chunking.chunk_text 在大型輸入上的耗時。
+
+    cd backend && python benchmarks/bench_chunker.py [--sizes 100000 1000000]
+
+依序以 CJK 無標點長文、CJK 短句、英文短句三種輸入量測 chars/tokens 兩種模式，
+輸入放大 10 倍時耗時也應約略放大 10 倍（線性）。
+"""
+import argparse
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chat.services.chunking import chunk_text  # noqa: E402
+
+CORPORA = {
+    "cjk-no-punct": lambda n: "館" * n,
+    "cjk-sentences": lambda n: ("借閱期限為十四天，可續借一次。" * (n // 15 + 1))[:n],
+    "latin-sentences": lambda n: ("Books are due in fourteen days. " * (n // 32 + 1))[:n],
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'corpus':<16} {'unit':<7} {'chars':>10} {'chunks':>7} {'best ms':>9} {'MB/s':>7}")
+    for name, make in CORPORA.items():
+        for size in args.sizes:
+            text = make(size)
+            for unit in ("chars", "tokens"):
+                best = float("inf")
+                for _ in range(args.repeat):
+                    t0 = perf_counter()
+                    chunks = chunk_text(text, unit=unit, overlap=50)
+                    best = min(best, perf_counter() - t0)
+                mbps = len(text.encode("utf-8")) / best / 1e6
+                print(f"{name:<16} {unit:<7} {size:>10} {len(chunks):>7} {best * 1000:>9.1f} {mbps:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
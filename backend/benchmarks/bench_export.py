@@ -0,0 +1,54 @@
+"""Benchmark：export_catalog 串流匯出的吞吐量與記憶體用量。
+
+    cd backend && python benchmarks/bench_export.py --rows 200000 --format csv
+
+先以 bulk_create 建立 --rows 本書，再把 books 匯出到 /dev/null，回報行/秒與
+tracemalloc 量到的 Python 端記憶體峰值（應與 --rows 無關，只隨 --chunk-size 成長）。
+"""
+import argparse
+import io
+import os
+import tracemalloc
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django("export")
+    from django.core.management import call_command
+
+    from books.models import Book, Category
+
+    categories = Category.objects.bulk_create([Category(name=f"分類{i:03d}") for i in range(200)])
+    Book.objects.bulk_create(
+        (
+            Book(title=f"書名 {i:07d}", author=f"作者{i % 997:03d}", category=categories[i % 200])
+            for i in range(args.rows)
+        ),
+        batch_size=5000,
+    )
+
+    tracemalloc.start()
+    t0 = perf_counter()
+    call_command(
+        "export_catalog", "books", "--format", args.format, "--chunk-size", str(args.chunk_size),
+        "--output", os.devnull, stdout=io.StringIO(),
+    )
+    elapsed = perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{args.format:<6} rows={args.rows:<8} {elapsed:7.2f} s   {args.rows / elapsed:10,.0f} 行/秒"
+        f"   記憶體峰值 {peak / 1024 / 1024:6.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
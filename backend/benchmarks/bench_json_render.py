@@ -0,0 +1,82 @@
+"""Benchmark：大型列表回應的 JSON 編碼（DRF JSONRenderer vs FastJSONRenderer）。
+
+    cd backend && python benchmarks/bench_json_render.py --rows 5000
+
+以不分頁的通知列表（NotificationSerializer，含 datetime）與收藏列表（巢狀 BookSerializer）
+的序列化結果為輸入，只量測 renderer.render() 的時間，並確認兩者輸出的位元組相同。
+未安裝 orjson 時 FastJSONRenderer 等同 DRF 預設。
+"""
+import argparse
+import statistics
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+
+def seed(n_rows: int):
+    from django.contrib.auth import get_user_model
+
+    from books.models import Book, Category
+    from favorites.models import Favorite
+    from notifications.models import Notification
+
+    user = get_user_model().objects.create_user(email="bench@example.com", password="pw")
+    category = Category.objects.create(name="文學")
+    books = Book.objects.bulk_create(
+        Book(title=f"書名 {i:05d}", author=f"作者{i % 300:03d}", category=category, total_copies=3, available_copies=2)
+        for i in range(n_rows)
+    )
+    Favorite.objects.bulk_create(Favorite(user=user, book=book) for book in books)
+    Notification.objects.bulk_create(
+        Notification(user=user, type="loan_due_soon", message=f"《書名 {i:05d}》將於三天後到期，請記得歸還。")
+        for i in range(n_rows)
+    )
+    return user
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        fn()
+        samples.append((perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django("json_render")
+    from rest_framework.renderers import JSONRenderer
+
+    from config import renderers
+    from favorites.models import Favorite
+    from favorites.serializers import FavoriteSerializer
+    from notifications.models import Notification
+    from notifications.serializers import NotificationSerializer
+
+    user = seed(args.rows)
+    payloads = {
+        "notifications": NotificationSerializer(Notification.objects.filter(user=user), many=True).data,
+        "favorites": FavoriteSerializer(
+            Favorite.objects.filter(user=user).select_related("book__category"), many=True
+        ).data,
+    }
+    print(f"orjson: {'已安裝' if renderers.orjson is not None else '未安裝（退回 DRF 預設）'}")
+    default, fast = JSONRenderer(), renderers.FastJSONRenderer()
+    for name, data in payloads.items():
+        body = default.render(data)
+        assert fast.render(data) == body
+        slow_ms = timed(lambda: default.render(data), args.repeat)
+        fast_ms = timed(lambda: fast.render(data), args.repeat)
+        print(
+            f"{name:<14} rows={len(data):<6} {len(body) / 1024:8.0f} KiB   "
+            f"JSONRenderer {slow_ms:7.2f} ms   FastJSONRenderer {fast_ms:7.2f} ms   ({slow_ms / fast_ms:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark：熱門書同時借還的吞吐量（loans.services.loan_book / return_loan）。
+
+    cd backend && DATABASE_URL=postgresql://... python benchmarks/bench_loan_concurrency.py --threads 16
+    cd backend && DATABASE_URL=postgresql://... python benchmarks/bench_loan_concurrency.py --threads 16 --legacy
+
+--threads 個執行緒（各自一個資料庫連線、一位使用者）在 --seconds 秒內對同一本書反覆借出、歸還，
+回報每秒完成的借還次數。--legacy 改用先前的流程（select_for_update 鎖書、F() 更新、
+refresh_from_db、另一次 status 更新）作為對照。SQLite 的寫入本身就是整個資料庫序列化，
+請以 PostgreSQL 量測。
+"""
+import argparse
+import threading
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+
+def legacy_loan_book(*, user, book, now):
+    from django.db import transaction
+    from django.db.models import F
+    from django.utils import timezone
+
+    from books.cache import bump_catalog_version_on_commit
+    from books.models import Book
+    from loans.models import Loan
+    from loans.services import NotEnoughCopies
+
+    with transaction.atomic():
+        b = Book.objects.select_for_update().get(pk=book.pk)
+        if b.available_copies <= 0:
+            raise NotEnoughCopies("No copies available")
+        loan = Loan.objects.create(
+            user=user, book=b, type=Loan.Type.LOAN, status=Loan.Status.ACTIVE,
+            loaned_at=now, due_at=now + timezone.timedelta(days=14),
+        )
+        Book.objects.filter(pk=b.pk).update(available_copies=F("available_copies") - 1)
+        b.refresh_from_db(fields=["available_copies"])
+        bump_catalog_version_on_commit()
+        new_status = "unavailable" if b.available_copies == 0 else "available"
+        if b.status != new_status:
+            Book.objects.filter(pk=b.pk).update(status=new_status)
+        return loan
+
+
+def legacy_return_loan(*, loan, now):
+    from django.db import transaction
+    from django.db.models import F
+
+    from books.cache import bump_catalog_version_on_commit
+    from books.models import Book
+    from loans.models import Loan
+
+    with transaction.atomic():
+        b = Book.objects.select_for_update().get(pk=loan.book_id)
+        loan.status = Loan.Status.RETURNED
+        loan.returned_at = now
+        loan.save(update_fields=["status", "returned_at", "updated_at"])
+        Book.objects.filter(pk=b.pk).update(available_copies=F("available_copies") + 1)
+        b.refresh_from_db(fields=["available_copies"])
+        bump_catalog_version_on_commit()
+        Loan.objects.select_for_update(skip_locked=True).filter(
+            book_id=b.pk, type=Loan.Type.RESERVATION, status=Loan.Status.PENDING
+        ).order_by("created_at").first()
+        new_status = "unavailable" if b.available_copies == 0 else "available"
+        if b.status != new_status:
+            Book.objects.filter(pk=b.pk).update(status=new_status)
+        return loan
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    setup_django("loan_concurrency")
+    from django.contrib.auth import get_user_model
+    from django.db import connection, connections
+    from django.utils import timezone
+
+    from books.models import Book
+    from loans import services
+
+    loan_book = legacy_loan_book if args.legacy else services.loan_book
+    return_loan = legacy_return_loan if args.legacy else services.return_loan
+
+    book = Book.objects.create(title="熱門書", author="作者", total_copies=args.threads, available_copies=args.threads)
+    User = get_user_model()
+    users = [User.objects.create_user(email=f"bench{i}@example.com", password="x") for i in range(args.threads)]
+    done = [0] * args.threads
+    deadline = perf_counter() + args.seconds
+    barrier = threading.Barrier(args.threads)
+
+    def worker(index: int) -> None:
+        try:
+            barrier.wait()
+            while perf_counter() < deadline:
+                loan = loan_book(user=users[index], book=book, now=timezone.now())
+                return_loan(loan=getattr(loan, "loan", loan), now=timezone.now())
+                done[index] += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+
+    book.refresh_from_db()
+    assert book.available_copies == args.threads, "庫存與借還次數不符"
+    label = "legacy" if args.legacy else "single-statement"
+    print(
+        f"{label:<17} {connection.vendor} threads={args.threads:<3} "
+        f"{sum(done):8,} 次借還 {sum(done) / elapsed:9,.0f} 次/秒"
+    )
+
+
+if __name__ == "__main__":
+    main()
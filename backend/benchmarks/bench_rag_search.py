@@ -0,0 +1,80 @@
+"""Benchmark：chat.services.rag_store.search_topk 的混合檢索延遲。
+
+    cd backend && python benchmarks/bench_rag_search.py --chunks 100000 --dim 256
+
+灌入隨機中英文片段與隨機向量後，分別量測 BM25、向量與融合後的查詢延遲。
+向量一路在全部片段中獨立取前幾名（需要 numpy；沒有時超過 RAG_VECTOR_SCAN_MAX 改為抽樣計算）。
+"""
+import argparse
+import random
+import statistics
+from time import perf_counter
+
+from _bootstrap import setup_django
+
+WORDS = ["借閱", "續借", "預約", "逾期", "罰款", "自習室", "討論室", "開館", "閉館", "證件",
+         "library", "room", "policy", "renewal", "deposit", "wifi", "printer", "locker"]
+
+
+def seed(n_chunks: int, dim: int) -> None:
+    from chat.models import KnowledgeChunk, KnowledgeDoc
+    from chat.services.lexical import index_chunks, term_counts
+
+    rnd = random.Random(7)
+    doc = KnowledgeDoc.objects.create(title="bench", source="bench.md")
+    for start in range(0, n_chunks, 2000):
+        texts = [
+            " ".join(rnd.choices(WORDS, k=30)) + f" R-{i:06d}"
+            for i in range(start, min(start + 2000, n_chunks))
+        ]
+        counts = [term_counts(t) for t in texts]
+        rows = KnowledgeChunk.objects.bulk_create([
+            KnowledgeChunk(doc=doc, text=t, order=start + j, token_count=sum(c.values()),
+                           vec=[rnd.uniform(-1, 1) for _ in range(dim)])
+            for j, (t, c) in enumerate(zip(texts, counts))
+        ])
+        index_chunks((ch.id, c) for ch, c in zip(rows, counts))
+
+
+def timed(fn, repeat: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = perf_counter()
+        fn()
+        samples.append((perf_counter() - t0) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django("rag_search")
+    from chat.services import lexical, rag_store
+
+    t0 = perf_counter()
+    seed(args.chunks, args.dim)
+    rag_store.bump_corpus_version()
+    print(f"seeded {args.chunks} chunks in {perf_counter() - t0:.1f}s")
+
+    rnd = random.Random(11)
+    qvec = [rnd.uniform(-1, 1) for _ in range(args.dim)]
+    rag_store.embed_texts = lambda texts, **kw: [qvec for _ in texts]
+    version = rag_store.corpus_version()
+
+    cases = {
+        "bm25 exact code": lambda: lexical.bm25_search("R-004242", limit=50, version=version),
+        "bm25 common terms": lambda: lexical.bm25_search("逾期 罰款 policy", limit=50, version=version),
+        "hybrid search_topk": lambda: rag_store.search_topk("討論室 R-004242 預約", k=4),
+    }
+    for name, fn in cases.items():
+        fn()  # 暖機（載入統計與向量快取）
+        median, worst = timed(fn, args.repeat)
+        print(f"{name:<20} median {median:8.1f} ms   max {worst:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
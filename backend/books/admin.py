@@ -8,15 +8,8 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ("name",)
     actions = ["delete_empty_categories"]
 
-    def get_queryset(self, request):
-        # 預先計算每個分類下的書籍數量
-        qs = super().get_queryset(request)
-        return qs.annotate(_book_count=Count("books"))
-
-    def book_count(self, obj):
-        # 顯示在後台列表
-        return obj._book_count
-    book_count.short_description = "掛書數"
+    # book_count 為反正規化欄位（見 books/counters.py），列表不再逐頁 GROUP BY
+    readonly_fields = ("book_count",)
 
     @admin.action(description="刪除沒有掛書的分類")
     def delete_empty_categories(self, request, queryset):
@@ -0,0 +1,105 @@
+# books/availability.py
+"""多本書的即時庫存查詢（GET/POST /api/books/availability/）。
+
+回傳 {book_id: {available, total, status, queue_length}}；queue_length 為待處理預約數。
+未快取的 id 以一次查詢取得（主鍵 IN + 預約數相關子查詢，走 loans 的 (book, status) 索引）。
+
+每本書一個快取 key（BOOK_AVAILABILITY_CACHE_SECONDS），以 get_many／set_many 批次讀寫：
+Book 存檔刪除、Loan 新增／變更／刪除（借書、還書、預約、取消…）在交易提交後刪除該書的 key；
+TTL 只兜住繞過 ORM 的寫入（queryset.update、匯入等）。
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+
+MAX_IDS = 200
+NOT_FOUND = False
+
+
+def _key(book_id: int) -> str:
+    return f"books:availability:{book_id}"
+
+
+def _timeout() -> int:
+    return int(getattr(settings, "BOOK_AVAILABILITY_CACHE_SECONDS", 30))
+
+
+def parse_ids(values: Iterable) -> List[int]:
+    """接受 [1, 2]（JSON body）或 ["1,2", "3"]（query string）；去重並保持順序。"""
+    items = []
+    for value in values:
+        items.extend(value.split(",") if isinstance(value, str) else [value])
+    ids: List[int] = []
+    for item in items:
+        if isinstance(item, str):
+            item = item.strip()
+            if not item:
+                continue
+            if not item.isdigit():
+                raise ValidationError({"ids": f"無效的書籍 id：{item}"})
+            item = int(item)
+        if isinstance(item, bool) or not isinstance(item, int) or item <= 0:
+            raise ValidationError({"ids": f"無效的書籍 id：{item}"})
+        ids.append(item)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValidationError({"ids": "請提供至少一個書籍 id。"})
+    if len(ids) > MAX_IDS:
+        raise ValidationError({"ids": f"一次最多查詢 {MAX_IDS} 本書。"})
+    return ids
+
+
+def _query(ids: List[int]) -> Dict[int, Dict]:
+    from loans.models import Loan
+
+    from .models import Book
+
+    queue = (
+        Loan.objects.filter(book=OuterRef("pk"), type=Loan.Type.RESERVATION, status=Loan.Status.PENDING)
+        .order_by()
+        .values("book")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    rows = (
+        Book.objects.filter(pk__in=ids)
+        .order_by()
+        .annotate(queue_length=Coalesce(Subquery(queue, output_field=IntegerField()), 0))
+        .values_list("pk", "available_copies", "total_copies", "status", "queue_length")
+    )
+    return {
+        pk: {"available": available, "total": total, "status": status, "queue_length": queue_length}
+        for pk, available, total, status, queue_length in rows
+    }
+
+
+def availability(ids: List[int]) -> Dict[int, Dict]:
+    """依 ids 順序回傳存在的書；不存在的 id 略過。"""
+    timeout = _timeout()
+    if timeout <= 0:
+        found = _query(ids)
+    else:
+        cached = cache.get_many([_key(book_id) for book_id in ids])
+        found = {book_id: cached[_key(book_id)] for book_id in ids if _key(book_id) in cached}
+        missing = [book_id for book_id in ids if book_id not in found]
+        if missing:
+            fresh = _query(missing)
+            # 不存在的 id 也快取（NOT_FOUND），避免重複查詢
+            cache.set_many({_key(book_id): fresh.get(book_id, NOT_FOUND) for book_id in missing}, timeout=timeout)
+            found.update(fresh)
+    return {book_id: found[book_id] for book_id in ids if found.get(book_id, NOT_FOUND) is not NOT_FOUND}
+
+
+def invalidate_availability(*book_ids: int) -> None:
+    cache.delete_many([_key(book_id) for book_id in book_ids if book_id])
+
+
+def invalidate_availability_on_commit(*book_ids: int) -> None:
+    transaction.on_commit(lambda: invalidate_availability(*book_ids))
@@ -0,0 +1,85 @@
+# books/cache.py
+"""書目讀取端點（/api/books/、/api/categories/）的回應快取。
+
+快取 key = catalog version + 完整網址（含正規化後的 query 參數），值為序列化後的
+response.data，命中時直接回應，不再執行篩選、COUNT、join 與序列化。
+
+catalog version 存在快取中，Book／Category 存檔刪除（signals）與借還書造成的
+庫存變化（loans.services）在交易提交後遞增，舊 key 自然失效，不靠 TTL 猜測；
+BOOK_RESPONSE_CACHE_SECONDS 只用來讓失效後的舊 key 最終被清掉（0 = 停用快取）。
+同一個 version 也作為這些端點的 ETag（config/etag.py）。
+多行程部署需設定共用的 CACHE_URL（Redis 或檔案），版本號才會跨行程同步。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from config.etag import ConditionalGetMixin
+
+from .catalog_index import bump_generation, generation
+
+CATALOG_VERSION_KEY = "books:catalog_version"
+
+
+def catalog_version() -> int:
+    return generation(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> int:
+    return bump_generation(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version_on_commit() -> None:
+    transaction.on_commit(bump_catalog_version)
+
+
+def _timeout() -> int:
+    return int(getattr(settings, "BOOK_RESPONSE_CACHE_SECONDS", 3600))
+
+
+def response_cache_key(request) -> str:
+    params = sorted((key, sorted(request.query_params.getlist(key))) for key in request.query_params)
+    raw = json.dumps([request.build_absolute_uri(request.path), params], ensure_ascii=False)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return f"books:response:{catalog_version()}:{digest}"
+
+
+class CatalogCacheMixin(ConditionalGetMixin):
+    """讓 ViewSet 的 list / retrieve 走版本化回應快取（回應內容不可因使用者而異）；
+    ETag 也以 catalog version 為準，If-None-Match 相符時連快取都不必讀。"""
+
+    etag_per_user = False
+
+    def is_catalog_cacheable(self, request) -> bool:
+        """回應因使用者而異的請求回傳 False：不走回應快取、不產生 ETag。"""
+        return True
+
+    def get_etag_validator(self, request):
+        if not self.is_catalog_cacheable(request):
+            return None
+        return str(catalog_version())
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        timeout = _timeout()
+        if timeout <= 0 or not self.is_catalog_cacheable(request):
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=timeout)
+        return response
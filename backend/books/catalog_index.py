@@ -0,0 +1,274 @@
+# books/catalog_index.py
+"""行程內的書目倒排索引（BOOK_SEARCH_ENGINE=memory 時使用）。
+
+直接沿用 Book.search_document（title|author|category 三段、已斷好詞），
+不依賴資料庫的全文檢索功能：
+
+- posting list 以 array 存放：書籍 id（遞增排序）與該詞出現的段落 bitmask；
+- 詞典另存一份排序好的詞表，前綴查詢以 bisect 取出範圍；
+- 查詢詞全部 AND，每個詞以前綴比對；分數 = Σ idf × 段落權重（完整命中加倍）。
+
+Book 存檔／刪除（search_document 有變時）在交易提交後經 ChangeLog 發布增量：
+以 cache.incr 原子遞增快取中的 generation，並把 (book_id, search_document) 存在
+該版本的 key 下。遞增結果恰為本行程版本 + 1 時本行程直接套用；其他行程下次查詢時
+依序重播缺少的增量，只有落後太多、增量已被逐出或整批匯入（RELOAD）時才整批重建。
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from django.core.cache import cache
+
+GENERATION_KEY = "books:catalog_index_generation"
+# title / author / category 的權重，依 search_document 的段落順序
+SECTION_WEIGHTS = (3.0, 2.0, 1.0)
+PREFIX_FACTOR = 0.5
+# ChangeLog：快取中保留的增量版本數與存活秒數；落後超過這個範圍的行程整批重建
+CHANGE_LOG_SIZE = 256
+CHANGE_LOG_TIMEOUT = 600
+# 遞增 generation 與寫入增量之間有短暫空檔：缺少的增量最多等這麼久，之後視為已逐出
+HOLE_WAIT = 2.0
+# 要求所有行程整批重建的增量（整批匯入、分類異動等無法逐筆描述的變更）
+RELOAD = "reload"
+
+
+def generation(key: str = GENERATION_KEY) -> int:
+    """跨行程共用的索引版本（存在快取）；行程內的其他索引（如 suggest）也以自己的 key 共用。"""
+    value = cache.get(key)
+    if value is None:
+        value = time.time_ns()
+        cache.add(key, value, timeout=None)
+        value = cache.get(key, value)
+    return value
+
+
+def bump_generation(key: str) -> int:
+    """原子遞增並回傳新版本；key 被逐出時重新初始化（與任何行程的版本都不會相差 1）。"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation(key)
+        return cache.incr(key)
+
+
+class ChangeLog:
+    """跨行程共用的增量紀錄：generation 存在快取 key，第 n 版的增量存在 "{key}:{n}"。
+
+    每個版本一個 key，發布時不必讀改寫整份清單；保留範圍由 CHANGE_LOG_SIZE 與
+    CHANGE_LOG_TIMEOUT 限制。行程內的索引（本模組與 suggest）以 sync() 追上最新版本。
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._hole: Tuple[int, float] | None = None  # (缺少的版本, 第一次發現的時間)
+
+    def generation(self) -> int:
+        return generation(self.key)
+
+    def publish(self, change) -> int:
+        """原子遞增 generation 並寫入這一版的增量，回傳新版本。"""
+        new_generation = bump_generation(self.key)
+        cache.set(f"{self.key}:{new_generation}", change, timeout=CHANGE_LOG_TIMEOUT)
+        return new_generation
+
+    def invalidate(self) -> int:
+        return self.publish(RELOAD)
+
+    def catch_up(self, since: int | None, current: int, apply: Callable) -> int | None:
+        """依序以 apply(change) 套用 (since, current] 的增量，回傳已套用到的版本；需要整批重建時回傳 None。
+
+        缺少的增量可能還沒寫入（其他行程剛遞增完），先停在缺口前的版本；
+        同一個缺口超過 HOLE_WAIT 秒仍未補上（已被逐出）才整批重建。
+        """
+        if since is None or not 0 < current - since <= CHANGE_LOG_SIZE:
+            return None
+        versions = range(since + 1, current + 1)
+        found = cache.get_many([f"{self.key}:{n}" for n in versions])
+        for n in versions:
+            change = found.get(f"{self.key}:{n}", None)
+            if change is None:
+                now = time.monotonic()
+                if self._hole is None or self._hole[0] != n:
+                    self._hole = (n, now)
+                elif now - self._hole[1] > HOLE_WAIT:
+                    return None
+                return n - 1
+            if change == RELOAD:
+                return None
+            apply(change)
+        return current
+
+    def sync(self, index, apply: Callable, reload: Callable[[int], None]) -> None:
+        """index（有 _lock 與 generation）落後時重播增量，無法重播時以 reload(generation) 整批重建。"""
+        current = self.generation()
+        if index.generation == current:
+            return
+        with index._lock:
+            applied = self.catch_up(index.generation, current, apply)
+            if applied is not None:
+                index.generation = applied
+                return
+        reload(current)
+
+
+def _sections(document: str) -> Dict[str, int]:
+    """search_document → {term: 段落 bitmask}。"""
+    masks: Dict[str, int] = {}
+    for i, part in enumerate((document or "").split("|")[:len(SECTION_WEIGHTS)]):
+        for term in part.split():
+            masks[term] = masks.get(term, 0) | (1 << i)
+    return masks
+
+
+def _weight(mask: int) -> float:
+    return max((w for i, w in enumerate(SECTION_WEIGHTS) if mask & (1 << i)), default=0.0)
+
+
+class CatalogIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._terms: List[str] = []  # 排序後的詞典，供前綴查詢
+        self._docs: Dict[int, str] = {}
+        self.generation: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def load(self, rows: Iterable[Tuple[int, str]], generation: int | None = None) -> None:
+        """以 (book_id, search_document) 整批重建；rows 需依 id 遞增。"""
+        postings: Dict[str, Tuple[array, array]] = {}
+        docs: Dict[int, str] = {}
+        for book_id, document in rows:
+            docs[book_id] = document
+            for term, mask in _sections(document).items():
+                ids, masks = postings.get(term) or postings.setdefault(term, (array("I"), array("B")))
+                ids.append(book_id)
+                masks.append(mask)
+        with self._lock:
+            self._postings, self._docs = postings, docs
+            self._terms = sorted(postings)
+            self.generation = generation
+
+    def update(self, book_id: int, document: str) -> None:
+        with self._lock:
+            if self._docs.get(book_id) == document:
+                return
+            self._remove(book_id)
+            self._docs[book_id] = document
+            for term, mask in _sections(document).items():
+                entry = self._postings.get(term)
+                if entry is None:
+                    entry = self._postings[term] = (array("I"), array("B"))
+                    insort(self._terms, term)
+                ids, masks = entry
+                pos = bisect_left(ids, book_id)
+                ids.insert(pos, book_id)
+                masks.insert(pos, mask)
+
+    def remove(self, book_id: int) -> None:
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id: int) -> None:
+        document = self._docs.pop(book_id, None)
+        if document is None:
+            return
+        for term in _sections(document):
+            ids, masks = self._postings[term]
+            pos = bisect_left(ids, book_id)
+            if pos < len(ids) and ids[pos] == book_id:
+                del ids[pos]
+                del masks[pos]
+            if not ids:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect_left(self._terms, prefix)
+        out = []
+        for term in self._terms[start:]:
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+        return out
+
+    def search(self, terms: List[str], limit: int) -> List[Tuple[int, float]]:
+        """所有 terms 皆以前綴比對（AND），回傳 [(book_id, score)]，分數由高到低。"""
+        if not terms or limit <= 0:
+            return []
+        with self._lock:
+            n_docs = len(self._docs) or 1
+            per_term: List[Dict[int, float]] = []
+            for query_term in terms:
+                scores: Dict[int, float] = {}
+                for term in self._expand(query_term):
+                    ids, masks = self._postings[term]
+                    idf = math.log(1 + n_docs / len(ids))
+                    factor = idf * (1.0 if term == query_term else PREFIX_FACTOR)
+                    for book_id, mask in zip(ids, masks):
+                        score = factor * _weight(mask)
+                        if score > scores.get(book_id, 0.0):
+                            scores[book_id] = score
+                if not scores:
+                    return []
+                per_term.append(scores)
+
+        # 由命中最少的詞開始交集
+        per_term.sort(key=len)
+        result = per_term[0]
+        for scores in per_term[1:]:
+            result = {i: s + scores[i] for i, s in result.items() if i in scores}
+            if not result:
+                return []
+        ranked = sorted(result.items(), key=lambda kv: (-kv[1], kv[0]))
+        return ranked[:limit]
+
+
+_index = CatalogIndex()
+_load_lock = threading.Lock()
+_log = ChangeLog(GENERATION_KEY)
+
+
+def _apply(change: Tuple[int, str | None]) -> None:
+    book_id, document = change
+    if document is None:
+        _index.remove(book_id)
+    else:
+        _index.update(book_id, document)
+
+
+def _reload(current: int) -> None:
+    from .models import Book
+
+    rows = Book.objects.order_by("id").values_list("id", "search_document")
+    _index.load(rows.iterator(chunk_size=5000), generation=current)
+
+
+def get_index() -> CatalogIndex:
+    """取得本行程的索引；其他行程有寫入（generation 改變）時重播增量，必要時整批重建。"""
+    if _index.generation != generation():
+        with _load_lock:
+            _log.sync(_index, _apply, _reload)
+    return _index
+
+
+def apply_change(book_id: int, document: str | None) -> None:
+    """交易提交後呼叫：發布增量讓其他行程重播；本行程版本連續時直接套用。"""
+    with _index._lock:
+        previous = _index.generation
+        new_generation = _log.publish((book_id, document))
+        if previous is None or new_generation != previous + 1:
+            return  # 尚未載入，或期間有其他行程的寫入：下次查詢時依序重播（含這一筆）
+        _apply((book_id, document))
+        _index.generation = new_generation
+
+
+def invalidate() -> None:
+    """bulk_create／bulk_update 等不經 signal 的整批寫入後呼叫：所有行程整批重建。"""
+    _log.invalidate()
@@ -0,0 +1,306 @@
+# books/copy_import.py
+"""import_books --engine=copy：PostgreSQL 以 COPY + 集合式 SQL 匯入大型書目。
+
+1. CSV 原樣以 COPY FROM STDIN 串流進 UNLOGGED 暫存表（全部欄位為 text）；
+2. 以 SQL 一次驗證（缺 title/author、數字格式、status）與正規化（trim、預設值、
+   複本數校正；同一 (title, author) 以檔案中最後一行為準）；
+3. 以 md5(concat_ws(...)) 算出與 ImportRow.content_hash 相同的內容雜湊，和 books_book.import_hash
+   相同的行直接從暫存表刪除（未變更）；來源已無的書以 NOT EXISTS 反向比對（可標記為 unavailable）；
+4. search_document 需要 Python 斷詞：分批讀出暫存列、算好後再 COPY 回另一張暫存表；
+5. 分類以 INSERT ... ON CONFLICT DO NOTHING 補齊，書籍以
+   INSERT ... ON CONFLICT (title, author) DO UPDATE 一次合併；
+6. Category.book_count 以一次 GROUP BY 重算，最後清除暫存表。
+
+整個流程在一個交易內，失敗時不留下任何資料（沒有續傳）。規則與批次匯入
+（books/importer.py）相同；其他資料庫請改用批次匯入。
+"""
+from __future__ import annotations
+
+import csv
+import io
+import uuid
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from django.db import connection, transaction
+
+from .availability import invalidate_availability_on_commit
+from .counters import reconcile_book_counts
+from .importer import (
+    HASH_SEPARATOR,
+    NUMBER_PATTERN,
+    REMOVED_STATUS,
+    WHITESPACE,
+    ImportRowError,
+    ImportStats,
+    finish_import,
+    read_header,
+)
+from .models import Book, Category
+from .search import build_document
+
+COPY_BUFFER = 1 << 20
+DOCUMENT_BATCH = 5000
+SKIP_VALUES = ("1", "true", "yes", "y")
+# 與批次匯入的 str.strip() 相同的空白字元集合，以 E'\uXXXX' 跳脫
+TRIM_CHARS = "".join(f"\\u{ord(ch):04x}" for ch in WHITESPACE)
+
+
+def supports_copy(conn=connection) -> bool:
+    return conn.vendor == "postgresql"
+
+
+def _header(path: Path) -> List[str]:
+    with path.open("r", encoding="utf-8-sig", newline="") as csvfile:
+        return [name.strip() for name in read_header(csvfile)]
+
+
+def _is_psycopg3(cursor) -> bool:
+    return hasattr(cursor.cursor, "copy")
+
+
+def _copy_file(cursor, table: str, columns: List[str], path: Path) -> None:
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')"
+    with path.open("rb") as fh:
+        if _is_psycopg3(cursor):
+            with cursor.cursor.copy(sql) as copy:
+                while chunk := fh.read(COPY_BUFFER):
+                    copy.write(chunk)
+        else:
+            cursor.cursor.copy_expert(sql, fh, size=COPY_BUFFER)
+
+
+def _copy_rows(cursor, table: str, columns: List[str], rows: Iterable[Tuple]) -> None:
+    if _is_psycopg3(cursor):
+        with cursor.cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+    else:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def _text(column: str) -> str:
+    return f"btrim(coalesce({column}, ''), E'{TRIM_CHARS}')"
+
+
+def _line_breaks(column: str) -> str:
+    """欄位內的換行數；與 csv 模組相同，\\r\\n、單獨的 \\r 或 \\n 各算一行。"""
+    text = f"replace(coalesce({column}, ''), E'\\r\\n', E'\\n')"
+    return f"(length({text}) - length(replace(replace({text}, E'\\r', ''), E'\\n', '')))"
+
+
+def _physical_line(cursor, raw: str, raw_columns: List[str], record: int) -> int:
+    """第 record 筆資料（line_no）結束於檔案的第幾行，與批次匯入的 reader.line_num + 1 相同。
+
+    只在回報錯誤時計算：標題列 1 行，之前（含）每筆資料 1 行加上引號欄位內的換行數。
+    """
+    breaks = " + ".join(_line_breaks(c) for c in raw_columns)
+    cursor.execute(f"SELECT 1 + count(*) + coalesce(sum({breaks}), 0) FROM {raw} WHERE line_no <= %s", [record])
+    return cursor.fetchone()[0]
+
+
+def copy_import(path: Path, *, mark_missing: bool = False, warn=None) -> ImportStats:
+    warn = warn or (lambda message: None)
+    names = _header(path)
+    # COPY 依位置對應欄位：暫存表一律用 c0..cN，避免標題列的名稱需要跳脫
+    raw_columns = [f"c{i}" for i in range(len(names))]
+    column_of = {name: raw_columns[i] for i, name in reversed(list(enumerate(names)))}
+    suffix = uuid.uuid4().hex[:12]
+    raw, stage, docs = f"books_import_raw_{suffix}", f"books_import_stage_{suffix}", f"books_import_doc_{suffix}"
+    book_table, category_table = Book._meta.db_table, Category._meta.db_table
+    valid_status = [choice[0] for choice in Book.STATUS_CHOICES]
+    default_status = Book._meta.get_field("status").default
+    stats = ImportStats()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {raw} (line_no bigserial, {', '.join(f'{c} text' for c in raw_columns)})"
+        )
+        _copy_file(cursor, raw, raw_columns, path)
+
+        status = _text(column_of["status"]) if "status" in column_of else "''"
+        # line 為資料在檔案中的順序（第幾筆）；回報錯誤時才換算成檔案的實際行號
+        cursor.execute(
+            f"""
+            CREATE UNLOGGED TABLE {stage} AS
+            SELECT line_no AS line,
+                   {_text(column_of['title'])} AS title,
+                   {_text(column_of['author'])} AS author,
+                   {_text(column_of['category'])} AS category,
+                   nullif({_text(column_of['total_copies'])}, '') AS total_raw,
+                   nullif({_text(column_of['available_copies'])}, '') AS available_raw,
+                   coalesce(nullif({status}, ''), %s) AS status,
+                   lower({_text(column_of['skip'])}) = ANY(%s) AS skip
+            FROM {raw}
+            """,
+            [default_status, list(SKIP_VALUES)],
+        )
+
+        # 驗證：回報檔案中第一個有問題的行（與批次匯入相同的訊息）
+        cursor.execute(
+            f"""
+            SELECT line, CASE
+                WHEN title = '' OR author = '' THEN 'missing'
+                WHEN total_raw !~ %(number)s THEN 'total_copies'
+                WHEN available_raw !~ %(number)s THEN 'available_copies'
+                ELSE 'status' END,
+                total_raw, available_raw, status
+            FROM {stage}
+            WHERE NOT skip AND (
+                title = '' OR author = ''
+                OR total_raw !~ %(number)s OR available_raw !~ %(number)s
+                OR status <> ALL(%(status)s)
+            )
+            ORDER BY line LIMIT 1
+            """,
+            {"number": NUMBER_PATTERN, "status": valid_status},
+        )
+        bad = cursor.fetchone()
+        if bad:
+            record, reason, total_raw, available_raw, status_value = bad
+            line = _physical_line(cursor, raw, raw_columns, record)
+            if reason == "missing":
+                raise ImportRowError(f"第 {line} 行缺少必要欄位（title/author）。")
+            if reason == "status":
+                raise ImportRowError(f"第 {line} 行的 status 值無效：{status_value}。")
+            value = total_raw if reason == "total_copies" else available_raw
+            raise ImportRowError(f"第 {line} 行欄位 {reason} 的值無法轉換為整數：{value}")
+
+        cursor.execute(f"SELECT count(*) FILTER (WHERE skip), count(*) FILTER (WHERE NOT skip) FROM {stage}")
+        stats.skipped, valid_rows = cursor.fetchone()
+
+        # 來源已無：先前由匯入寫入、但暫存表（含 skip 的行）沒有列出的書
+        absent = f"""
+            FROM {book_table} b
+            WHERE b.import_hash <> ''
+              AND NOT EXISTS (SELECT 1 FROM {stage} s WHERE s.title = b.title AND s.author = b.author)
+        """
+        if mark_missing:
+            cursor.execute(
+                f"""
+                UPDATE {book_table} SET status = %s, import_hash = '', updated_at = now()
+                WHERE id IN (SELECT b.id {absent}) RETURNING id
+                """,
+                [REMOVED_STATUS],
+            )
+            removed_ids = [row[0] for row in cursor.fetchall()]
+            invalidate_availability_on_commit(*removed_ids)
+            stats.removed = len(removed_ids)
+        else:
+            cursor.execute(f"SELECT count(*) {absent}")
+            stats.removed = cursor.fetchone()[0]
+
+        # 正規化：數字轉型與校正（順序同批次匯入），同一 (title, author) 只留最後一行
+        cursor.execute(f"DELETE FROM {stage} WHERE skip")
+        cursor.execute(
+            f"""
+            CREATE UNLOGGED TABLE {stage}_final AS
+            SELECT *, md5(concat_ws(%s, title, author, category, total_copies::text, available_copies::text, status))
+                      AS content_hash
+            FROM (
+                SELECT DISTINCT ON (title, author)
+                       line, title, author, category, status,
+                       greatest(total0, 0) AS total_copies,
+                       greatest(least(available0, total0), 0) AS available_copies,
+                       available0 > total0 AS warn_over,
+                       least(available0, total0) < 0 AS warn_negative_available,
+                       total0 < 0 AS warn_negative_total
+                FROM (
+                    SELECT line, title, author, category, status, total0,
+                           coalesce(trunc(replace(available_raw, '_', '')::numeric)::bigint, total0) AS available0
+                    FROM (
+                        SELECT *, coalesce(trunc(replace(total_raw, '_', '')::numeric)::bigint, 1) AS total0 FROM {stage}
+                    ) AS typed
+                ) AS normalized
+                ORDER BY title, author, line DESC
+            ) AS deduplicated
+            """,
+            [HASH_SEPARATOR],
+        )
+        stage_final = f"{stage}_final"
+        cursor.execute(
+            f"""
+            SELECT count(*) FILTER (WHERE warn_over),
+                   count(*) FILTER (WHERE warn_negative_available),
+                   count(*) FILTER (WHERE warn_negative_total)
+            FROM {stage_final}
+            """
+        )
+        over, negative_available, negative_total = cursor.fetchone()
+        for count, message in (
+            (over, "available_copies 超過 total_copies，已自動調整。"),
+            (negative_available, "available_copies 為負值，已調整為 0。"),
+            (negative_total, "total_copies 為負值，已調整為 0。"),
+        ):
+            if count:
+                stats.warnings += count
+                warn(f"{count} 行 {message}")
+
+        # 未變更：內容雜湊與上次匯入相同，整行不寫入
+        cursor.execute(
+            f"""
+            DELETE FROM {stage_final} s USING {book_table} b
+            WHERE b.title = s.title AND b.author = s.author AND b.import_hash = s.content_hash
+            """
+        )
+        stats.unchanged = cursor.rowcount
+        cursor.execute(
+            f"""
+            SELECT count(*) FROM {stage_final} s
+            WHERE NOT EXISTS (SELECT 1 FROM {book_table} b WHERE b.title = s.title AND b.author = s.author)
+            """
+        )
+        stats.created = cursor.fetchone()[0]
+        stats.changed = valid_rows - stats.created - stats.unchanged
+
+        cursor.execute(
+            f"""
+            INSERT INTO {category_table} (name, is_system, book_count)
+            SELECT DISTINCT category, false, 0 FROM {stage_final} WHERE category <> ''
+            ON CONFLICT (name) DO NOTHING
+            """
+        )
+        stats.categories_created = cursor.rowcount
+
+        # search_document 需要 Python 斷詞：分批讀出、COPY 回暫存表
+        cursor.execute(f"CREATE UNLOGGED TABLE {docs} (line bigint PRIMARY KEY, document text NOT NULL)")
+        with connection.connection.cursor(name=f"{docs}_cursor") as source:
+            source.itersize = DOCUMENT_BATCH
+            source.execute(f"SELECT line, title, author, category FROM {stage_final}")
+            while batch := source.fetchmany(DOCUMENT_BATCH):
+                _copy_rows(
+                    cursor,
+                    docs,
+                    ["line", "document"],
+                    ((line, build_document(title, author, category)) for line, title, author, category in batch),
+                )
+
+        cursor.execute(
+            f"""
+            INSERT INTO {book_table}
+                (title, author, category_id, total_copies, available_copies, status,
+                 search_document, import_hash, created_at, updated_at)
+            SELECT s.title, s.author, c.id, s.total_copies, s.available_copies, s.status,
+                   d.document, s.content_hash, now(), now()
+            FROM {stage_final} s
+            JOIN {docs} d ON d.line = s.line
+            LEFT JOIN {category_table} c ON c.name = s.category AND s.category <> ''
+            ON CONFLICT (title, author) DO UPDATE SET
+                category_id = EXCLUDED.category_id,
+                total_copies = EXCLUDED.total_copies,
+                available_copies = EXCLUDED.available_copies,
+                status = EXCLUDED.status,
+                search_document = EXCLUDED.search_document,
+                import_hash = EXCLUDED.import_hash,
+                updated_at = EXCLUDED.updated_at
+            """
+        )
+        for table in (docs, stage_final, stage, raw):
+            cursor.execute(f"DROP TABLE {table}")
+        reconcile_book_counts()
+    if stats.created or stats.changed or (mark_missing and stats.removed):
+        finish_import(reindex=bool(stats.created or stats.changed))
+    return stats
@@ -0,0 +1,57 @@
+# books/counters.py
+"""Category.book_count 反正規化計數。
+
+- Book.save()：新增 +1；換分類時舊分類 -1、新分類 +1（與存檔同一個交易）；
+- 刪除：post_delete signal -1（queryset.delete() 也會逐筆送出）；
+- BookQuerySet.bulk_create() / update(category=...)：依批次差額一次調整；
+- 其他繞過 ORM 的寫入（raw SQL、bulk_update 等）以 reconcile_category_counts 指令校正。
+"""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Mapping, Optional
+
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+
+def adjust_book_counts(deltas: Mapping[Optional[int], int], using: str = "default", category_model=None) -> None:
+    """deltas = {category_id: 增減量}；None（未分類）與 0 會略過。"""
+    if category_model is None:
+        from .models import Category as category_model
+    deltas = {category_id: delta for category_id, delta in deltas.items() if category_id is not None and delta}
+    if not deltas:
+        return
+    # 多個分類以一個 UPDATE ... CASE 完成（批次匯入一個 chunk 可能牽動上百個分類）
+    change = Case(
+        *(When(pk=category_id, then=Value(delta)) for category_id, delta in deltas.items()),
+        output_field=IntegerField(),
+    )
+    category_model.objects.using(using).filter(pk__in=deltas).update(book_count=F("book_count") + change)
+
+
+def category_deltas(before: Mapping[Optional[int], int], after: Mapping[Optional[int], int]) -> Counter:
+    deltas = Counter(after)
+    deltas.subtract(before)
+    return deltas
+
+
+def reconcile_book_counts(book_model=None, category_model=None, using: str = "default", dry_run: bool = False) -> int:
+    """以一次 GROUP BY 重算所有分類的書籍數，回傳數值不符（並已修正）的分類數。"""
+    if book_model is None or category_model is None:
+        from .models import Book as book_model, Category as category_model
+    actual = dict(
+        book_model.objects.using(using)
+        .filter(category__isnull=False)
+        .order_by()
+        .values("category")
+        .annotate(n=Count("id"))
+        .values_list("category", "n")
+    )
+    fixed = 0
+    for category_id, stored in category_model.objects.using(using).values_list("id", "book_count"):
+        expected = actual.get(category_id, 0)
+        if stored != expected:
+            fixed += 1
+            if not dry_run:
+                category_model.objects.using(using).filter(pk=category_id).update(book_count=expected)
+    return fixed
@@ -0,0 +1,78 @@
+# books/facets.py
+"""書籍列表的 facet 計數（GET /api/books/?facets=category,status）。
+
+對過濾後（含 ?query= 全文檢索）的 queryset 做一次 GROUP BY category, status，
+各 facet 的計數由同一批分組結果加總而來，不需要每個 facet 各查一次。
+
+結果依正規化後的篩選參數與 catalog version（books/cache.py）快取
+（BOOK_FACETS_CACHE_SECONDS）；書目或庫存異動後 version 遞增，舊的快取 key 隨之失效。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, QuerySet
+from rest_framework.exceptions import ValidationError
+
+from .cache import catalog_version
+
+FACET_FIELDS = ("category", "status")
+# 不影響篩選結果、不列入快取 key 的參數
+NON_FILTER_PARAMS = {"page", "page_size", "cursor", "ordering", "facets", "format", "fields", "exclude", "with"}
+UNCATEGORIZED = "未分類"
+
+
+def parse_facets(value: str | None) -> List[str]:
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in FACET_FIELDS]
+    if unknown:
+        raise ValidationError({"facets": f"不支援的 facet：{', '.join(unknown)}（可用 {', '.join(FACET_FIELDS)}）"})
+    return list(dict.fromkeys(names))
+
+
+def facet_counts(queryset: QuerySet, names: List[str]) -> Dict[str, List[Dict]]:
+    """一次分組查詢，回傳 {facet: [{value, label, count}]}，各 facet 依數量由多到少。"""
+    from .models import Book
+
+    status_labels = dict(Book.STATUS_CHOICES)
+    totals: Dict[str, Dict] = {name: {} for name in names}
+    rows = queryset.order_by().values("category", "category__name", "status").annotate(n=Count("id"))
+    for row in rows:
+        if "category" in totals:
+            label = row["category__name"] or UNCATEGORIZED
+            entry = totals["category"].setdefault(row["category"], {"value": row["category"], "label": label, "count": 0})
+            entry["count"] += row["n"]
+        if "status" in totals:
+            status = row["status"]
+            entry = totals["status"].setdefault(
+                status, {"value": status, "label": status_labels.get(status, status), "count": 0}
+            )
+            entry["count"] += row["n"]
+    return {
+        name: sorted(values.values(), key=lambda e: (-e["count"], str(e["label"])))
+        for name, values in totals.items()
+    }
+
+
+def cache_key(query_params, names: List[str]) -> str:
+    params = sorted(
+        (key, sorted(query_params.getlist(key)))
+        for key in query_params
+        if key not in NON_FILTER_PARAMS
+    )
+    raw = json.dumps([params, sorted(names)], ensure_ascii=False)
+    digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return f"books:facets:{catalog_version()}:{digest}"
+
+
+def cached_facet_counts(queryset: QuerySet, names: List[str], query_params) -> Dict[str, List[Dict]]:
+    key = cache_key(query_params, names)
+    result = cache.get(key)
+    if result is None:
+        result = facet_counts(queryset, names)
+        cache.set(key, result, timeout=int(getattr(settings, "BOOK_FACETS_CACHE_SECONDS", 300)))
+    return result
@@ -1,10 +1,14 @@
-# books/filters.py
 import django_filters
-from django.db.models import Q
+from rest_framework.filters import OrderingFilter
+
+from .fuzzy import fuzzy_search
 from .models import Book
+from .search import is_ranked, search_books
+
 
 class BookFilter(django_filters.FilterSet):
-    # 與前端對齊的關鍵字參數：?query=
+    # 與前端對齊的關鍵字參數：?query=（全文檢索，見 books/search.py）
+    # 加上 ?fuzzy=1 時改為容錯比對 title/author（見 books/fuzzy.py）
     query = django_filters.CharFilter(method="filter_query")
 
     class Meta:
@@ -12,10 +16,18 @@ class BookFilter(django_filters.FilterSet):
         fields = ["category", "status"]
 
     def filter_query(self, queryset, name, value: str):
-        if not value:
+        if not value or not value.strip():
             return queryset
-        return queryset.filter(
-            Q(title__icontains=value) |
-            Q(author__icontains=value) |
-            Q(category__name__icontains=value)
-        )
+        if str(self.data.get("fuzzy", "")).lower() in ("1", "true", "yes"):
+            return fuzzy_search(queryset, value.strip())
+        return search_books(queryset, value.strip())
+
+
+class BookOrderingFilter(OrderingFilter):
+    """未指定 ?ordering= 且有全文檢索時，依相關度排序（同分再依預設排序）。"""
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if not params and is_ranked(queryset):
+            return ["-search_rank", *(self.get_default_ordering(view) or [])]
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,149 @@
+# books/fuzzy.py
+"""書名／作者的容錯比對（?query=...&fuzzy=1）。
+
+以 trigram 相似度容忍拼字錯誤與部分比對（例如 "Murakmi" → "Murakami Haruki"）：
+
+- PostgreSQL：pg_trgm + GIN（gin_trgm_ops）索引，以 `<%`（word_similarity 超過
+  pg_trgm.word_similarity_threshold，預設 0.6）篩選、word_similarity 排序。
+- 其他資料庫：BookTrigram(gram, book) 候選索引。先以 gram 命中數取出候選，
+  再於 Python 計算與 pg_trgm 相同定義的 trigram 覆蓋率並排序。
+"""
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from typing import Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, Count, FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .search import rank_by_ids
+
+# 送進 Python 重新排序的候選上限
+FUZZY_CANDIDATES = 500
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: str) -> Set[str]:
+    """與 pg_trgm 相同：逐字詞前補兩個空白、後補一個空白後取三字元片段。"""
+    grams: Set[str] = set()
+    for word in _WORD_RE.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def book_trigrams(title: str, author: str) -> Set[str]:
+    return trigrams(title) | trigrams(author)
+
+
+def similarity(query_grams: Set[str], text: str) -> float:
+    """query 的 trigram 有多少比例出現在 text 中（近似 word_similarity）。"""
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(text)) / len(query_grams)
+
+
+def uses_database_trigrams(using: str) -> bool:
+    return connections[using].vendor == "postgresql"
+
+
+def _threshold() -> float:
+    return float(getattr(settings, "BOOK_FUZZY_THRESHOLD", 0.6))
+
+
+def sync_book_trigrams(book) -> None:
+    """非 PostgreSQL 時重寫單本書的 BookTrigram（title/author 變動時由 Book.save 呼叫）。"""
+    from .models import BookTrigram
+
+    using = book._state.db or "default"
+    if uses_database_trigrams(using):
+        return
+    BookTrigram.objects.using(using).filter(book_id=book.pk).delete()
+    BookTrigram.objects.using(using).bulk_create(
+        [BookTrigram(book_id=book.pk, gram=g) for g in book_trigrams(book.title, book.author)]
+    )
+
+
+def rebuild_trigrams(rows: Iterable[Tuple[int, str, str]], model, batch_size: int = 2000) -> int:
+    """以 (book_id, title, author) 重建 trigram 表；model 可傳入 migration 的歷史模型。"""
+    model.objects.all().delete()
+    batch: List = []
+    total = 0
+    for book_id, title, author in rows:
+        batch.extend(model(book_id=book_id, gram=g) for g in book_trigrams(title, author))
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            total += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        total += len(batch)
+    return total
+
+
+def fuzzy_search(queryset: QuerySet, value: str) -> QuerySet:
+    """容錯比對 title/author，附上 search_rank（0～1，越大越相似）。"""
+    if uses_database_trigrams(queryset.db):
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            RawSQL(f"(%s <%% {table}.title OR %s <%% {table}.author)", [value, value],
+                   output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                f"GREATEST(word_similarity(%s, {table}.title), word_similarity(%s, {table}.author))",
+                [value, value], output_field=FloatField(),
+            )
+        )
+
+    from .models import BookTrigram
+
+    query_grams = trigrams(value)
+    if not query_grams:
+        return rank_by_ids(queryset, [])
+    threshold = _threshold()
+    # 單一欄位要過門檻，至少得命中這麼多 gram；先用索引取出候選再精算
+    needed = max(math.ceil(len(query_grams) * threshold), 1)
+    candidates = (
+        BookTrigram.objects.using(queryset.db)
+        .filter(gram__in=query_grams)
+        .values("book_id")
+        .annotate(hits=Count("id"))
+        .filter(hits__gte=needed)
+        .order_by("-hits")
+        .values_list("book_id", flat=True)[:FUZZY_CANDIDATES]
+    )
+    hits = []
+    for book_id, title, author in queryset.model.objects.using(queryset.db).filter(
+        id__in=list(candidates)
+    ).values_list("id", "title", "author"):
+        score = max(similarity(query_grams, title), similarity(query_grams, author))
+        if score >= threshold:
+            hits.append((book_id, round(score, 4)))
+    return rank_by_ids(queryset, hits)
+
+
+# --- PostgreSQL 索引（migration 與 rebuild_book_search 共用） ---
+
+def install_fuzzy_index(connection) -> None:
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in ("title", "author"):
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS books_book_{column}_trgm "
+                f"ON books_book USING GIN ({column} gin_trgm_ops)"
+            )
+
+
+def drop_fuzzy_index(connection) -> None:
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for column in ("title", "author"):
+            cursor.execute(f"DROP INDEX IF EXISTS books_book_{column}_trgm")
@@ -0,0 +1,180 @@
+# books/import_workers.py
+"""import_books --workers=N：以多個行程平行解析、驗證 CSV，寫入仍由主行程負責。
+
+1. split_ranges()：主行程以 bytes.count / find 線性掃過檔案，在引號外（引號數為偶數）的
+   換行處切成約 RANGE_BYTES 的區段，並記下每段之前的換行數，供工作行程換算實際行號；
+2. parse_range()：工作行程讀取自己的位元組區段，以與批次匯入相同的 parse_record() 驗證、
+   正規化，並算好內容雜湊與 search_document（斷詞是每行最貴的一步），回傳 tuple 形式的
+   資料列、警告與（若有）第一個錯誤；主行程的 upsert_chunk() 只剩建立 Book 與寫入；
+3. iter_rows_parallel()：主行程依檔案順序取回各段結果（同時最多 workers * 2 段在途，
+   記憶體有上限），警告與資料列依行號順序送出，輸出與 iter_rows() 相同。
+
+引號數只是近似：CSV 只有欄位開頭的 " 才開始引號欄位，未加引號的欄位中的 "（ab"c）
+會讓奇偶數反轉，切點可能落在跨行欄位的中間。因此每段文字後面都接上一筆哨兵資料列
+RANGE_END：段落結束於真正的資料列邊界時，csv 會把它讀成獨立的一列；切點落在引號欄位內時，
+它會被吞進那個欄位。第一個沒有讀到哨兵的區段（依序檢查，之前的區段都已確認）之後改由
+單一行程的 iter_rows() 從該段開頭接續。引號總數為奇數時一開始就退回 iter_rows()。
+"""
+from __future__ import annotations
+
+import csv
+import io
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import django
+
+from .importer import ImportRow, ImportRowError, Row, SkippedRow, _status_rules, iter_rows, parse_record, read_header
+
+RANGE_BYTES = 4 << 20
+SCAN_BYTES = 1 << 20
+RANGE_END = "\ufdd0import_workers:range_end"
+
+# (起始位元組, 結束位元組, 區段之前的換行數)
+Range = Tuple[int, int, int]
+
+
+def _header(path: Path) -> Tuple[List[str], int, int]:
+    """回傳 (欄名, 資料起始位元組, 標題列之前的換行數)。"""
+    raw = b""
+    with path.open("rb") as fh:
+        while line := fh.readline():
+            raw += line
+            if raw.count(b'"') % 2 == 0:
+                break
+    names = read_header(io.StringIO(raw.decode("utf-8-sig"), newline=""))
+    return names, len(raw), raw.count(b"\n")
+
+
+def split_ranges(path: Path, data_start: int, lines_before: int, target: int) -> Optional[List[Range]]:
+    """在引號外的換行處切段；引號總數為奇數（不合 RFC 4180）時回傳 None。"""
+    cuts = [(data_start, lines_before)]
+    position, parity, newlines = data_start, 0, lines_before
+    cut_at = data_start + target
+    with path.open("rb") as fh:
+        fh.seek(data_start)
+        while block := fh.read(SCAN_BYTES):
+            index = 0
+            while position + len(block) > cut_at:
+                search = max(cut_at - position, index)
+                parity ^= block.count(b'"', index, search) & 1
+                newlines += block.count(b"\n", index, search)
+                index = search
+                while (nl := block.find(b"\n", index)) != -1:
+                    parity ^= block.count(b'"', index, nl) & 1
+                    newlines += 1
+                    index = nl + 1
+                    if not parity:
+                        cuts.append((position + index, newlines))
+                        cut_at = position + index + target
+                        break
+                else:
+                    # 本區塊內沒有引號外的換行，從下一個區塊開頭繼續找
+                    cut_at = position + len(block)
+            parity ^= block.count(b'"', index) & 1
+            newlines += block.count(b"\n", index)
+            position += len(block)
+    if parity:
+        return None
+    if cuts[-1][0] < position:
+        cuts.append((position, newlines))
+    return [(start, end, before) for (start, before), (end, _) in zip(cuts, cuts[1:])]
+
+
+def _is_range_end(raw) -> bool:
+    return list(raw.values()) == [RANGE_END] + [None] * (len(raw) - 1)
+
+
+def parse_range(task) -> Tuple[List[tuple], List[Tuple[int, str]], Optional[str], bool]:
+    """工作行程：解析一個區段，回傳 (資料列, 警告, 第一個錯誤, 是否結束於資料列邊界)。
+
+    資料列以 tuple 回傳（skip 的行為 (行號, title, author)），pickle 比逐列帶類別參照便宜。
+    最後一項為 False 時切點落在引號欄位內，本段之後的結果都不可用。
+    """
+    path, start, end, lines_before, fieldnames, start_line, valid_status, default_status = task
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        text = fh.read(end - start).decode("utf-8")
+    if text and text[-1] not in "\r\n":
+        text += "\n"  # 檔案最後一列沒有換行
+    reader = csv.DictReader(io.StringIO(f"{text}{RANGE_END}\n", newline=""), fieldnames=fieldnames)
+    rows: List[tuple] = []
+    warnings: List[Tuple[int, str]] = []
+    error = None
+    line = 0
+
+    def warn(message: str) -> None:
+        warnings.append((line, message))
+
+    for raw in reader:
+        if _is_range_end(raw):
+            return rows, warnings, error, True
+        if error is not None:
+            continue  # 出錯後仍讀到結尾，確認切點是否正確（錯誤可能只是切錯造成的）
+        line = lines_before + reader.line_num
+        if line <= start_line:
+            continue
+        try:
+            row = parse_record(raw, line, valid_status, default_status, warn, with_document=True)
+        except ImportRowError as exc:
+            error = str(exc)
+            continue
+        rows.append(tuple(row) if isinstance(row, ImportRow) else (line, *row))
+    return rows, warnings, error, False
+
+
+def iter_rows_parallel(
+    path: Path, workers: int, *, start_line: int = 0, warn=None, notice=None
+) -> Iterator[Tuple[int, Row]]:
+    """與 iter_rows() 相同的輸出，解析與驗證分散到 workers 個行程。"""
+    warn = warn or (lambda message: None)
+    fieldnames, data_start, header_lines = _header(path)
+    ranges = split_ranges(path, data_start, header_lines, RANGE_BYTES)
+    if ranges is None:
+        if notice:
+            notice("CSV 的引號不成對，無法安全切段，改用單一行程解析。")
+        yield from iter_rows(path, start_line=start_line, warn=warn)
+        return
+
+    valid_status, default_status = _status_rules()
+    # 續傳時略過整段都已提交的區段（下一段之前的換行數 <= start_line）
+    ends = [before for _, _, before in ranges[1:]] + [None]
+    tasks = iter([
+        (str(path), start, end, before, fieldnames, start_line, valid_status, default_status)
+        for (start, end, before), last in zip(ranges, ends)
+        if last is None or last > start_line
+    ])
+    # spawn：主行程可能已有執行緒與資料庫連線，fork 不安全；工作行程以 django.setup() 初始化
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup
+    )
+    try:
+        # (區段之前的換行數, future)
+        pending = deque((task[3], pool.submit(parse_range, task)) for task in islice(tasks, workers * 2))
+        while pending:
+            before, future = pending.popleft()
+            rows, warnings, error, clean = future.result()
+            if not clean:
+                if notice:
+                    notice(f"第 {before + 1} 行起的區段切在跨行的引號欄位內，之後改用單一行程解析。")
+                pool.shutdown(wait=False, cancel_futures=True)
+                yield from iter_rows(path, start_line=max(start_line, before), warn=warn)
+                return
+            for task in islice(tasks, 1):
+                pending.append((task[3], pool.submit(parse_range, task)))
+            w = 0
+            for row in rows:
+                while w < len(warnings) and warnings[w][0] <= row[0]:
+                    warn(warnings[w][1])
+                    w += 1
+                yield row[0], ImportRow._make(row) if len(row) > 3 else SkippedRow._make(row[1:])
+            for _, message in warnings[w:]:
+                warn(message)
+            if error:
+                raise ImportRowError(error)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
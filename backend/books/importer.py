@@ -0,0 +1,378 @@
+# books/importer.py
+"""書籍 CSV 匯入（import_books 指令）的串流批次 upsert。
+
+- iter_rows()：逐行讀取與驗證 CSV，不把整個檔案載入記憶體；skip 的行產生 SkippedRow；
+- upsert_chunk()：一個 chunk 在一個交易內完成——
+  1. 分類名稱一次查出，缺的以 bulk_create(ignore_conflicts=True) 補上；
+  2. 一次查出 chunk 內已存在的 (title, author) 與其舊分類、import_hash；
+     內容雜湊（ImportRow.content_hash）與上次匯入相同的行整行略過，不寫入也不動 updated_at；
+  3. 其餘的行以 Book.objects.bulk_create(update_conflicts=True) 與 uniq_book_title_author 為衝突鍵寫入，
+     search_document 事先算好（平行解析時已由工作行程算好）；
+  4. 新增的書補上 BookTrigram（非 PostgreSQL；title/author 即衝突鍵，更新的書不必重算）；
+  5. chunk 列出的書（含未變更與 skip 的行）都蓋上本次匯入的 import_run。
+- absent_books() / mark_removed()：來源檔已不再列出、但先前由匯入寫入（import_hash 非空）的書，
+  即 import_run 不是本次匯入的書，在資料庫端以一個查詢找出；可選擇標記為 unavailable。
+- finish_import()：匯入結束後讓書目快取、行程內搜尋／自動完成索引整批失效
+  （bulk_create 不觸發 Book 的 signal）。
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import re
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog_index, suggest
+from .availability import invalidate_availability_on_commit
+from .cache import bump_catalog_version_on_commit
+from .counters import category_deltas
+from .fuzzy import book_trigrams, uses_database_trigrams
+from .models import Book, BookTrigram, Category
+from .search import build_document
+
+REQUIRED_COLUMNS = {"title", "author", "category", "total_copies", "available_copies", "skip"}
+UPSERT_FIELDS = [
+    "category", "total_copies", "available_copies", "status", "search_document", "import_hash", "import_run",
+    "updated_at",
+]
+HASH_SEPARATOR = "\x1f"
+REMOVED_STATUS = "unavailable"
+# str.strip() 去除的所有空白字元（含 U+3000 全形空白、U+00A0）；COPY 引擎在 SQL 端以同一組字元
+# btrim，兩種 engine 得到相同的 (title, author) 鍵與內容雜湊。U+3000 之後沒有其他空白字元。
+WHITESPACE = "".join(ch for ch in map(chr, range(0x3001)) if ch.isspace())
+MARK_BATCH = 1000
+# 複本數欄位接受的數字格式（兩種 engine 共用，COPY 在 SQL 端以同一個正規表示式驗證）：
+# float() 的 ASCII 十進位寫法，數字之間可有單一底線（1_000）；不接受 inf、nan 與全形等非 ASCII 數字
+_DIGITS = r"[0-9](_?[0-9])*"
+NUMBER_PATTERN = rf"^[+-]?({_DIGITS}(\.({_DIGITS})?)?|\.{_DIGITS})([eE][+-]?{_DIGITS})?$"
+_NUMBER_RE = re.compile(NUMBER_PATTERN)
+
+
+class ImportRowError(ValueError):
+    """CSV 內容有誤（訊息已含行號）。"""
+
+
+class ImportRow(NamedTuple):
+    # NamedTuple：建立成本約為 frozen dataclass 的一半，平行解析時主行程逐列重建
+    line: int
+    title: str
+    author: str
+    category: str
+    total_copies: int
+    available_copies: int
+    status: str
+    # 正規化後的內容雜湊（見 content_hash()），解析時算好
+    content_hash: str
+    # 平行解析時由工作行程先算好；空字串表示寫入時才算（只有需要寫入的行才付斷詞成本）
+    search_document: str = ""
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.title, self.author
+
+
+class SkippedRow(NamedTuple):
+    """skip 的行：不寫入，但 (title, author) 仍是來源列出的書，不算「來源已無」。"""
+    title: str
+    author: str
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.title, self.author
+
+
+Row = Union[ImportRow, SkippedRow]
+
+
+def content_hash(title: str, author: str, category: str, total_copies: int, available_copies: int, status: str) -> str:
+    """正規化後的內容雜湊；copy_import 以 SQL 的 md5(concat_ws(...)) 算出相同的值。"""
+    values = (title, author, category, str(total_copies), str(available_copies), status)
+    return hashlib.md5(HASH_SEPARATOR.join(values).encode("utf-8")).hexdigest()
+
+
+def new_run() -> str:
+    """一次批次匯入的識別碼（Book.import_run）；續傳時由進度檔沿用。"""
+    return str(uuid.uuid4())
+
+
+@dataclass
+class ImportStats:
+    created: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    removed: int = 0
+    categories_created: int = 0
+    warnings: int = 0
+
+    def add(self, other: "ImportStats") -> None:
+        self.created += other.created
+        self.changed += other.changed
+        self.unchanged += other.unchanged
+        self.skipped += other.skipped
+        self.removed += other.removed
+        self.categories_created += other.categories_created
+        self.warnings += other.warnings
+
+    @property
+    def rows(self) -> int:
+        return self.created + self.changed + self.unchanged + self.skipped
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "created": self.created,
+            "changed": self.changed,
+            "unchanged": self.unchanged,
+            "skipped": self.skipped,
+            "removed": self.removed,
+            "categories_created": self.categories_created,
+            "warnings": self.warnings,
+        }
+
+
+def _should_skip(raw_value: Optional[str]) -> bool:
+    if raw_value is None:
+        return False
+    return str(raw_value).strip().lower() in {"1", "true", "yes", "y"}
+
+
+def _safe_int(raw_value: Optional[str], *, default: int, line: int, name: str) -> int:
+    value = "" if raw_value is None else str(raw_value).strip()
+    if value == "":
+        return default
+    if _NUMBER_RE.fullmatch(value):
+        try:
+            return int(float(value))
+        except OverflowError:
+            pass
+    raise ImportRowError(f"第 {line} 行欄位 {name} 的值無法轉換為整數：{raw_value}")
+
+
+def _status_rules() -> Tuple[frozenset, str]:
+    return frozenset(choice[0] for choice in Book.STATUS_CHOICES), Book._meta.get_field("status").default
+
+
+def parse_record(
+    row: Dict[str, Optional[str]], line: int, valid_status, default_status, warn, *, with_document: bool = False
+) -> Row:
+    """驗證並正規化一筆資料；skip 的行不驗證，回傳 SkippedRow。批次匯入與平行解析（books/import_workers.py）共用。
+
+    with_document=True 時一併算好 search_document（平行解析時在工作行程內做，主行程只負責寫入）。
+    """
+    title = (row.get("title") or "").strip()
+    author = (row.get("author") or "").strip()
+    if _should_skip(row.get("skip")):
+        return SkippedRow(title, author)
+    if not title or not author:
+        raise ImportRowError(f"第 {line} 行缺少必要欄位（title/author）。")
+
+    total_copies = _safe_int(row.get("total_copies"), default=1, line=line, name="total_copies")
+    available_copies = _safe_int(
+        row.get("available_copies"), default=total_copies, line=line, name="available_copies"
+    )
+    if available_copies > total_copies:
+        warn(
+            f"第 {line} 行 available_copies ({available_copies}) "
+            f"超過 total_copies ({total_copies})，已自動調整。"
+        )
+        available_copies = total_copies
+    if available_copies < 0:
+        warn(f"第 {line} 行 available_copies ({available_copies}) 為負值，已調整為 0。")
+        available_copies = 0
+    if total_copies < 0:
+        warn(f"第 {line} 行 total_copies ({total_copies}) 為負值，已調整為 0。")
+        total_copies = 0
+
+    status = (row.get("status") or default_status or "").strip() or default_status
+    if status not in valid_status:
+        raise ImportRowError(f"第 {line} 行的 status 值無效：{status}。")
+
+    category = (row.get("category") or "").strip()
+    return ImportRow(
+        line=line,
+        title=title,
+        author=author,
+        category=category,
+        total_copies=total_copies,
+        available_copies=available_copies,
+        status=status,
+        content_hash=content_hash(title, author, category, total_copies, available_copies, status),
+        search_document=build_document(title, author, category) if with_document else "",
+    )
+
+
+def read_header(csvfile) -> List[str]:
+    """讀取並檢查標題列，回傳 DictReader 用的欄名。"""
+    header = next(csv.reader(csvfile), None)
+    if not header:
+        raise ImportRowError("CSV 檔案沒有標題列。")
+    missing = REQUIRED_COLUMNS - set(name.strip() for name in header)
+    if missing:
+        raise ImportRowError(f"CSV 缺少必要欄位：{', '.join(sorted(missing))}")
+    return header
+
+
+def iter_rows(path: Path, *, start_line: int = 0, warn=None) -> Iterator[Tuple[int, Row]]:
+    """逐行產生 (行號, ImportRow)；skip 的行產生 (行號, SkippedRow)。行號 <= start_line 的資料列直接略過（續傳）。
+
+    行號為檔案中的實際行號（資料跨行時為該筆的最後一行）。
+    warn(message) 會收到自動修正的提示（複本數超過總數等）。
+    """
+    valid_status, default_status = _status_rules()
+    warn = warn or (lambda message: None)
+
+    with path.open("r", encoding="utf-8-sig", newline="") as csvfile:
+        reader = csv.DictReader(csvfile, fieldnames=read_header(csvfile))
+        for row in reader:
+            line = reader.line_num + 1  # 標題列已先讀出，為第 1 行
+            if line <= start_line:
+                continue
+            yield line, parse_record(row, line, valid_status, default_status, warn)
+
+
+class CategoryResolver:
+    """分類名稱 → id；快取大小只隨分類數成長，與檔案大小無關。"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+
+    def resolve(self, names) -> int:
+        """確保 names 都有對應的分類，回傳新建的分類數。"""
+        missing = {name for name in names if name and name not in self._ids}
+        if not missing:
+            return 0
+        self._ids.update(Category.objects.filter(name__in=missing).values_list("name", "id"))
+        to_create = missing - self._ids.keys()
+        if to_create:
+            Category.objects.bulk_create([Category(name=name) for name in sorted(to_create)], ignore_conflicts=True)
+            self._ids.update(Category.objects.filter(name__in=to_create).values_list("name", "id"))
+        return len(to_create)
+
+    def get(self, name: str) -> Optional[int]:
+        return self._ids.get(name) if name else None
+
+    def forget(self) -> None:
+        # chunk 交易回滾時新建的分類也一併消失
+        self._ids.clear()
+
+
+def _books_by_key(keys, *fields):
+    """以 title IN (...) 查出後在 Python 端比對 (title, author)；避免上千個 OR 條件。"""
+    keys = set(keys)
+    rows = Book.objects.filter(title__in={title for title, _ in keys}).values_list("title", "author", *fields)
+    return {(row[0], row[1]): row[2:] for row in rows if (row[0], row[1]) in keys}
+
+
+def _existing(keys) -> Dict[Tuple[str, str], Tuple[int, Optional[int], str]]:
+    """chunk 內已存在的 (title, author) → (id, 目前的 category_id, import_hash)。"""
+    return _books_by_key(keys, "id", "category_id", "import_hash")
+
+
+def upsert_chunk(rows: List[Row], categories: CategoryResolver, *, run: Optional[str] = None) -> ImportStats:
+    """在一個交易內寫入一個 chunk；同一 chunk 內重複的 (title, author) 以最後一行為準。
+
+    被後面同鍵行蓋掉的行計入 changed，因此 created + changed + unchanged 等於非略過的行數。
+    run 不為 None 時，chunk 列出的書（含未變更、skip 的行）都蓋上 import_run = run（見 absent_books()）。
+    """
+    stats = ImportStats()
+    imported = [row for row in rows if isinstance(row, ImportRow)]
+    latest = {row.key: row for row in imported}
+    listed = latest.keys() if run is None else {row.key for row in rows}
+    if not listed:
+        return stats
+    try:
+        with transaction.atomic():
+            existing = _existing(listed)
+            pending = [
+                row for key, row in latest.items() if key not in existing or existing[key][2] != row.content_hash
+            ]
+            stats.unchanged = len(latest) - len(pending)
+            stats.categories_created = categories.resolve(row.category for row in pending)
+            before = {row.key: existing[row.key][1] for row in pending if row.key in existing}
+            books = [
+                Book(
+                    title=row.title,
+                    author=row.author,
+                    category_id=categories.get(row.category),
+                    total_copies=row.total_copies,
+                    available_copies=row.available_copies,
+                    status=row.status,
+                    search_document=row.search_document or build_document(row.title, row.author, row.category),
+                    import_hash=row.content_hash,
+                    import_run=run,
+                )
+                for row in pending
+            ]
+            if books:
+                deltas = category_deltas(
+                    Counter(before.values()), Counter(book.category_id for book in books)
+                )
+                Book.objects.bulk_create(
+                    books,
+                    update_conflicts=True,
+                    unique_fields=["title", "author"],
+                    update_fields=UPSERT_FIELDS,
+                    category_deltas=deltas,
+                )
+            if run is not None:
+                written = {row.key for row in pending}
+                untouched = [existing[key][0] for key in listed - written if key in existing]
+                if untouched:
+                    Book.objects.filter(pk__in=untouched).update(import_run=run)
+            created_keys = [row.key for row in pending if row.key not in existing]
+            if created_keys and not uses_database_trigrams("default"):
+                _add_trigrams(created_keys)
+            stats.created = len(created_keys)
+            stats.changed = len(imported) - stats.created - stats.unchanged
+    except Exception:
+        categories.forget()
+        raise
+    return stats
+
+
+def _add_trigrams(keys) -> None:
+    grams = [
+        BookTrigram(book_id=book_id, gram=gram)
+        for (title, author), (book_id,) in _books_by_key(keys, "id").items()
+        for gram in book_trigrams(title, author)
+    ]
+    BookTrigram.objects.bulk_create(grams, batch_size=2000, ignore_conflicts=True)
+
+
+def absent_books(run: str):
+    """先前由匯入寫入、但匯入 run 沒有列出的書（import_hash 為空的書不屬於來源，不列入）。
+
+    upsert_chunk(run=run) 為每一行列出的書蓋上 import_run，這裡只剩一個 SQL 條件，
+    不必把來源的鍵載入記憶體。
+    """
+    return Book.objects.exclude(import_hash="").exclude(import_run=run)
+
+
+def mark_removed(ids: List[int]) -> int:
+    """標記為 unavailable 並清掉 import_hash：之後來源再列出時視為變更、重新寫入。"""
+    with transaction.atomic():
+        for start in range(0, len(ids), MARK_BATCH):
+            Book.objects.filter(pk__in=ids[start:start + MARK_BATCH]).update(
+                status=REMOVED_STATUS, import_hash="", updated_at=timezone.now()
+            )
+        invalidate_availability_on_commit(*ids)
+    return len(ids)
+
+
+def finish_import(*, reindex: bool = True) -> None:
+    """bulk_create 不會觸發 Book 的 signal：讓書目快取失效；reindex（有書新增或變更）時行程內索引也整批重建。
+
+    只標記下架（mark_removed）時書名、作者、分類都沒變，傳 reindex=False，其他行程不必重建索引。
+    """
+    with transaction.atomic():
+        bump_catalog_version_on_commit()
+        if reindex:
+            transaction.on_commit(catalog_index.invalidate)
+            transaction.on_commit(suggest.invalidate)
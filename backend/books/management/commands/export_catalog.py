@@ -0,0 +1,39 @@
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from books.exporter import ENCODERS, EXPORTS, chunk_size, stream
+
+
+class Command(BaseCommand):
+    help = "Export books, loans or favorites as CSV / NDJSON (books.csv can be re-imported with import_books)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("resource", choices=sorted(EXPORTS), help="要匯出的資料。")
+        parser.add_argument("--format", dest="fmt", choices=sorted(ENCODERS), default="csv", help="輸出格式。")
+        parser.add_argument("--output", "-o", help="輸出檔路徑；未指定時寫到標準輸出。")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=0,
+            help="伺服器端游標每次取回的列數，預設為 EXPORT_CHUNK_SIZE。",
+        )
+
+    def handle(self, *args, **options):
+        size = max(options["chunk_size"], 0) or chunk_size()
+        chunks = stream(options["resource"], options["fmt"], size)
+        if not options.get("output"):
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        path = Path(options["output"])
+        started = perf_counter()
+        with path.open("w", encoding="utf-8", newline="") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"已匯出 {options['resource']} 至 {path}（{path.stat().st_size:,} bytes，耗時 {elapsed:.2f} 秒）。"
+        ))
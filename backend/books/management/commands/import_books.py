@@ -1,21 +1,28 @@
-import csv
-from dataclasses import dataclass
+import json
+import os
 from pathlib import Path
-from typing import Optional
+from time import perf_counter
+from typing import List, Optional
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
 
-from books.models import Book, Category
-
-
-@dataclass(frozen=True)
-class ImportStats:
-    created: int = 0
-    updated: int = 0
-    skipped: int = 0
-    categories_created: int = 0
+from books.copy_import import copy_import, supports_copy
+from books.import_workers import iter_rows_parallel
+from books.importer import (
+    REMOVED_STATUS,
+    CategoryResolver,
+    ImportRowError,
+    ImportStats,
+    Row,
+    SkippedRow,
+    absent_books,
+    finish_import,
+    iter_rows,
+    mark_removed,
+    new_run,
+    upsert_chunk,
+)
 
 
 class Command(BaseCommand):
@@ -27,28 +34,156 @@ class Command(BaseCommand):
             nargs="?",
             help="Path to the CSV file. Defaults to 'books_seed.csv' inside the backend directory.",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="每個交易寫入的行數（每批提交一次）。",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="從進度檔記錄的最後提交行之後繼續匯入。",
+        )
+        parser.add_argument(
+            "--progress-file",
+            help="進度檔路徑，預設為 CSV 檔名加上 .progress.json；匯入完成後自動刪除。",
+        )
+        parser.add_argument(
+            "--engine",
+            choices=["batch", "copy"],
+            default="batch",
+            help="batch：分批 upsert（可續傳）；copy：PostgreSQL 以 COPY 暫存表整檔合併，其他資料庫改用 batch。",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="batch 引擎以幾個行程平行解析、驗證 CSV（寫入仍由單一行程負責）；0 = CPU 核心數。",
+        )
+        parser.add_argument(
+            "--mark-missing",
+            action="store_true",
+            help=f"將先前匯入、但這次 CSV 未列出的書標記為 {REMOVED_STATUS}。",
+        )
 
     def handle(self, *args, **options):
-        csv_path = options.get("csv_path")
-        path = self._resolve_path(csv_path)
-
+        path = self._resolve_path(options.get("csv_path"))
         if not path.exists():
             raise CommandError(f"CSV 檔案不存在：{path}")
 
-        self.stdout.write(f"開始匯入書籍資料：{path}")
-
-        with transaction.atomic():
-            stats, warnings = self._import_from_csv(path)
-            if warnings:
-                self.stdout.write(self.style.WARNING("注意："))
-                for message in warnings:
-                    self.stdout.write(f"  - {message}")
+        workers = options["workers"] if options["workers"] > 0 else (os.cpu_count() or 1)
+        if options["engine"] == "copy":
+            if options["resume"]:
+                raise CommandError("--engine=copy 整檔在一個交易內完成，不支援 --resume。")
+            if supports_copy():
+                if workers > 1:
+                    raise CommandError("--workers 只適用批次匯入；--engine=copy 由資料庫解析 CSV。")
+                return self._copy(path, options["mark_missing"])
+            self.stdout.write(self.style.WARNING("注意：目前的資料庫不支援 COPY，改用批次匯入。"))
+
+        chunk_size = max(int(options["chunk_size"]), 1)
+        progress_path = (
+            self._resolve_path(options["progress_file"])
+            if options.get("progress_file")
+            else path.with_name(path.name + ".progress.json")
+        )
+        start_line, stats, run = 0, ImportStats(), new_run()
+        if options["resume"] and progress_path.exists():
+            start_line, stats, run = self._load_progress(progress_path, path)
+
+        if start_line:
+            self.stdout.write(f"開始匯入書籍資料：{path}（自第 {start_line + 1} 行續傳）")
+        else:
+            self.stdout.write(f"開始匯入書籍資料：{path}")
+
+        categories = CategoryResolver()
+        chunk: List[Row] = []
+        pending = ImportStats()
+        committed_line = last_line = start_line
+        lines = 0
+        wrote = False  # 本次執行是否寫入過書籍：沒有時不必讓快取與各行程的索引失效
+        started = perf_counter()
+
+        def warn(message: str) -> None:
+            pending.warnings += 1
+            self.stdout.write(self.style.WARNING(f"注意：{message}"))
+
+        def flush() -> None:
+            nonlocal chunk, pending, committed_line, wrote
+            written = upsert_chunk(chunk, categories, run=run)
+            wrote = wrote or bool(written.created or written.changed)
+            written.skipped, written.warnings = pending.skipped, pending.warnings
+            stats.add(written)
+            committed_line = last_line
+            self._save_progress(progress_path, path, committed_line, stats, run)
+            chunk, pending = [], ImportStats()
+            if options["verbosity"] >= 2:
+                elapsed = perf_counter() - started
+                self.stdout.write(f"  已提交至第 {committed_line} 行（本次 {lines} 行，{lines / elapsed:,.0f} 行/秒）")
 
-            summary = (
-                f"完成匯入：新增 {stats.created} 筆、更新 {stats.updated} 筆、"
-                f"略過 {stats.skipped} 筆、產生 {stats.categories_created} 個新分類。"
+        try:
+            if workers > 1:
+                rows = iter_rows_parallel(
+                    path,
+                    workers,
+                    start_line=start_line,
+                    warn=warn,
+                    notice=lambda message: self.stdout.write(self.style.WARNING(f"注意：{message}")),
+                )
+            else:
+                rows = iter_rows(path, start_line=start_line, warn=warn)
+            for line, row in rows:
+                last_line = line
+                lines += 1
+                chunk.append(row)
+                if isinstance(row, SkippedRow):
+                    pending.skipped += 1
+                if len(chunk) >= chunk_size:
+                    flush()
+            if chunk or pending.warnings:
+                flush()
+        except ImportRowError as exc:
+            hint = f"已提交至第 {committed_line} 行，修正後可加上 --resume 續傳。" if committed_line > start_line else ""
+            raise CommandError(f"{exc}{hint}") from exc
+        finally:
+            if wrote:
+                finish_import()
+
+        progress_path.unlink(missing_ok=True)
+        absent = absent_books(run)
+        stats.removed = absent.count()
+        if stats.removed and options["mark_missing"]:
+            mark_removed(list(absent.values_list("pk", flat=True)))
+            finish_import(reindex=False)
+        self._summary(stats, lines, perf_counter() - started, options["mark_missing"])
+
+    def _copy(self, path: Path, mark_missing: bool) -> None:
+        self.stdout.write(f"開始匯入書籍資料：{path}（COPY 暫存表）")
+        started = perf_counter()
+        try:
+            stats = copy_import(
+                path,
+                mark_missing=mark_missing,
+                warn=lambda message: self.stdout.write(self.style.WARNING(f"注意：{message}")),
             )
-            self.stdout.write(self.style.SUCCESS(summary))
+        except ImportRowError as exc:
+            raise CommandError(f"{exc}未寫入任何資料。") from exc
+        elapsed = perf_counter() - started
+        self._summary(stats, stats.rows, elapsed, mark_missing)
+
+    def _summary(self, stats: ImportStats, lines: int, elapsed: float, mark_missing: bool) -> None:
+        summary = (
+            f"完成匯入：新增 {stats.created} 筆、變更 {stats.changed} 筆、未變更 {stats.unchanged} 筆、"
+            f"略過 {stats.skipped} 筆、來源已無 {stats.removed} 筆、產生 {stats.categories_created} 個新分類。"
+        )
+        self.stdout.write(self.style.SUCCESS(summary))
+        if stats.removed:
+            if mark_missing:
+                self.stdout.write(f"來源已無的 {stats.removed} 筆已標記為 {REMOVED_STATUS}。")
+            else:
+                self.stdout.write(f"加上 --mark-missing 可將來源已無的 {stats.removed} 筆標記為 {REMOVED_STATUS}。")
+        self.stdout.write(f"本次處理 {lines} 行，耗時 {elapsed:.2f} 秒（{lines / max(elapsed, 1e-9):,.0f} 行/秒）。")
 
     def _resolve_path(self, user_path: Optional[str]) -> Path:
         base_dir = Path(settings.BASE_DIR)
@@ -60,136 +195,18 @@ class Command(BaseCommand):
             return candidate
         return (base_dir / candidate).resolve()
 
-    def _import_from_csv(self, path: Path) -> tuple[ImportStats, list[str]]:
-        created = 0
-        updated = 0
-        skipped = 0
-        categories_created = 0
-        warnings: list[str] = []
-
-        with path.open("r", encoding="utf-8-sig", newline="") as csvfile:
-            reader = csv.DictReader(csvfile)
-            required_columns = {
-                "title",
-                "author",
-                "category",
-                "total_copies",
-                "available_copies",
-                "skip",
-            }
-            if reader.fieldnames is None:
-                raise CommandError("CSV 檔案沒有標題列。")
-
-            missing = required_columns - set(name.strip() for name in reader.fieldnames)
-            if missing:
-                raise CommandError(f"CSV 缺少必要欄位：{', '.join(sorted(missing))}")
-
-            category_cache: dict[str, Category] = {}
-            valid_status = {choice[0] for choice in Book.STATUS_CHOICES}
-            default_status = Book._meta.get_field("status").default
-
-            for row_index, row in enumerate(reader, start=2):  # Header 為第 1 行
-                if self._should_skip(row.get("skip")):
-                    skipped += 1
-                    continue
-
-                title = (row.get("title") or "").strip()
-                author = (row.get("author") or "").strip()
-                if not title or not author:
-                    raise CommandError(
-                        f"第 {row_index} 行缺少必要欄位（title/author）。"
-                    )
-
-                category_name = (row.get("category") or "").strip()
-                if category_name:
-                    category = category_cache.get(category_name)
-                    if category is None:
-                        category, created_flag = Category.objects.get_or_create(
-                            name=category_name
-                        )
-                        category_cache[category_name] = category
-                        if created_flag:
-                            categories_created += 1
-                else:
-                    category = None
-
-                total_copies = self._safe_int(
-                    row.get("total_copies"), default=1, row_index=row_index, field="total_copies"
-                )
-                available_copies = self._safe_int(
-                    row.get("available_copies"),
-                    default=total_copies,
-                    row_index=row_index,
-                    field="available_copies",
-                )
-
-                if available_copies > total_copies:
-                    warnings.append(
-                        f"第 {row_index} 行 available_copies ({available_copies}) "
-                        f"超過 total_copies ({total_copies})，已自動調整。"
-                    )
-                    available_copies = total_copies
-                if available_copies < 0:
-                    warnings.append(
-                        f"第 {row_index} 行 available_copies ({available_copies}) "
-                        "為負值，已調整為 0。"
-                    )
-                    available_copies = 0
-                if total_copies < 0:
-                    warnings.append(
-                        f"第 {row_index} 行 total_copies ({total_copies}) 為負值，已調整為 0。"
-                    )
-                    total_copies = 0
-
-                status_value = (row.get("status") or default_status or "").strip() or default_status
-                if status_value not in valid_status:
-                    raise CommandError(
-                        f"第 {row_index} 行的 status 值無效：{status_value}。"
-                    )
-
-                book, created_flag = Book.objects.update_or_create(
-                    title=title,
-                    author=author,
-                    defaults={
-                        "category": category,
-                        "total_copies": total_copies,
-                        "available_copies": available_copies,
-                        "status": status_value,
-                    },
-                )
-
-                if created_flag:
-                    created += 1
-                else:
-                    updated += 1
-
-        return ImportStats(
-            created=created,
-            updated=updated,
-            skipped=skipped,
-            categories_created=categories_created,
-        ), warnings
-
-    def _should_skip(self, raw_value: Optional[str]) -> bool:
-        if raw_value is None:
-            return False
-        value = str(raw_value).strip().lower()
-        return value in {"1", "true", "yes", "y"}
-
-    def _safe_int(
-        self,
-        raw_value: Optional[str],
-        *,
-        default: int,
-        row_index: int,
-        field: str,
-    ) -> int:
-        if raw_value is None or str(raw_value).strip() == "":
-            return default
+    def _load_progress(self, progress_path: Path, path: Path):
         try:
-            return int(float(str(raw_value).strip()))
-        except ValueError as exc:  # pragma: no cover - defensive
-            raise CommandError(
-                f"第 {row_index} 行欄位 {field} 的值無法轉換為整數：{raw_value}"
-            ) from exc
-
+            state = json.loads(progress_path.read_text(encoding="utf-8"))
+            if state["path"] != str(path):
+                raise CommandError(f"進度檔 {progress_path} 屬於另一個檔案：{state['path']}")
+            return int(state["line"]), ImportStats(**state["stats"]), str(state["run"])
+        except (ValueError, KeyError, TypeError) as exc:
+            raise CommandError(f"無法讀取進度檔 {progress_path}：{exc}") from exc
+
+    def _save_progress(self, progress_path: Path, path: Path, line: int, stats: ImportStats, run: str) -> None:
+        tmp = progress_path.with_name(progress_path.name + ".tmp")
+        # run：續傳時沿用同一個 import_run，先前提交的行才不會被當成「來源已無」
+        state = {"path": str(path), "line": line, "stats": stats.as_dict(), "run": run}
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, progress_path)
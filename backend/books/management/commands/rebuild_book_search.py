@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from books.cache import bump_catalog_version_on_commit
+from books.fuzzy import install_fuzzy_index, rebuild_trigrams, uses_database_trigrams
+from books.models import Book, BookTrigram
+from books.search import install_search_index, refresh_documents
+
+
+class Command(BaseCommand):
+    help = "Recompute book search documents and repair the full-text and fuzzy indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="每批寫回的書籍數量。",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(int(options["batch_size"]), 1)
+        self.stdout.write("開始重建書籍全文索引…")
+        grams = 0
+        with transaction.atomic():
+            updated = refresh_documents(Book.objects.all(), batch_size=batch_size)
+            if not uses_database_trigrams(connection.alias):
+                rows = Book.objects.values_list("id", "title", "author").iterator(chunk_size=batch_size)
+                grams = rebuild_trigrams(rows, BookTrigram)
+            install_search_index(connection)
+            install_fuzzy_index(connection)
+            bump_catalog_version_on_commit()
+        self.stdout.write(self.style.SUCCESS(
+            f"完成重建：更新 {updated} 筆 search_document、寫入 {grams} 筆 trigram"
+            f"（資料庫：{connection.vendor}）。"
+        ))
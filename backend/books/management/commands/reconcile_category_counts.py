@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.cache import bump_catalog_version_on_commit
+from books.counters import reconcile_book_counts
+
+
+class Command(BaseCommand):
+    help = "Recount books per category and fix drifted Category.book_count values."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="只檢查並回報不一致的分類數，不寫回。",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        with transaction.atomic():
+            fixed = reconcile_book_counts(dry_run=dry_run)
+            if fixed and not dry_run:
+                bump_catalog_version_on_commit()
+        if dry_run:
+            self.stdout.write(f"檢查完成：{fixed} 個分類的 book_count 與實際書籍數不符。")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"完成校正：修正 {fixed} 個分類的 book_count。"))
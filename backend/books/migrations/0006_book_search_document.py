@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:35
+
+from django.db import migrations, models
+
+from books.search import build_document, drop_search_index, install_search_index
+
+
+def install_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+def backfill_documents(apps, schema_editor):
+    Book = apps.get_model("books", "Book")
+    batch = []
+    for book in Book.objects.select_related("category").iterator(chunk_size=1000):
+        category = book.category.name if book.category_id else ""
+        book.search_document = build_document(book.title, book.author, category)
+        batch.append(book)
+        if len(batch) >= 1000:
+            Book.objects.bulk_update(batch, ["search_document"])
+            batch = []
+    if batch:
+        Book.objects.bulk_update(batch, ["search_document"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_remove_book_isbn'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(install_index, drop_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
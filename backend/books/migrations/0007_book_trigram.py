@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from books.fuzzy import drop_fuzzy_index, install_fuzzy_index, rebuild_trigrams
+
+
+def install_index(apps, schema_editor):
+    install_fuzzy_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    drop_fuzzy_index(schema_editor.connection)
+
+
+def backfill_trigrams(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        return
+    Book = apps.get_model("books", "Book")
+    BookTrigram = apps.get_model("books", "BookTrigram")
+    rows = Book.objects.values_list("id", "title", "author").iterator(chunk_size=1000)
+    rebuild_trigrams(rows, BookTrigram)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_book_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='books.book')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('gram', 'book'), name='uniq_book_trigram')],
+            },
+        ),
+        migrations.RunPython(install_index, drop_index),
+        migrations.RunPython(backfill_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+from books.counters import reconcile_book_counts
+
+
+def backfill_book_counts(apps, schema_editor):
+    reconcile_book_counts(
+        apps.get_model("books", "Book"),
+        apps.get_model("books", "Category"),
+        using=schema_editor.connection.alias,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_books_book_title_eba785_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='掛書數'),
+        ),
+        migrations.RunPython(backfill_book_counts, migrations.RunPython.noop),
+    ]
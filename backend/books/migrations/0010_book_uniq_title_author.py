@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:24
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from books.search import install_search_index
+
+
+def check_duplicates(apps, schema_editor):
+    # 重複的書可能已有借閱紀錄（Loan.book 為 PROTECT），不自動合併，請先人工處理
+    Book = apps.get_model("books", "Book")
+    duplicates = list(
+        Book.objects.values("title", "author").annotate(n=Count("id")).filter(n__gt=1).order_by("title")[:20]
+    )
+    if duplicates:
+        listing = "、".join(f"《{row['title']}》/{row['author']}（{row['n']} 筆）" for row in duplicates)
+        raise RuntimeError(f"books_book 有重複的 (title, author)，請先合併後再執行 migrate：{listing}")
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite 加 unique constraint 會重建 books_book，FTS trigger 隨之消失
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_category_book_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(fields=('title', 'author'), name='uniq_book_title_author'),
+        ),
+        migrations.RunPython(reinstall_search_index, reinstall_search_index),
+    ]
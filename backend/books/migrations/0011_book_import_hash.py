@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+from books.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # SQLite 加有預設值的欄位會重建 books_book，FTS trigger 隨之消失
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_book_uniq_title_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(reinstall_search_index, reinstall_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_book_import_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='import_run',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,6 +1,18 @@
 # books/models.py
-from django.db import models
-from django.db.models import Q, F
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Count, Q, F
+from django.db.models.expressions import Combinable
+
+from .counters import adjust_book_counts, category_deltas, reconcile_book_counts
+from .fuzzy import sync_book_trigrams
+from .search import document_for, refresh_documents
+
+SEARCH_SOURCE_FIELDS = {"title", "author", "category", "category_id"}
+FUZZY_SOURCE_FIELDS = {"title", "author"}
+SUGGEST_SOURCE_FIELDS = SEARCH_SOURCE_FIELDS
+CATEGORY_FIELDS = {"category", "category_id"}
 
 
 class Category(models.Model):
@@ -8,6 +20,8 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     # 系統分類（如「未分類」）可用來保護不被刪改，先保留欄位以備用
     is_system = models.BooleanField(default=False)
+    # 反正規化的書籍數，由 Book 寫入時維護（見 books/counters.py）
+    book_count = models.PositiveIntegerField("掛書數", default=0, editable=False)
 
     class Meta:
         ordering = ["name"]
@@ -15,6 +29,48 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        renamed = bool(self.pk) and Category.objects.filter(pk=self.pk).exclude(name=self.name).exists()
+        super().save(*args, **kwargs)
+        if renamed:
+            # 分類名稱也在書籍的 search_document 內，改名時同步重算
+            refresh_documents(self.books.all())
+
+
+class BookQuerySet(models.QuerySet):
+    """批次寫入時同步 Category.book_count。"""
+
+    def bulk_create(self, objs, *args, category_deltas=None, **kwargs):
+        """category_deltas：呼叫端已算好的 {category_id: 增減量}（例如匯入時先查過衝突列），
+        給定時直接套用，update_conflicts 也不必整批重算。"""
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if category_deltas is not None:
+                adjust_book_counts(category_deltas, using=self.db)
+            elif kwargs.get("ignore_conflicts") or kwargs.get("update_conflicts"):
+                # 衝突的列是否被寫入無從得知，改為整批重算
+                reconcile_book_counts(using=self.db)
+            else:
+                adjust_book_counts(Counter(obj.category_id for obj in objs), using=self.db)
+        return created
+
+    def update(self, **kwargs):
+        if not CATEGORY_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        value = kwargs.get("category", kwargs.get("category_id"))
+        if isinstance(value, Combinable):
+            with transaction.atomic(using=self.db):
+                rows = super().update(**kwargs)
+                reconcile_book_counts(using=self.db)
+            return rows
+        new_category_id = getattr(value, "pk", value)
+        with transaction.atomic(using=self.db):
+            before = dict(self.order_by().values("category").annotate(n=Count("id")).values_list("category", "n"))
+            rows = super().update(**kwargs)
+            adjust_book_counts(category_deltas(before, {new_category_id: sum(before.values())}), using=self.db)
+        return rows
+
 
 class Book(models.Model):
     """書籍主檔"""
@@ -49,9 +105,25 @@ class Book(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # 全文檢索用的斷詞結果（見 books/search.py），由 save() 維護
+    search_document = models.TextField(blank=True, default="", editable=False)
+    # import_books 最後一次寫入時該行內容的雜湊（見 books/importer.py）；內容相同的行不再重寫。
+    # 空字串表示不是由匯入建立，或已被標記為從來源移除
+    import_hash = models.CharField(max_length=32, blank=True, default="", editable=False)
+    # 最後一次列出這本書的批次匯入（含未變更、skip 的行）；匯入結束時不等於本次的就是「來源已無」
+    import_run = models.UUIDField(null=True, blank=True, editable=False)
+
+    objects = BookQuerySet.as_manager()
+
     class Meta:
         ordering = ["title"]
+        indexes = [
+            # 列表預設排序與 ?cursor= keyset 分頁的排序鍵
+            models.Index(fields=["title", "id"]),
+        ]
         constraints = [
+            # 匯入（import_books）以 (title, author) 為 upsert 的衝突鍵
+            models.UniqueConstraint(fields=["title", "author"], name="uniq_book_title_author"),
             # available_copies 不可大於 total_copies
             models.CheckConstraint(
                 condition=Q(available_copies__gte=0),
@@ -61,3 +133,42 @@ class Book(models.Model):
 
     def __str__(self):
         return f"{self.title} - {self.author}"
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or SEARCH_SOURCE_FIELDS.intersection(update_fields):
+            self.search_document = document_for(self)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "search_document"}
+        using = kwargs.get("using") or self._state.db or "default"
+        counts_category = update_fields is None or bool(CATEGORY_FIELDS.intersection(update_fields))
+        touches_fuzzy = update_fields is None or bool(FUZZY_SOURCE_FIELDS.intersection(update_fields))
+        touches_search = update_fields is None or bool(SEARCH_SOURCE_FIELDS.intersection(update_fields))
+        with transaction.atomic(using=using):
+            # 存檔前的資料列：分類計數、trigram、記憶體索引與 suggest（signals）是否需要更新都以它判斷，只查一次
+            stored = None
+            if self.pk is not None and (counts_category or touches_fuzzy or touches_search):
+                stored = (
+                    Book.objects.using(using)
+                    .filter(pk=self.pk)
+                    .values("category_id", "category__name", "title", "author", "search_document")
+                    .first()
+                )
+            self._stored = stored
+            super().save(*args, **kwargs)
+            if counts_category:
+                before = {stored["category_id"]: 1} if stored else {}
+                adjust_book_counts(category_deltas(before, {self.category_id: 1}), using=using)
+        if touches_fuzzy and (stored is None or (stored["title"], stored["author"]) != (self.title, self.author)):
+            sync_book_trigrams(self)
+
+
+class BookTrigram(models.Model):
+    """非 PostgreSQL 時的 trigram 候選索引（見 books/fuzzy.py）；PostgreSQL 改用 pg_trgm。"""
+    gram = models.CharField(max_length=3)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="trigrams")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["gram", "book"], name="uniq_book_trigram"),
+        ]
@@ -0,0 +1,205 @@
+# books/search.py
+"""書籍全文檢索（?query=）。
+
+每本書在儲存時產生 search_document：title|author|category 三段，各段是
+tokenizer 斷好的詞（CJK bigram + 段尾單字、Latin 單字），以空白分隔。
+資料庫端依 vendor 建立索引：
+
+- PostgreSQL：generated column search_vector（三段分別給 A/B/C 權重）+ GIN，
+  以 'tok':* & ... 前綴查詢，ts_rank 排序。
+- SQLite：contentless FTS5 表 books_book_fts（三段分欄），由 trigger 同步，加權 bm25 排序。
+- 其他資料庫：退回 icontains（不排序）。
+
+設定 BOOK_SEARCH_ENGINE=memory 時改用行程內倒排索引（books/catalog_index.py），
+不經資料庫全文檢索，只取前 BOOK_SEARCH_MAX_HITS 筆命中。
+
+查詢字串同樣經過 tokenizer，所有詞以 AND 前綴比對，因此「銀河」「漫遊指」
+「histor」都能找到，但 Latin 單字中段（例如 "orian"）不再命中。
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import BooleanField, Case, FloatField, Q, QuerySet, Value, When
+from django.db.models.expressions import RawSQL
+
+from config.tokenizer import tokenize
+
+from . import catalog_index
+
+FTS_TABLE = "books_book_fts"
+MAX_QUERY_TERMS = 16
+# title / author / category 的 bm25 權重（PostgreSQL 端對應 A / B / C）
+SQLITE_WEIGHTS = "5.0, 2.0, 1.0"
+
+
+def build_document(title: str, author: str, category: str = "") -> str:
+    """產生 search_document；各段去重後以 | 分隔。"""
+    return "|".join(
+        " ".join(dict.fromkeys(tokenize(part, edges=True)))
+        for part in (title, author, category)
+    )
+
+
+def document_for(book) -> str:
+    category = book.category.name if book.category_id else ""
+    return build_document(book.title, book.author, category)
+
+
+def refresh_documents(queryset: QuerySet, batch_size: int = 1000) -> int:
+    """重算 queryset 內書籍的 search_document，只寫回有變動者；回傳更新筆數。"""
+    changed: List = []
+    updated = 0
+    for book in queryset.select_related("category").only(
+        "id", "title", "author", "search_document", "category__name"
+    ).iterator(chunk_size=batch_size):
+        doc = document_for(book)
+        if doc != book.search_document:
+            book.search_document = doc
+            changed.append(book)
+        if len(changed) >= batch_size:
+            updated += _flush(queryset.model, changed, batch_size)
+    if changed:
+        updated += _flush(queryset.model, changed, batch_size)
+    if updated:
+        # bulk_update 不觸發 signal，讓行程內索引整批重建
+        transaction.on_commit(catalog_index.invalidate)
+    return updated
+
+
+def _flush(model, books: List, batch_size: int) -> int:
+    model.objects.bulk_update(books, ["search_document"], batch_size=batch_size)
+    count = len(books)
+    books.clear()
+    return count
+
+
+def _terms(query: str) -> List[str]:
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def _icontains(queryset: QuerySet, value: str) -> QuerySet:
+    return queryset.filter(
+        Q(title__icontains=value)
+        | Q(author__icontains=value)
+        | Q(category__name__icontains=value)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def is_ranked(queryset: QuerySet) -> bool:
+    return "search_rank" in queryset.query.annotations
+
+
+def search_books(queryset: QuerySet, value: str) -> QuerySet:
+    """依 ?query= 過濾書籍並附上 search_rank 註記（越大越相關）。"""
+    terms = _terms(value)
+    if terms and getattr(settings, "BOOK_SEARCH_ENGINE", "database") == "memory":
+        return _memory_search(queryset, terms)
+    vendor = connections[queryset.db].vendor
+    if not terms or vendor not in ("postgresql", "sqlite"):
+        return _icontains(queryset, value)
+
+    table = queryset.model._meta.db_table
+    if vendor == "postgresql":
+        tsquery = " & ".join(f"'{t}':*" for t in terms)
+        return queryset.filter(
+            RawSQL(f"{table}.search_vector @@ %s::tsquery", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f"ts_rank({table}.search_vector, %s::tsquery)", [tsquery],
+                               output_field=FloatField())
+        )
+
+    match = " AND ".join(f'"{t}"*' for t in terms)
+    # 直接 join FTS 表：由 MATCH 驅動，只對命中的列計算 bm25（相關子查詢會對每列重跑 MATCH）。
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.rowid = {table}.id", f"{FTS_TABLE} MATCH %s"],
+        params=[match],
+    ).annotate(search_rank=RawSQL(f"-bm25({FTS_TABLE}, {SQLITE_WEIGHTS})", [], output_field=FloatField()))
+
+
+def rank_by_ids(queryset: QuerySet, hits: List[Tuple[int, float]]) -> QuerySet:
+    """把行程內算好的 [(book_id, score)] 套回 queryset，附上 search_rank 註記。"""
+    if not hits:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    rank = Case(*(When(id=book_id, then=Value(score)) for book_id, score in hits),
+                default=Value(0.0), output_field=FloatField())
+    return queryset.filter(id__in=[book_id for book_id, _ in hits]).annotate(search_rank=rank)
+
+
+def _memory_search(queryset: QuerySet, terms: List[str]) -> QuerySet:
+    limit = getattr(settings, "BOOK_SEARCH_MAX_HITS", 1000)
+    return rank_by_ids(queryset, catalog_index.get_index().search(terms, limit))
+
+
+# --- 資料庫端索引（migration 與 rebuild_book_search 共用） ---
+
+def _postgres_sql() -> Iterable[str]:
+    section = "setweight(array_to_tsvector(string_to_array(split_part(search_document, '|', {n}), ' ')), '{w}')"
+    vector = " || ".join(section.format(n=n, w=w) for n, w in ((1, "A"), (2, "B"), (3, "C")))
+    yield (
+        "ALTER TABLE books_book ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({vector}) STORED"
+    )
+    yield "CREATE INDEX IF NOT EXISTS books_book_search_vector_gin ON books_book USING GIN (search_vector)"
+
+
+def _sqlite_columns(doc: str) -> str:
+    """以 SQL 把 search_document 拆回 title, author, category 三段。"""
+    rest = f"substr({doc}, instr({doc}, '|') + 1)"
+    return (
+        f"substr({doc}, 1, instr({doc}, '|') - 1), "
+        f"substr({rest}, 1, instr({rest}, '|') - 1), "
+        f"substr({rest}, instr({rest}, '|') + 1)"
+    )
+
+
+def _sqlite_sql() -> Iterable[str]:
+    # contentless FTS5：三段分欄以便 bm25 加權，原文仍只存在 books_book。
+    yield (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, author, category, content='', "
+        "tokenize=\"unicode61 remove_diacritics 0 tokenchars '-_./'\")"
+    )
+    insert = f"INSERT INTO {FTS_TABLE}(rowid, title, author, category) VALUES (new.id, {_sqlite_columns('new.search_document')});"
+    delete = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, category) "
+        f"VALUES ('delete', old.id, {_sqlite_columns('old.search_document')});"
+    )
+    yield f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON books_book BEGIN {insert} END"
+    yield f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON books_book BEGIN {delete} END"
+    yield (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_document ON books_book "
+        f"BEGIN {delete} {insert} END"
+    )
+    # SQLite 改表（migration 重建 books_book）時 trigger 會消失，重裝時一併重建索引內容。
+    yield f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+    yield (
+        f"INSERT INTO {FTS_TABLE}(rowid, title, author, category) "
+        f"SELECT id, {_sqlite_columns('search_document')} FROM books_book"
+    )
+
+
+def install_search_index(connection) -> None:
+    """建立（或修復）資料庫端的全文索引；可重複執行。"""
+    statements = {"postgresql": _postgres_sql, "sqlite": _sqlite_sql}.get(connection.vendor)
+    with connection.cursor() as cursor:
+        for sql in statements() if statements else ():
+            cursor.execute(sql)
+
+
+def drop_search_index(connection) -> None:
+    statements: List[str] = []
+    if connection.vendor == "postgresql":
+        statements = [
+            "DROP INDEX IF EXISTS books_book_search_vector_gin",
+            "ALTER TABLE books_book DROP COLUMN IF EXISTS search_vector",
+        ]
+    elif connection.vendor == "sqlite":
+        statements = [f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}" for suffix in ("ai", "ad", "au")]
+        statements.append(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+
+from config.fields import FieldsetSerializerMixin
 from .models import Book, Category
 
 
@@ -10,7 +12,7 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "book_count"]
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -48,3 +50,14 @@ class BookSerializer(serializers.ModelSerializer):
         if avail > total:
             raise serializers.ValidationError("available_copies 不可大於 total_copies")
         return attrs
+
+
+class BookUserStateSerializer(BookSerializer):
+    """?with=user_state：多輸出目前使用者的收藏／借閱／預約狀態（值來自 books.user_state 的 annotation）。"""
+
+    is_favorited = serializers.BooleanField(read_only=True)
+    active_loan_id = serializers.IntegerField(read_only=True, allow_null=True)
+    reservation_position = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta(BookSerializer.Meta):
+        fields = BookSerializer.Meta.fields + ["is_favorited", "active_loan_id", "reservation_position"]
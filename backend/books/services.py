@@ -1,6 +1,8 @@
 from dataclasses import dataclass
-from django.db import transaction
-from django.db.models import F
+from typing import Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
 from django.core.exceptions import ValidationError
 from django.apps import apps  # ✅ 加這行
 from .models import Book
@@ -11,6 +13,37 @@ class BookResult:
     book: Book
 
 
+def adjust_stock(book_id: int, delta: int) -> Optional[Tuple[int, str, str]]:
+    """以一條條件式 UPDATE 調整可借數量並同步 status，回傳 (available_copies, status, title)。
+
+    調整後會小於 0（沒有可借的複本）或書不存在時不寫入、回傳 None。不先 select_for_update：
+    列鎖只在這條 UPDATE 到交易結束之間持有，熱門書同時借閱時不必排隊跑多次往返。
+    status 規則與先前相同：可借數為 0 時 unavailable，否則 available。
+    """
+    if connection.vendor in ("postgresql", "sqlite"):
+        table = connection.ops.quote_name(Book._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {table}
+                SET available_copies = available_copies + %s,
+                    status = CASE WHEN available_copies + %s = 0 THEN 'unavailable' ELSE 'available' END
+                WHERE id = %s AND available_copies + %s >= 0
+                RETURNING available_copies, status, title
+                """,
+                [delta, delta, book_id, delta],
+            )
+            return cursor.fetchone()
+    # 不支援 UPDATE ... RETURNING 的資料庫：同樣是一條條件式 UPDATE，再讀回結果
+    updated = Book.objects.filter(pk=book_id, available_copies__gte=-delta).update(
+        available_copies=F("available_copies") + delta,
+        status=Case(When(available_copies=-delta, then=Value("unavailable")), default=Value("available")),
+    )
+    if not updated:
+        return None
+    return Book.objects.values_list("available_copies", "status", "title").get(pk=book_id)
+
+
 @transaction.atomic
 def set_total_copies(*, book: Book, new_total: int) -> BookResult:
     """管理員調整總冊數。會自動校正 available，並保護 active 借閱不可被擠壓成負數。"""
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog_index, suggest
+from .availability import invalidate_availability_on_commit
+from .cache import bump_catalog_version_on_commit
+from .counters import adjust_book_counts
+from .models import SEARCH_SOURCE_FIELDS, SUGGEST_SOURCE_FIELDS, Book, Category
+
+
+def _memory_engine() -> bool:
+    return getattr(settings, "BOOK_SEARCH_ENGINE", "database") == "memory"
+
+
+def _suggest_values(book: Book):
+    category = book.category.name if book.category_id else ""
+    return book.title, book.author, category
+
+
+def _document_changed(instance: Book, created: bool, update_fields) -> bool:
+    """search_document 是否真的變了（Book.save 留下存檔前的資料列於 _stored）。"""
+    if created:
+        return True
+    if update_fields is not None and not SEARCH_SOURCE_FIELDS.intersection(update_fields):
+        return False
+    stored = getattr(instance, "_stored", None)
+    return stored is None or stored["search_document"] != instance.search_document
+
+
+def _touches_suggest(update_fields) -> bool:
+    return update_fields is None or bool(SUGGEST_SOURCE_FIELDS.intersection(update_fields))
+
+
+def _suggest_change(instance: Book, created: bool):
+    """(舊值, 新值)；舊值取自 Book.save 留下的存檔前資料列，新增時為 None。"""
+    stored = None if created else getattr(instance, "_stored", None)
+    if stored is None:
+        return None, _suggest_values(instance)
+    old = (stored["title"] or "", stored["author"] or "", stored["category__name"] or "")
+    # 分類沒換就沿用舊名稱，不必再查一次分類
+    category = old[2] if stored["category_id"] == instance.category_id else _suggest_values(instance)[2]
+    return old, (instance.title, instance.author, category)
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance: Book, created=False, update_fields=None, **kwargs):
+    bump_catalog_version_on_commit()
+    invalidate_availability_on_commit(instance.pk)
+    if _memory_engine() and _document_changed(instance, created, update_fields):
+        book_id, document = instance.pk, instance.search_document
+        transaction.on_commit(lambda: catalog_index.apply_change(book_id, document))
+    if _touches_suggest(update_fields):
+        old, new = _suggest_change(instance, created)
+        if old != new:
+            transaction.on_commit(lambda: suggest.apply_book_change(old, new))
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance: Book, using="default", **kwargs):
+    bump_catalog_version_on_commit()
+    invalidate_availability_on_commit(instance.pk)
+    # 在刪除的交易內執行，與刪除同時生效
+    adjust_book_counts({instance.category_id: -1}, using=using)
+    if _memory_engine():
+        book_id = instance.pk
+        transaction.on_commit(lambda: catalog_index.apply_change(book_id, None))
+    old = _suggest_values(instance)
+    transaction.on_commit(lambda: suggest.apply_book_change(old, None))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_suggest_on_category_change(sender, **kwargs):
+    transaction.on_commit(suggest.invalidate)
+    bump_catalog_version_on_commit()
+
+
+@receiver(post_save, sender="loans.Loan")
+@receiver(post_delete, sender="loans.Loan")
+def invalidate_availability_on_loan_change(sender, instance, **kwargs):
+    # 借書、還書、預約、取消都會寫入 Loan；庫存與預約佇列長度隨之改變
+    invalidate_availability_on_commit(instance.book_id)
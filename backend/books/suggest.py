@@ -0,0 +1,285 @@
+# books/suggest.py
+"""搜尋框自動完成（GET /api/books/suggest/?q=）。
+
+行程內的排序字串陣列 + bisect 前綴查詢，資料為書名、作者、分類名稱三種標籤，
+每個標籤記錄對應的書籍數作為排序權重：
+
+- 每個標籤以正規化（NFKC、小寫）後的全文當 key；Latin 多字標籤另外為後面的
+  單字建 key（最多 EXTRA_WORD_KEYS 個），輸入 "galaxy" 也能找到 "Guide to the Galaxy"；
+- key 總數上限 BOOK_SUGGEST_MAX_KEYS，整批載入時依分類 → 作者 → 書名、
+  書籍數多者優先，超出上限的標籤不收錄；
+- 命中範圍超過 HOT_RANGE 個 key 的前綴另存前 TOP_SIZE 名（_Top）：1～TOP_PREFIX_CHARS 字的
+  前綴在 load() 時建好，較長的前綴在第一次查詢時以完整掃描建立，adjust() 隨計數增減就地修正，
+  查詢結果一律是整段範圍的正確排名；
+- Book 存檔／刪除（書名、作者或分類有變時）在交易提交後把 (old, new) 發布到
+  ChangeLog（catalog_index.py），新版本恰為本行程版本 + 1 時直接調整計數；其他行程
+  下次查詢時依序重播缺少的增量，分類異動、整批匯入或增量已被逐出時才整批重建。
+"""
+from __future__ import annotations
+
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from .catalog_index import ChangeLog
+
+GENERATION_KEY = "books:suggest_generation"
+KINDS = ("category", "author", "title")
+EXTRA_WORD_KEYS = 3
+# 命中範圍超過這個 key 數的前綴改由 _Top 回答，不再逐次掃描
+HOT_RANGE = 256
+# API 的 limit 上限（views.BookViewSet.suggest）
+MAX_LIMIT = 20
+# _Top 保留的名次數：多留一倍，計數下降而掉出前段時不必馬上重新掃描
+TOP_SIZE = MAX_LIMIT * 2
+# load() 時預先建立 _Top 的前綴長度（正規化後的字元數）
+TOP_PREFIX_CHARS = 2
+
+_SPACE_RE = re.compile(r"\s+")
+
+Label = Tuple[str, str]  # (kind, text)
+
+
+def normalize(text: str) -> str:
+    return _SPACE_RE.sub(" ", unicodedata.normalize("NFKC", text or "").lower()).strip()
+
+
+def _keys(text: str) -> List[str]:
+    key = normalize(text)
+    if not key:
+        return []
+    keys = [key]
+    starts = [m.end() for m in _SPACE_RE.finditer(key)][:EXTRA_WORD_KEYS]
+    keys.extend(key[i:] for i in starts)
+    return keys
+
+
+def _max_keys() -> int:
+    return int(getattr(settings, "BOOK_SUGGEST_MAX_KEYS", 500_000))
+
+
+def _rank(label: Label, count: int) -> tuple:
+    """排序鍵：書籍數多者優先，其次是較短的文字、分類 → 作者 → 書名。"""
+    kind, text = label
+    return (-count, len(text), KINDS.index(kind), text)
+
+
+class _Top:
+    """一個前綴範圍內排名最前的標籤（_rank() 由小到大）。
+
+    complete 為 False 時，範圍內不在 entries 的標籤排名都在 entries[-1] 之後；
+    增減時維持這個條件，無法確定時由呼叫端捨棄、下次查詢重新掃描。
+    """
+
+    __slots__ = ("entries", "complete")
+
+    def __init__(self, entries: List[tuple], complete: bool):
+        self.entries = entries
+        self.complete = complete
+
+    def update(self, old: Optional[tuple], new: Optional[tuple]) -> bool:
+        """標籤排名由 old 變為 new（None 表示不在範圍內）；回傳 False 表示已無法確定前 MAX_LIMIT 名。"""
+        entries = self.entries
+        if old is not None:
+            pos = bisect_left(entries, old)
+            if pos < len(entries) and entries[pos] == old:
+                del entries[pos]
+        if new is not None and (self.complete or (entries and new < entries[-1])):
+            insort(entries, new)
+            if len(entries) > TOP_SIZE:
+                entries.pop()
+                self.complete = False
+        return self.complete or len(entries) >= MAX_LIMIT
+
+
+class SuggestIndex:
+    def __init__(self, max_keys: Optional[int] = None):
+        self._lock = threading.RLock()
+        self._max_keys = max_keys
+        self._keys: List[str] = []
+        self._refs: List[Label] = []  # 與 _keys 對齊
+        self._counts: Dict[Label, int] = {}
+        self._tops: Dict[str, _Top] = {}
+        self.generation: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def max_keys(self) -> int:
+        return self._max_keys if self._max_keys is not None else _max_keys()
+
+    def load(self, labels: Iterable[Tuple[str, str, int]], generation: Optional[int] = None) -> None:
+        """以 (kind, text, count) 整批重建；呼叫端需依優先順序排列。"""
+        pairs: List[Tuple[str, Label]] = []
+        counts: Dict[Label, int] = {}
+        budget = self.max_keys
+        for kind, text, count in labels:
+            label = (kind, text)
+            if not count or label in counts:
+                continue
+            keys = _keys(text)
+            if not keys or len(pairs) + len(keys) > budget:
+                continue
+            counts[label] = count
+            pairs.extend((key, label) for key in keys)
+        pairs.sort()
+        keys = [key for key, _ in pairs]
+        refs = [label for _, label in pairs]
+        with self._lock:
+            self._keys, self._refs, self._counts = keys, refs, counts
+            self._tops = self._short_tops()
+            self.generation = generation
+
+    def _range(self, prefix: str, start: int = 0) -> Tuple[int, int]:
+        start = bisect_left(self._keys, prefix, start)
+        return start, bisect_left(self._keys, prefix + "\uffff", start)
+
+    def _scan(self, start: int, stop: int, size: int = TOP_SIZE) -> _Top:
+        labels = set(self._refs[start:stop])
+        ranked = heapq.nsmallest(size + 1, (_rank(label, self._counts[label]) for label in labels))
+        return _Top(ranked[:size], len(ranked) <= size)
+
+    def _short_tops(self) -> Dict[str, _Top]:
+        """為 1～TOP_PREFIX_CHARS 字、命中範圍超過 HOT_RANGE 的前綴建立 _Top。"""
+        tops: Dict[str, _Top] = {}
+        keys = self._keys
+        for size in range(1, TOP_PREFIX_CHARS + 1):
+            start = 0
+            while start < len(keys):
+                prefix = keys[start][:size]
+                if len(prefix) < size:
+                    start += 1
+                    continue
+                _, stop = self._range(prefix, start)
+                stop = max(stop, start + 1)  # 超出 BMP 的字元排在 "\uffff" 之後
+                if stop - start > HOT_RANGE:
+                    tops[prefix] = self._scan(start, stop)
+                start = stop
+        return tops
+
+    def _update_tops(self, label: Label, before: int, after: int) -> None:
+        if not self._tops:
+            return
+        old = _rank(label, before) if before > 0 else None
+        new = _rank(label, after) if after > 0 else None
+        prefixes = {key[:i] for key in _keys(label[1]) for i in range(1, len(key) + 1)}
+        for prefix in prefixes:
+            top = self._tops.get(prefix)
+            if top is not None and not top.update(old, new):
+                del self._tops[prefix]
+
+    def adjust(self, kind: str, text: str, delta: int) -> None:
+        if not text or not delta:
+            return
+        label = (kind, text)
+        with self._lock:
+            before = self._counts.get(label, 0)
+            count = before + delta
+            if count > 0:
+                if label not in self._counts:
+                    keys = _keys(text)
+                    if not keys or len(self._keys) + len(keys) > self.max_keys:
+                        return
+                    for key in keys:
+                        pos = bisect_left(self._keys, key)
+                        self._keys.insert(pos, key)
+                        self._refs.insert(pos, label)
+                self._counts[label] = count
+                self._update_tops(label, before, count)
+            elif label in self._counts:
+                del self._counts[label]
+                self._update_tops(label, before, 0)
+                for key in _keys(text):
+                    pos = bisect_left(self._keys, key)
+                    while pos < len(self._keys) and self._keys[pos] == key:
+                        if self._refs[pos] == label:
+                            del self._keys[pos]
+                            del self._refs[pos]
+                            break
+                        pos += 1
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict]:
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        with self._lock:
+            top = self._tops.get(prefix)
+            if top is None or (len(top.entries) < limit and not top.complete):
+                start, stop = self._range(prefix)
+                if limit > TOP_SIZE:
+                    top = self._scan(start, stop, limit)
+                else:
+                    top = self._scan(start, stop)
+                    if stop - start > HOT_RANGE:
+                        self._tops[prefix] = top
+            ranked = top.entries[:limit]
+        return [{"text": text, "type": KINDS[kind], "count": -count} for count, _, kind, text in ranked]
+
+
+_index = SuggestIndex()
+_load_lock = threading.Lock()
+_log = ChangeLog(GENERATION_KEY)
+
+
+def _labels() -> Iterable[Tuple[str, str, int]]:
+    from .models import Book, Category
+
+    for name, count in Category.objects.annotate(n=Count("books")).order_by("-n", "name").values_list("name", "n"):
+        yield "category", name, count
+    for field in ("author", "title"):
+        rows = Book.objects.values(field).annotate(n=Count("id")).order_by("-n", field).values_list(field, "n")
+        for text, count in rows.iterator(chunk_size=5000):
+            yield field, text, count
+
+
+def _apply(change: Tuple[Optional[Tuple[str, str, str]], Optional[Tuple[str, str, str]]]) -> None:
+    old, new = change
+    for i, kind in enumerate(("title", "author", "category")):
+        before = old[i] if old else ""
+        after = new[i] if new else ""
+        if before != after:
+            _index.adjust(kind, before, -1)
+            _index.adjust(kind, after, 1)
+
+
+def _reload(current: int) -> None:
+    _index.load(_labels(), generation=current)
+
+
+def get_index() -> SuggestIndex:
+    if _index.generation != _log.generation():
+        with _load_lock:
+            _log.sync(_index, _apply, _reload)
+    return _index
+
+
+def suggest(prefix: str, limit: int = 8) -> List[Dict]:
+    return get_index().suggest(prefix, limit)
+
+
+def apply_book_change(old: Optional[Tuple[str, str, str]], new: Optional[Tuple[str, str, str]]) -> None:
+    """交易提交後呼叫：old/new 為 (title, author, category 名稱)，None 表示新增／刪除。
+
+    標籤沒變時直接返回，不遞增 generation（其他行程不必重跑 _labels() 的 GROUP BY）。
+    """
+    if old == new:
+        return
+    with _index._lock:
+        previous = _index.generation
+        new_generation = _log.publish((old, new))
+        if previous is None or new_generation != previous + 1:
+            return  # 尚未載入，或期間有其他行程的寫入：下次查詢時依序重播（含這一筆）
+        _apply((old, new))
+        _index.generation = new_generation
+
+
+def invalidate() -> None:
+    """分類異動、整批匯入等無法以 (old, new) 描述的變更：所有行程整批重建。"""
+    _log.invalidate()
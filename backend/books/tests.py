@@ -1,15 +1,25 @@
 import csv
+import io
+import json
+import random
 import tempfile
 from pathlib import Path
+from unittest import mock, skipUnless
 
 from django.contrib.auth import get_user_model
-from django.core.management import call_command
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from . import catalog_index, suggest
 from .models import Book, Category
+from .search import build_document
+from .serializers import BookSerializer
 
 
 class BookAPITestCase(APITestCase):
@@ -190,6 +200,297 @@ class BookAPITestCase(APITestCase):
         self.assertGreaterEqual(len(results), 2)
         self.assertEqual(results[0]["id"], self.scifi_book.id)
 
+    def test_cursor_pagination_walks_title_id_order_without_count(self):
+        for i in range(4):
+            Book.objects.create(title="同名書", author=f"作者{i}")
+        expected = list(Book.objects.order_by("title", "id").values_list("id", flat=True))
+
+        seen, params = [], {"cursor": "", "page_size": 2}
+        url = self.list_url
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            payload = response.json()
+            self.assertNotIn("count", payload)
+            seen.extend(book["id"] for book in payload["results"])
+            url, params = payload["next"], None
+        self.assertEqual(seen, expected)
+
+    def test_cursor_pagination_follows_ranked_search_and_rejects_bad_cursor(self):
+        for i in range(3):
+            Book.objects.create(title=f"History Vol {i}", author="Zed")
+        first = self.client.get(self.list_url, {"query": "histor", "cursor": "", "page_size": 2}).json()
+        second = self.client.get(first["next"]).json()
+        cursor_ids = [b["id"] for b in first["results"] + second["results"]]
+        ranked_ids = [b["id"] for b in self.client.get(self.list_url, {"query": "histor"}).json()["results"]]
+        self.assertEqual(cursor_ids, ranked_ids)
+        self.assertIsNone(second["next"])
+
+        response = self.client.get(self.list_url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(API_EXACT_COUNT_THRESHOLD=1, BOOK_RESPONSE_CACHE_SECONDS=0)
+    def test_count_above_threshold_uses_estimate_when_available(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.json()["count"], 2)  # SQLite 沒有估計值，仍為精確計數
+        self.assertFalse(response.json()["count_is_approximate"])
+
+        with mock.patch("config.pagination.estimate_count", return_value=5000) as estimate:
+            payload = self.client.get(self.list_url).json()
+        estimate.assert_called_once()
+        self.assertEqual(payload["count"], 5000)
+        self.assertTrue(payload["count_is_approximate"])
+        self.assertEqual(len(payload["results"]), 2)
+
+        with mock.patch("config.pagination.estimate_count", return_value=5000) as estimate:
+            payload = self.client.get(self.list_url, {"query": "銀河"}).json()
+        estimate.assert_not_called()
+        self.assertEqual(payload["count"], 1)
+        self.assertFalse(payload["count_is_approximate"])
+
+        # 有過濾條件時估計值常偏低，仍做完整計數，最後一頁不會 404
+        Book.objects.create(title="銀河帝國", author="Isaac Asimov")
+        with mock.patch("config.pagination.estimate_count", return_value=1) as estimate:
+            payload = self.client.get(self.list_url, {"query": "銀河", "page_size": 1, "page": 2}).json()
+        estimate.assert_not_called()
+        self.assertEqual(payload["count"], 2)
+        self.assertFalse(payload["count_is_approximate"])
+        self.assertEqual(len(payload["results"]), 1)
+
+    def test_facets_count_filtered_results_in_one_query_and_are_cached(self):
+        Book.objects.create(title="歷史地圖集", author="Carol", category=self.category_history)
+        params = {"query": "歷史", "facets": "category,status", "page_size": 1}
+
+        with self.assertNumQueries(3):  # count + 頁面 + facets 分組
+            payload = self.client.get(self.list_url, params).json()
+        self.assertEqual(len(payload["results"]), 1)
+        self.assertEqual(
+            payload["facets"]["category"],
+            [{"value": self.category_history.id, "label": "歷史", "count": 2}],
+        )
+        self.assertEqual(
+            payload["facets"]["status"],
+            [{"value": "available", "label": "Available", "count": 1},
+             {"value": "maintenance", "label": "Maintenance", "count": 1}],
+        )
+
+        with self.assertNumQueries(2):
+            cached = self.client.get(self.list_url, {**params, "page": 2}).json()
+        self.assertEqual(cached["facets"], payload["facets"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scifi_book.title = "歷史上的銀河"
+            self.scifi_book.save()
+        payload = self.client.get(self.list_url, params).json()
+        self.assertEqual([e["label"] for e in payload["facets"]["category"]], ["歷史", "科幻"])
+
+        response = self.client.get(self.list_url, {"facets": "author"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_catalog_responses_are_cached_until_catalog_version_changes(self):
+        from loans.services import loan_book
+
+        detail_url = reverse("book-detail", args=[self.scifi_book.id])
+        self.client.get(self.list_url)
+        self.client.get(detail_url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.list_url).json()["count"], 2)
+            self.assertEqual(self.client.get(detail_url).json()["available_copies"], 3)
+
+        reader = get_user_model().objects.create_user(email="reader@example.com", password="Pass1234!")
+        with self.captureOnCommitCallbacks(execute=True):
+            loan_book(user=reader, book=self.scifi_book)
+        self.assertEqual(self.client.get(detail_url).json()["available_copies"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name="文學")
+        names = [c["name"] for c in self.client.get(reverse("category-list")).json()]
+        self.assertIn("文學", names)
+
+    def test_conditional_get_returns_304_without_queries(self):
+        detail_url = reverse("book-detail", args=[self.scifi_book.id])
+        etag = self.client.get(detail_url)["ETag"]
+        self.assertNotEqual(etag, self.client.get(self.list_url)["ETag"])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scifi_book.save()
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_fast_list_path_matches_book_serializer_output(self):
+        Book.objects.create(title="無分類的書", author="Nobody")
+        expected = BookSerializer(Book.objects.select_related("category").order_by("title"), many=True).data
+
+        with self.assertNumQueries(2):
+            payload = self.client.get(self.list_url, {"page_size": 100}).json()
+        self.assertEqual(payload["results"], [dict(row) for row in expected])
+        self.assertEqual(
+            [list(row) for row in payload["results"]],
+            [list(row) for row in expected],
+        )
+
+    def test_with_user_state_annotates_page_in_single_query(self):
+        from favorites.models import Favorite
+        from loans.models import Loan
+        from loans.services import loan_book, reserve_book
+
+        reader = get_user_model().objects.create_user(email="state@example.com", password="Pass1234!")
+        other = get_user_model().objects.create_user(email="other@example.com", password="Pass1234!")
+        Favorite.objects.create(user=reader, book=self.history_book)
+        loan = loan_book(user=reader, book=self.scifi_book).loan
+        reserve_book(user=other, book=self.history_book)
+        reserve_book(user=reader, book=self.history_book)
+        Loan.objects.create(user=other, book=self.history_book, type=Loan.Type.RESERVATION, status=Loan.Status.CANCELED)
+
+        self.client.force_authenticate(user=reader)
+        with self.assertNumQueries(2):  # COUNT + 一頁（含三個子查詢）
+            payload = self.client.get(self.list_url, {"with": "user_state"}).json()
+        state = {
+            row["id"]: (row["is_favorited"], row["active_loan_id"], row["reservation_position"])
+            for row in payload["results"]
+        }
+        self.assertEqual(state, {self.history_book.id: (True, None, 2), self.scifi_book.id: (False, loan.id, None)})
+
+        detail_url = reverse("book-detail", args=[self.scifi_book.id])
+        for params in ({"with": "user_state", "cursor": ""}, {"with": "user_state", "fields": "id,is_favorited"}):
+            rows = self.client.get(self.list_url, params).json()["results"]
+            self.assertEqual({row["id"]: row["is_favorited"] for row in rows}, {self.history_book.id: True, self.scifi_book.id: False})
+        response = self.client.get(detail_url, {"with": "user_state"})
+        self.assertNotIn("ETag", response)
+        self.assertEqual(response.json()["active_loan_id"], loan.id)
+
+        # 因人而異：不可共用快取
+        self.client.force_authenticate(user=other)
+        row = self.client.get(detail_url, {"with": "user_state"}).json()
+        self.assertEqual((row["is_favorited"], row["active_loan_id"]), (False, None))
+        self.client.force_authenticate(user=None)
+        row = self.client.get(detail_url, {"with": "user_state"}).json()
+        self.assertEqual((row["is_favorited"], row["active_loan_id"], row["reservation_position"]), (False, None, None))
+        self.assertNotIn("is_favorited", self.client.get(detail_url).json())
+
+        response = self.client.get(self.list_url, {"with": "loans"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_availability_returns_map_from_one_query_and_invalidates_on_loans(self):
+        from loans.services import loan_book, reserve_book
+
+        url = reverse("book-availability")
+        ids = f"{self.scifi_book.id},{self.history_book.id},999999"
+        with self.assertNumQueries(1):
+            payload = self.client.get(url, {"ids": ids}).json()
+        self.assertEqual(
+            payload,
+            {
+                str(self.scifi_book.id): {"available": 3, "total": 3, "status": "available", "queue_length": 0},
+                str(self.history_book.id): {"available": 2, "total": 4, "status": "maintenance", "queue_length": 0},
+            },
+        )
+        with self.assertNumQueries(0):
+            self.client.get(url, {"ids": ids})
+
+        reader = get_user_model().objects.create_user(email="avail@example.com", password="Pass1234!")
+        with self.captureOnCommitCallbacks(execute=True):
+            loan_book(user=reader, book=self.scifi_book)
+            reserve_book(user=reader, book=self.history_book)
+        payload = self.client.post(url, {"ids": [self.scifi_book.id, self.history_book.id]}, format="json").json()
+        self.assertEqual(payload[str(self.scifi_book.id)]["available"], 2)
+        self.assertEqual(payload[str(self.history_book.id)]["queue_length"], 1)
+        self.assertNotIn("ETag", self.client.get(url, {"ids": ids}))
+
+        for params in ({"ids": "1,abc"}, {"ids": ""}, {"ids": ",".join(str(i) for i in range(1, 202))}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+        response = self.client.post(url, {"ids": [True]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fieldsets_trim_output_and_projection(self):
+        for params in ({"fields": "id,title,available_copies"}, {"fields": "id,title,available_copies", "cursor": ""}):
+            with CaptureQueriesContext(connection) as ctx:
+                payload = self.client.get(self.list_url, params).json()
+            self.assertEqual(
+                [set(row) for row in payload["results"]], [{"id", "title", "available_copies"}] * 2, params
+            )
+            page_sql = ctx.captured_queries[-1]["sql"]
+            self.assertNotIn("books_category", page_sql)
+            self.assertNotIn('"author"', page_sql)
+
+        payload = self.client.get(self.list_url, {"exclude": "category,total_copies"}).json()
+        self.assertEqual(
+            list(payload["results"][0]), ["id", "title", "author", "available_copies", "status"]
+        )
+        detail = self.client.get(reverse("book-detail", args=[self.scifi_book.id]), {"fields": "category"}).json()
+        self.assertEqual(detail, {"category": {"id": self.category_scifi.id, "name": "科幻", "book_count": 1}})
+
+        response = self.client.get(self.list_url, {"fields": "id,isbn"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_uses_ranked_prefix_search(self):
+        """
+        ?query= 走全文索引：前綴比對、書名命中排在作者命中之前。
+        """
+        atlas = Book.objects.create(title="Historical Atlas", author="Zed Mapper")
+
+        response = self.client.get(self.list_url, {"query": "histor"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [book["id"] for book in response.json()["results"]]
+        self.assertEqual(ids, [atlas.id, self.history_book.id])
+
+        response = self.client.get(self.list_url, {"query": "指南"})
+        titles = [book["title"] for book in response.json()["results"]]
+        self.assertEqual(titles, ["銀河漫遊指南"])
+
+    def test_query_follows_title_and_category_changes(self):
+        self.scifi_book.title = "星際大戰小說"
+        self.scifi_book.save()
+        self.category_scifi.name = "太空歌劇"
+        self.category_scifi.save()
+
+        for query in ("星際", "太空歌劇"):
+            response = self.client.get(self.list_url, {"query": query})
+            ids = [book["id"] for book in response.json()["results"]]
+            self.assertEqual(ids, [self.scifi_book.id], query)
+
+        response = self.client.get(self.list_url, {"query": "銀河"})
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_fuzzy_query_tolerates_typos(self):
+        norwegian = Book.objects.create(title="挪威的森林", author="Murakami Haruki")
+
+        response = self.client.get(self.list_url, {"query": "Murakmi"})
+        self.assertEqual(response.json()["count"], 0)
+
+        response = self.client.get(self.list_url, {"query": "Murakmi", "fuzzy": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [book["id"] for book in response.json()["results"]]
+        self.assertEqual(ids, [norwegian.id])
+
+        norwegian.author = "Haruki M."
+        with self.captureOnCommitCallbacks(execute=True):
+            norwegian.save(update_fields=["author"])
+        response = self.client.get(self.list_url, {"query": "Murakmi", "fuzzy": "1"})
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_full_save_without_title_or_author_change_keeps_trigrams(self):
+        self.scifi_book.available_copies = 1
+        with CaptureQueriesContext(connection) as ctx:
+            self.scifi_book.save()
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if "booktrigram" in q["sql"].lower()])
+
+    def test_rebuild_book_search_repairs_index(self):
+        # queryset.update() 不經 save()，索引會過期
+        Book.objects.filter(pk=self.scifi_book.pk).update(title="宇宙盡頭的餐廳", author="Ursula Le Guin")
+        out = io.StringIO()
+        call_command("rebuild_book_search", stdout=out)
+
+        self.assertIn("完成重建", out.getvalue())
+        response = self.client.get(self.list_url, {"query": "餐廳"})
+        self.assertEqual([b["id"] for b in response.json()["results"]], [self.scifi_book.id])
+        response = self.client.get(self.list_url, {"query": "Ursla", "fuzzy": "1"})
+        self.assertEqual([b["id"] for b in response.json()["results"]], [self.scifi_book.id])
+
 
 class ImportBooksCommandTests(TestCase):
     required_headers = [
@@ -286,3 +587,561 @@ class ImportBooksCommandTests(TestCase):
         self.assertEqual(book.total_copies, 6)
         self.assertEqual(book.available_copies, 4)
         self.assertEqual(book.category.name, "新分類")
+
+    def _row(self, title, author="作者", category="文學", total="2", available="2", skip="False"):
+        return {
+            "title": title,
+            "author": author,
+            "category": category,
+            "total_copies": total,
+            "available_copies": available,
+            "skip": skip,
+            "notes": "",
+        }
+
+    def test_chunked_upsert_keeps_counts_and_search_indexes(self):
+        Book.objects.create(title="既有書", author="作者", category=Category.objects.create(name="舊分類"))
+        csv_path = self._write_csv(
+            [
+                self._row("銀河漫遊指南", "Douglas Adams", "科幻"),
+                self._row("既有書", category="文學", total="5", available="1"),
+                self._row("略過", skip="yes"),
+                self._row("歷史地圖集", "Carol", ""),
+                self._row("銀河漫遊指南", "Douglas Adams", "科幻", total="4", available="4"),
+            ]
+        )
+        out = io.StringIO()
+        call_command("import_books", str(csv_path), "--chunk-size", "2", stdout=out)
+
+        self.assertIn("新增 2 筆、變更 2 筆、未變更 0 筆、略過 1 筆、來源已無 0 筆、產生 2 個新分類", out.getvalue())
+        self.assertIn("行/秒", out.getvalue())
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Book.objects.get(title="銀河漫遊指南").total_copies, 4)
+        self.assertEqual(Book.objects.get(title="既有書").category.name, "文學")
+        counts = dict(Category.objects.filter(is_system=False).values_list("name", "book_count"))
+        self.assertEqual(counts, {"舊分類": 0, "文學": 1, "科幻": 1})
+        self.assertFalse(Path(f"{csv_path}.progress.json").exists())
+
+        titles = [row["title"] for row in self.client.get(reverse("book-list"), {"query": "銀河"}).json()["results"]]
+        self.assertEqual(titles, ["銀河漫遊指南"])
+        titles = [row["title"] for row in self.client.get(reverse("book-list"), {"query": "Adams Duglas", "fuzzy": "1"}).json()["results"]]
+        self.assertEqual(titles, ["銀河漫遊指南"])
+
+    def test_failed_import_resumes_after_last_committed_chunk(self):
+        rows = [self._row(f"第{i}冊") for i in range(4)] + [self._row("壞資料", total="abc")]
+        csv_path = self._write_csv(rows)
+        with self.assertRaisesMessage(CommandError, "已提交至第 5 行"):
+            call_command("import_books", str(csv_path), "--chunk-size", "2", stdout=io.StringIO())
+        self.assertEqual(Book.objects.count(), 4)
+
+        rows[-1]["total_copies"] = "1"
+        with csv_path.open("w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=self.required_headers)
+            writer.writeheader()
+            writer.writerows(rows)
+        out = io.StringIO()
+        call_command("import_books", str(csv_path), "--chunk-size", "2", "--resume", stdout=out)
+
+        self.assertIn("自第 6 行續傳", out.getvalue())
+        # 續傳沿用進度檔的 import_run：先前提交的書不算來源已無
+        self.assertIn("新增 5 筆、變更 0 筆、未變更 0 筆、略過 0 筆、來源已無 0 筆", out.getvalue())
+        self.assertEqual(Book.objects.count(), 5)
+        self.assertEqual(Category.objects.get(name="文學").book_count, 5)
+
+    def test_copy_engine_matches_batch_import(self):
+        # PostgreSQL 走 COPY 暫存表；SQLite 退回批次匯入，結果須相同
+        Book.objects.create(title="既有書", author="作者", category=Category.objects.create(name="舊分類"))
+        csv_path = self._write_csv(
+            [
+                self._row(" 銀河漫遊指南 ", "Douglas Adams", "科幻", total="2.7", available="9"),
+                self._row("既有書", category="文學", total="5", available="1"),
+                self._row("略過", skip="yes"),
+                self._row("歷史地圖集", "Carol", "", total="-1"),
+                self._row("銀河漫遊指南", "Douglas Adams", "科幻", total="4", available="4"),
+            ]
+        )
+        out = io.StringIO()
+        call_command("import_books", str(csv_path), "--engine", "copy", stdout=out)
+
+        self.assertEqual(connection.vendor != "postgresql", "改用批次匯入" in out.getvalue())
+        self.assertIn("新增 2 筆、變更 2 筆、未變更 0 筆、略過 1 筆、來源已無 0 筆、產生 2 個新分類", out.getvalue())
+        books = {b.title: b for b in Book.objects.select_related("category")}
+        self.assertEqual(sorted(books), ["既有書", "歷史地圖集", "銀河漫遊指南"])
+        self.assertEqual((books["銀河漫遊指南"].total_copies, books["銀河漫遊指南"].available_copies), (4, 4))
+        self.assertEqual((books["歷史地圖集"].total_copies, books["歷史地圖集"].available_copies), (0, 0))
+        self.assertIsNone(books["歷史地圖集"].category)
+        self.assertEqual(books["既有書"].search_document, build_document("既有書", "作者", "文學"))
+        counts = dict(Category.objects.filter(is_system=False).values_list("name", "book_count"))
+        self.assertEqual(counts, {"舊分類": 0, "文學": 1, "科幻": 1})
+
+        titles = [row["title"] for row in self.client.get(reverse("book-list"), {"query": "銀河"}).json()["results"]]
+        self.assertEqual(titles, ["銀河漫遊指南"])
+
+    def test_copy_engine_rejects_invalid_file_without_writing(self):
+        csv_path = self._write_csv([self._row("第1冊"), self._row("第2冊", total="abc"), self._row("", "作者")])
+        with self.assertRaisesMessage(CommandError, "第 3 行欄位 total_copies 的值無法轉換為整數：abc"):
+            call_command("import_books", str(csv_path), "--engine", "copy", "--chunk-size", "1", stdout=io.StringIO())
+        # COPY 整檔一個交易；批次匯入則已提交第 2 行之前的 chunk
+        self.assertEqual(Book.objects.count(), 0 if connection.vendor == "postgresql" else 1)
+        with self.assertRaisesMessage(CommandError, "不支援 --resume"):
+            call_command("import_books", str(csv_path), "--engine", "copy", "--resume", stdout=io.StringIO())
+
+    @skipUnless(connection.vendor == "postgresql", "COPY 引擎只在 PostgreSQL 上執行")
+    def test_copy_and_batch_engines_share_line_numbers_and_number_format(self):
+        rows = [
+            self._row("跨行\r\n書名", total="2"),
+            self._row("千本", total="1_000", available="+1e2"),
+            self._row("壞資料", total="1__0"),
+        ]
+        for engine in ("batch", "copy"):
+            # 第 2 筆資料的書名跨兩行：錯誤行號為檔案中的實際行號
+            with self.assertRaisesMessage(CommandError, "第 5 行欄位 total_copies 的值無法轉換為整數：1__0"):
+                call_command("import_books", str(self._write_csv(rows)), "--engine", engine, stdout=io.StringIO())
+        for value in ("inf", "nan", "１２"):
+            rows[2]["total_copies"] = value
+            for engine in ("batch", "copy"):
+                with self.assertRaisesMessage(CommandError, f"第 5 行欄位 total_copies 的值無法轉換為整數：{value}"):
+                    call_command("import_books", str(self._write_csv(rows)), "--engine", engine, stdout=io.StringIO())
+        self.assertFalse(Book.objects.exists())
+
+        rows[2]["total_copies"] = "1_0.9"
+        call_command("import_books", str(self._write_csv(rows)), "--engine", "copy", stdout=io.StringIO())
+        self.assertEqual(
+            dict(Book.objects.values_list("title", "total_copies")), {"跨行\r\n書名": 2, "千本": 1000, "壞資料": 10}
+        )
+        self.assertEqual(Book.objects.get(title="千本").available_copies, 100)
+        out = io.StringIO()
+        call_command("import_books", str(self._write_csv(rows)), "--engine", "batch", stdout=out)
+        self.assertIn("新增 0 筆、變更 0 筆、未變更 3 筆", out.getvalue())
+
+    def test_parallel_parsing_matches_serial_rows_and_warnings(self):
+        from .import_workers import iter_rows_parallel
+        from .importer import ImportRow, iter_rows
+
+        rows = [self._row(f"第{i}冊", total="2", available="5" if i % 7 == 0 else "1") for i in range(40)]
+        rows[3]["title"] = "跨行\n書名, 含 \"引號\""
+        rows[11]["skip"] = "yes"
+        csv_path = self._write_csv(rows)
+
+        def collect(iterate, prepared=False, **kwargs):
+            events = []
+            for line, row in iterate(csv_path, warn=lambda message: events.append(message), **kwargs):
+                if isinstance(row, ImportRow):
+                    # 平行解析時工作行程已算好 search_document，其餘欄位須與逐行解析相同
+                    # prepared=None：切錯改用單一行程解析後的資料列沒有預先算好的 search_document
+                    document = build_document(row.title, row.author, row.category)
+                    expected = {True: {document}, False: {""}, None: {document, ""}}[prepared]
+                    self.assertIn(row.search_document, expected)
+                    row = row._replace(search_document="")
+                events.append((line, row))
+            return events
+
+        serial = collect(iter_rows)
+        with mock.patch("books.import_workers.RANGE_BYTES", 64):
+            self.assertEqual(collect(iter_rows_parallel, True, workers=3), serial)
+            self.assertEqual(
+                collect(iter_rows_parallel, True, workers=2, start_line=20), collect(iter_rows, start_line=20)
+            )
+
+        # 未加引號的欄位中出現 "（引號數的奇偶與實際的 CSV 狀態不符），之後再有跨行的引號欄位：
+        # 切點可能落在跨行欄位內，須改用單一行程解析，結果仍與逐行解析相同
+        stray_path = csv_path.with_name("stray.csv")
+        lines = [",".join(self.required_headers)]
+        lines += [f"第{i}本,作者,文學,1,1,," for i in range(6)]
+        lines += ['ab"c,x,,1,1,,', "中間,作者,文學,1,1,,", '"multi\nline",作者,文學,1,1,,', '結"尾,作者,文學,1,1,,']
+        stray_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        self.addCleanup(stray_path.unlink)
+        csv_path = stray_path
+        expected = collect(iter_rows)
+        self.assertEqual(expected[-2], (11, ImportRow(11, "multi\nline", "作者", "文學", 1, 1, "available", mock.ANY)))
+        for size in (16, 24, 40, 64, 96):
+            with mock.patch("books.import_workers.RANGE_BYTES", size):
+                self.assertEqual(collect(iter_rows_parallel, None, workers=2), expected, size)
+        with mock.patch("books.import_workers.RANGE_BYTES", 40):
+            out = io.StringIO()
+            call_command("import_books", str(stray_path), "--workers", "2", stdout=out)
+            self.assertIn("新增 10 筆", out.getvalue())
+            self.assertIn("單一行程", out.getvalue())
+        csv_path = self._write_csv(rows)
+
+        out = io.StringIO()
+        call_command("import_books", str(csv_path), "--workers", "2", stdout=out)
+        self.assertIn("新增 39 筆、變更 0 筆、未變更 0 筆、略過 1 筆", out.getvalue())
+        self.assertEqual(Book.objects.get(title__startswith="跨行").available_copies, 1)
+
+        rows[25]["total_copies"] = "abc"
+        with mock.patch("books.import_workers.RANGE_BYTES", 64):
+            # 跨行的書名佔兩行，行號與檔案中的實際行號一致
+            with self.assertRaisesMessage(CommandError, "第 28 行欄位 total_copies 的值無法轉換為整數：abc"):
+                call_command("import_books", str(self._write_csv(rows)), "--workers", "2", stdout=io.StringIO())
+
+    def _assert_delta_import(self, engine):
+        manual = Book.objects.create(title="館藏手動新增", author="館員")
+        # 全形空白（U+3000）與不斷行空白（U+00A0）：兩種 engine 都要與 str.strip() 一樣去除
+        padded = self._row("\u3000全形空白\u00a0", "\u00a0作者\u3000", "\u3000文學")
+        rows = [self._row("不變"), self._row("改數量"), self._row("下架"), self._row("暫停"), padded]
+        call_command("import_books", str(self._write_csv(rows)), "--engine", engine, stdout=io.StringIO())
+        unchanged_at = Book.objects.get(title="不變").updated_at
+        self.assertEqual(Book.objects.filter(title="全形空白", author="作者", category__name="文學").count(), 1)
+
+        # skip 的行仍是來源列出的書，不算來源已無
+        rows = [self._row("不變"), self._row("改數量", total="3"), self._row("新書"), self._row("暫停", skip="yes"), padded]
+        csv_path = self._write_csv(rows)
+        out = io.StringIO()
+        call_command("import_books", str(csv_path), "--engine", engine, stdout=out)
+        self.assertIn("新增 1 筆、變更 1 筆、未變更 2 筆、略過 1 筆、來源已無 1 筆", out.getvalue())
+        self.assertIn("--mark-missing", out.getvalue())
+        self.assertEqual(Book.objects.get(title="不變").updated_at, unchanged_at)
+        self.assertEqual(Book.objects.get(title="改數量").total_copies, 3)
+        self.assertEqual(Book.objects.get(title="下架").status, "available")
+
+        out = io.StringIO()
+        call_command("import_books", str(csv_path), "--engine", engine, "--mark-missing", stdout=out)
+        self.assertIn("新增 0 筆、變更 0 筆、未變更 4 筆、略過 1 筆、來源已無 1 筆", out.getvalue())
+        removed = Book.objects.get(title="下架")
+        self.assertEqual((removed.status, removed.import_hash), ("unavailable", ""))
+        self.assertEqual(Book.objects.get(title="暫停").status, "available")
+        manual.refresh_from_db()
+        self.assertEqual((manual.status, manual.import_hash), ("available", ""))
+        self.assertEqual(Category.objects.get(name="文學").book_count, 6)
+
+        # 來源重新列出時視為變更，恢復為來源的狀態
+        csv_path = self._write_csv(rows + [self._row("下架")])
+        call_command("import_books", str(csv_path), "--engine", engine, stdout=io.StringIO())
+        self.assertEqual(Book.objects.get(title="下架").status, "available")
+
+        # 兩種 engine 算出的鍵與內容雜湊一致
+        other = "batch" if engine == "copy" else "copy"
+        out = io.StringIO()
+        call_command("import_books", str(csv_path), "--engine", other, stdout=out)
+        self.assertIn("新增 0 筆、變更 0 筆、未變更 5 筆", out.getvalue())
+
+    def test_delta_import_skips_unchanged_rows(self):
+        self._assert_delta_import("batch")
+
+    def test_copy_engine_delta_import(self):
+        self._assert_delta_import("copy")
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_user(email="admin@example.com", password="AdminPass123!", is_staff=True)
+        self.reader = User.objects.create_user(email="reader@example.com", password="ReaderPass123!")
+        fiction = Category.objects.create(name="文學")
+        self.book = Book.objects.create(title="雪國", author="川端康成", category=fiction, total_copies=3, available_copies=2)
+        Book.objects.create(title="無分類, 含逗號", author="佚名", total_copies=1, available_copies=1)
+
+    def test_books_csv_round_trips_with_import_books(self):
+        path = Path(tempfile.mkdtemp()) / "books.csv"
+        self.addCleanup(lambda: path.unlink(missing_ok=True))
+        out = io.StringIO()
+        call_command("export_catalog", "books", "--output", str(path), "--chunk-size", "1", stdout=out)
+        self.assertIn("已匯出 books", out.getvalue())
+        with path.open(encoding="utf-8", newline="") as fh:
+            rows = list(csv.DictReader(fh))
+        self.assertEqual(list(rows[0]), ["title", "author", "category", "total_copies", "available_copies", "skip", "status"])
+        self.assertEqual(rows[1]["category"], "")
+
+        # 第一次匯入補上 import_hash（手動建立的書沒有），再匯入同一檔案即全部未變更
+        call_command("import_books", str(path), stdout=io.StringIO())
+        out = io.StringIO()
+        call_command("import_books", str(path), stdout=out)
+        self.assertIn("新增 0 筆、變更 0 筆、未變更 2 筆", out.getvalue())
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.category.name, self.book.available_copies), ("文學", 2))
+
+    def test_export_endpoint_streams_for_staff_only(self):
+        from favorites.models import Favorite
+        from loans.services import loan_book
+
+        loan_book(user=self.reader, book=self.book)
+        Favorite.objects.create(user=self.reader, book=self.book)
+
+        url = reverse("export", kwargs={"resource": "books", "fmt": "csv"})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=self.reader)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(url, HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        self.assertIn('filename="books-', response["Content-Disposition"])
+        body = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(len(list(csv.reader(io.StringIO(body)))), 3)
+
+        for resource in ("loans", "favorites"):
+            response = self.client.get(reverse("export", kwargs={"resource": resource, "fmt": "ndjson"}))
+            lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+            self.assertEqual(len(lines), 1)
+            row = json.loads(lines[0])
+            self.assertEqual((row["user"], row["book_id"], row["title"]), ("reader@example.com", self.book.pk, "雪國"))
+
+        response = self.client.get(reverse("export", kwargs={"resource": "users", "fmt": "csv"}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CategoryBookCountTests(TestCase):
+    def setUp(self):
+        self.history = Category.objects.create(name="歷史")
+        self.scifi = Category.objects.create(name="科幻")
+
+    def counts(self):
+        return dict(Category.objects.filter(is_system=False).values_list("name", "book_count"))
+
+    def test_counts_follow_saves_bulk_writes_and_deletes(self):
+        book = Book.objects.create(title="史記", author="司馬遷", category=self.history)
+        Book.objects.create(title="基地", author="Asimov", category=self.scifi)
+        self.assertEqual(self.counts(), {"歷史": 1, "科幻": 1})
+
+        book.category = self.scifi
+        book.save()
+        book.save(update_fields=["title"])
+        self.assertEqual(self.counts(), {"歷史": 0, "科幻": 2})
+
+        Book.objects.bulk_create([Book(title=f"通史 {i}", author="A", category=self.history) for i in range(3)])
+        self.assertEqual(self.counts(), {"歷史": 3, "科幻": 2})
+
+        Book.objects.filter(category=self.history).update(category=self.scifi)
+        self.assertEqual(self.counts(), {"歷史": 0, "科幻": 5})
+
+        Book.objects.filter(title__startswith="通史").delete()
+        self.assertEqual(self.counts(), {"歷史": 0, "科幻": 2})
+
+    def test_reconcile_command_fixes_drift(self):
+        Book.objects.create(title="史記", author="司馬遷", category=self.history)
+        Category.objects.filter(pk=self.history.pk).update(book_count=7)
+        Category.objects.filter(pk=self.scifi.pk).update(book_count=2)
+
+        out = io.StringIO()
+        call_command("reconcile_category_counts", "--dry-run", stdout=out)
+        self.assertIn("2 個分類", out.getvalue())
+        self.assertEqual(self.counts(), {"歷史": 7, "科幻": 2})
+
+        call_command("reconcile_category_counts", stdout=io.StringIO())
+        self.assertEqual(self.counts(), {"歷史": 1, "科幻": 0})
+
+        with self.assertNumQueries(1):
+            self.client.get(reverse("category-list"))
+
+
+class CatalogIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = catalog_index.CatalogIndex()
+        self.index.load([
+            (1, build_document("銀河漫遊指南", "Douglas Adams", "科幻")),
+            (2, build_document("銀河帝國", "Isaac Asimov", "科幻")),
+            (3, build_document("世界歷史概論", "Alice Galaxy", "歷史")),
+        ])
+
+    def search(self, terms):
+        return [book_id for book_id, _ in self.index.search(terms, 10)]
+
+    def test_search_uses_and_prefix_semantics_and_ranks_title_first(self):
+        self.assertEqual(self.search(["銀河", "指南"]), [1])
+        self.assertEqual(self.search(["asim"]), [2])
+        self.assertEqual(sorted(self.search(["銀"])), [1, 2])
+        self.assertEqual(self.search(["銀河", "歷史"]), [])
+
+        self.index.update(4, build_document("Galaxy Atlas", "Zed", ""))
+        self.assertEqual(self.search(["galaxy"]), [4, 3])
+
+    def test_update_and_remove_replace_postings(self):
+        self.index.update(2, build_document("基地", "Isaac Asimov", "科幻"))
+        self.assertEqual(self.search(["帝國"]), [])
+        self.assertEqual(self.search(["基地"]), [2])
+
+        self.index.remove(1)
+        self.assertEqual(self.search(["銀河"]), [])
+        self.assertEqual(len(self.index), 2)
+
+
+@override_settings(BOOK_SEARCH_ENGINE="memory")
+class MemorySearchEngineAPITests(APITestCase):
+    def setUp(self):
+        catalog_index.invalidate()
+        self.book = Book.objects.create(title="銀河漫遊指南", author="Douglas Adams")
+        self.list_url = reverse("book-list")
+
+    def test_query_reads_in_memory_index_and_follows_saves(self):
+        response = self.client.get(self.list_url, {"query": "漫遊"})
+        self.assertEqual([b["id"] for b in response.json()["results"]], [self.book.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Book.objects.create(title="漫遊者", author="Someone")
+            self.book.title = "宇宙盡頭的餐廳"
+            self.book.save()
+
+        response = self.client.get(self.list_url, {"query": "漫遊"})
+        self.assertEqual([b["id"] for b in response.json()["results"]], [other.id])
+        response = self.client.get(self.list_url, {"query": "餐廳"})
+        self.assertEqual([b["id"] for b in response.json()["results"]], [self.book.id])
+
+    def test_saves_without_document_change_keep_the_shared_generation(self):
+        self.client.get(self.list_url, {"query": "漫遊"})
+        before = catalog_index.generation()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.available_copies = 0
+            self.book.save()
+        self.assertEqual(catalog_index.generation(), before)
+        self.assertEqual(catalog_index.get_index().generation, before)
+
+    def publish_from_another_process(self, title):
+        """另一個行程的寫入：本行程看不到它的 on_commit，只看得到 ChangeLog 裡的增量。"""
+        other = Book.objects.create(title=title, author="Someone")
+        return other, catalog_index._log.publish((other.id, other.search_document))
+
+    def test_changes_from_another_process_are_replayed_without_a_reload(self):
+        self.client.get(self.list_url, {"query": "漫遊"})
+        other, _ = self.publish_from_another_process("漫遊者")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.title = "宇宙盡頭的餐廳"
+            self.book.save()
+        self.assertNotEqual(catalog_index._index.generation, catalog_index.generation())
+
+        with mock.patch.object(catalog_index, "_reload") as reload:
+            response = self.client.get(self.list_url, {"query": "漫遊"})
+            self.assertEqual([b["id"] for b in response.json()["results"]], [other.id])
+            response = self.client.get(self.list_url, {"query": "餐廳"})
+            self.assertEqual([b["id"] for b in response.json()["results"]], [self.book.id])
+        reload.assert_not_called()
+        self.assertEqual(catalog_index._index.generation, catalog_index.generation())
+
+    def test_evicted_change_or_bulk_write_forces_a_reload(self):
+        self.client.get(self.list_url, {"query": "漫遊"})
+        other, version = self.publish_from_another_process("漫遊者")
+        cache.delete(f"{catalog_index.GENERATION_KEY}:{version}")
+
+        # 缺口可能只是增量還沒寫入：先停在缺口前的版本，超過 HOLE_WAIT 才整批重建
+        self.assertEqual(catalog_index.get_index().generation, version - 1)
+        with mock.patch.object(catalog_index, "HOLE_WAIT", -1):
+            response = self.client.get(self.list_url, {"query": "漫遊者"})
+        self.assertEqual([b["id"] for b in response.json()["results"]], [other.id])
+
+        Book.objects.filter(pk=other.pk).update(title="星際大戰", search_document=build_document("星際大戰", "Someone"))
+        catalog_index.invalidate()
+        response = self.client.get(self.list_url, {"query": "星際"})
+        self.assertEqual([b["id"] for b in response.json()["results"]], [other.id])
+
+
+class SuggestIndexTests(SimpleTestCase):
+    def test_prefix_suggestions_are_ranked_and_bounded(self):
+        index = suggest.SuggestIndex(max_keys=6)
+        index.load([
+            ("category", "科幻", 3),
+            ("author", "Douglas Adams", 2),
+            ("title", "The Hitchhiker's Guide to the Galaxy", 1),
+            ("title", "銀河帝國", 1),
+        ])
+
+        self.assertEqual(index.suggest("dou"), [{"text": "Douglas Adams", "type": "author", "count": 2}])
+        self.assertEqual([s["text"] for s in index.suggest("adam")], ["Douglas Adams"])
+        self.assertEqual(index.suggest("科"), [{"text": "科幻", "type": "category", "count": 3}])
+        # 英文書名需要 4 個 key，超過上限而不收錄；後面較短的標籤仍可放入
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.suggest("galaxy"), [])
+        self.assertEqual([s["text"] for s in index.suggest("銀河")], ["銀河帝國"])
+
+    def test_adjust_adds_and_removes_labels(self):
+        index = suggest.SuggestIndex(max_keys=100)
+        index.load([("title", "銀河帝國", 1)])
+
+        index.adjust("title", "銀河漫遊指南", 1)
+        index.adjust("title", "銀河帝國", -1)
+        self.assertEqual([s["text"] for s in index.suggest("銀河")], ["銀河漫遊指南"])
+
+    def test_wide_prefix_ranks_the_whole_range(self):
+        # 3000 個只有一本書的 z 開頭書名排在 "zebra popular" 之前，排名仍須看整段範圍
+        labels = [("title", "zebra popular", 500)] + [("title", f"z{i:05d}", 1) for i in range(3000)]
+        index = suggest.SuggestIndex(max_keys=10_000)
+        index.load(labels)
+        self.assertEqual([s["text"] for s in index.suggest("z", 3)], ["zebra popular", "z00000", "z00001"])
+        self.assertEqual([s["text"] for s in index.suggest("z0", 2)], ["z00000", "z00001"])
+        self.assertEqual(index.suggest("popular", 1), [{"text": "zebra popular", "type": "title", "count": 500}])
+
+        # 計數增減後的結果與重新載入相同（含掉出 / 擠進前段、新增與移除標籤）
+        rnd = random.Random(5)
+        counts = dict(((kind, text), count) for kind, text, count in labels)
+        for step in range(400):
+            kind, text = rnd.choice([("title", "zebra popular"), ("author", f"z{step:04d}")] + list(counts)[:60])
+            delta = rnd.choice([-3, -1, 1, 2, 40])
+            index.adjust(kind, text, delta)
+            if counts.get((kind, text), 0) + delta > 0:
+                counts[(kind, text)] = counts.get((kind, text), 0) + delta
+            else:
+                counts.pop((kind, text), None)
+            if step % 50 == 0:
+                fresh = suggest.SuggestIndex(max_keys=10_000)
+                fresh.load((kind, text, count) for (kind, text), count in counts.items())
+                for prefix in ("z", "z0", "z00", "ze"):
+                    for limit in (1, 8, 20, 50):
+                        self.assertEqual(index.suggest(prefix, limit), fresh.suggest(prefix, limit), (step, prefix))
+
+        # 前段的標籤全部移除後，剩下的名次只能重新掃描取得
+        for entry in index.suggest("z", 50):
+            index.adjust(entry["type"], entry["text"], -entry["count"])
+            counts.pop((entry["type"], entry["text"]))
+        fresh = suggest.SuggestIndex(max_keys=10_000)
+        fresh.load((kind, text, count) for (kind, text), count in counts.items())
+        for limit in (1, 20, 50):
+            self.assertEqual(index.suggest("z", limit), fresh.suggest("z", limit))
+
+
+class BookSuggestAPITests(APITestCase):
+    def setUp(self):
+        suggest.invalidate()
+        self.category = Category.objects.create(name="科幻")
+        Book.objects.create(title="銀河漫遊指南", author="Douglas Adams", category=self.category)
+        Book.objects.create(title="宇宙盡頭的餐廳", author="Douglas Adams", category=self.category)
+        self.url = reverse("book-suggest")
+
+    def test_suggest_returns_top_labels_and_follows_saves(self):
+        response = self.client.get(self.url, {"q": "doug"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [{"text": "Douglas Adams", "type": "author", "count": 2}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title="銀河便車指南", author="Douglas Adams")
+            book = Book.objects.get(title="銀河漫遊指南")
+            book.title = "星際漫遊"
+            book.save()
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"q": "銀河", "limit": 5})
+        self.assertEqual([s["text"] for s in response.json()], ["銀河便車指南"])
+        response = self.client.get(self.url, {"q": "doug"})
+        self.assertEqual(response.json()[0]["count"], 3)
+
+    def test_save_with_same_labels_keeps_the_shared_generation(self):
+        self.client.get(self.url, {"q": "doug"})
+        before = suggest._log.generation()
+
+        book = Book.objects.get(title="銀河漫遊指南")
+        with self.captureOnCommitCallbacks(execute=True):
+            book.available_copies = 0
+            book.save()
+            Book.objects.get(pk=book.pk).save()
+        self.assertEqual(suggest._log.generation(), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.category = None
+            book.save()
+        self.assertEqual(suggest._log.generation(), before + 1)
+        self.assertEqual(suggest.get_index().generation, before + 1)
+        self.assertEqual(self.client.get(self.url, {"q": "科幻"}).json()[0]["count"], 1)
+
+    def test_changes_from_another_process_are_replayed_without_queries(self):
+        self.client.get(self.url, {"q": "doug"})
+        # 另一個行程新增一本、改掉一本的作者：本行程只看得到 ChangeLog 裡的 (old, new)
+        suggest._log.publish((None, ("銀河便車指南", "Douglas Adams", "科幻")))
+        suggest._log.publish((("宇宙盡頭的餐廳", "Douglas Adams", "科幻"), ("宇宙盡頭的餐廳", "道格拉斯", "科幻")))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {"q": "doug"})
+            self.assertEqual(response.json()[0]["count"], 2)
+            self.assertEqual(self.client.get(self.url, {"q": "科幻"}).json()[0]["count"], 3)
+        self.assertEqual(suggest.get_index().generation, suggest._log.generation())
@@ -1,10 +1,14 @@
 # books/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import BookViewSet, CategoryViewSet
+from .views import BookViewSet, CategoryViewSet, ExportView
 
 router = DefaultRouter()
 router.register(r"books", BookViewSet, basename="book")
 router.register(r"categories", CategoryViewSet, basename="category")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("export/<str:resource>.<str:fmt>", ExportView.as_view(), name="export"),
+    *router.urls,
+]
 
@@ -0,0 +1,69 @@
+# books/user_state.py
+"""書籍列表／明細的 ?with=user_state：附上目前使用者對每本書的狀態。
+
+- is_favorited：是否已收藏（Exists）；
+- active_loan_id：借閱中（active／overdue）的 Loan id（Subquery），沒有則為 null；
+- reservation_position：待處理預約在該書佇列中的順位（1 起算，依 created_at, id，
+  與 loans.services.return_loan 轉出預約的順序相同），沒有則為 null。
+
+三者都是同一個 SELECT 裡的相關子查詢，整頁只需一次查詢；未登入時直接給常數。
+"""
+from __future__ import annotations
+
+from typing import List
+
+from django.db.models import BooleanField, Count, Exists, IntegerField, OuterRef, Q, QuerySet, Subquery, Value
+from rest_framework.exceptions import ValidationError
+
+WITH_PARAM = "with"
+USER_STATE = "user_state"
+WITH_OPTIONS = (USER_STATE,)
+USER_STATE_FIELDS = ("is_favorited", "active_loan_id", "reservation_position")
+
+
+def parse_with(value: str | None) -> List[str]:
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in WITH_OPTIONS]
+    if unknown:
+        raise ValidationError({WITH_PARAM: f"不支援的選項：{', '.join(unknown)}（可用 {', '.join(WITH_OPTIONS)}）"})
+    return list(dict.fromkeys(names))
+
+
+def annotate_user_state(queryset: QuerySet, user) -> QuerySet:
+    if not user or not user.is_authenticated:
+        return queryset.annotate(
+            is_favorited=Value(False, output_field=BooleanField()),
+            active_loan_id=Value(None, output_field=IntegerField()),
+            reservation_position=Value(None, output_field=IntegerField()),
+        )
+
+    from favorites.models import Favorite
+    from loans.models import Loan
+
+    active_loan = Loan.objects.filter(
+        user=user,
+        book=OuterRef("pk"),
+        type=Loan.Type.LOAN,
+        status__in=[Loan.Status.ACTIVE, Loan.Status.OVERDUE],
+    ).order_by("-created_at", "-id")
+
+    pending = Loan.objects.filter(type=Loan.Type.RESERVATION, status=Loan.Status.PENDING)
+    ahead = (
+        pending.filter(book=OuterRef("book"))
+        .filter(Q(created_at__lt=OuterRef("created_at")) | Q(created_at=OuterRef("created_at"), id__lte=OuterRef("id")))
+        .order_by()
+        .values("book")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    own_reservation = (
+        pending.filter(user=user, book=OuterRef("pk"))
+        .order_by("created_at", "id")
+        .annotate(position=Subquery(ahead, output_field=IntegerField()))
+    )
+
+    return queryset.annotate(
+        is_favorited=Exists(Favorite.objects.filter(user=user, book=OuterRef("pk"))),
+        active_loan_id=Subquery(active_loan.values("id")[:1], output_field=IntegerField()),
+        reservation_position=Subquery(own_reservation.values("position")[:1], output_field=IntegerField()),
+    )
@@ -1,22 +1,34 @@
-from django.db.models import Count, Q
+from functools import lru_cache
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import viewsets, status, permissions, generics
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.pagination import PageNumberPagination
+
+from config.fields import SparseFieldsetMixin
+from config.pagination import CursorOptInPagination
+from config.row_mapper import compile_row_mapper
 
 from .models import Book, Category
-from .serializers import BookSerializer, CategorySerializer
-from .filters import BookFilter 
+from .serializers import BookSerializer, BookUserStateSerializer, CategorySerializer
+from .filters import BookFilter, BookOrderingFilter
+from . import availability, exporter, facets, suggest, user_state
+from .cache import CatalogCacheMixin
 
-class DefaultPagination(PageNumberPagination):
-    """確保列表回傳 count / results 結構"""
+class DefaultPagination(CursorOptInPagination):
+    """確保列表回傳 count / results 結構；?cursor= 時改為 keyset 分頁（title, id）"""
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 100
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all().order_by("name")
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -30,9 +42,6 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]
         return super().get_permissions()
 
-    def get_queryset(self):
-        return super().get_queryset().annotate(book_count=Count("books"))
-
     def destroy(self, request, *args, **kwargs):
         obj = self.get_object()
         if obj.books.exists():
@@ -43,11 +52,18 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class BookViewSet(viewsets.ModelViewSet):
+@lru_cache(maxsize=64)
+def book_list_rows(fields=None, serializer_class=BookSerializer):
+    """BookSerializer 的唯讀快速版本（values_list + 預先組好的 row → dict）；fields 為 ?fields= 的欄位。"""
+    return compile_row_mapper(serializer_class, fields)
+
+
+class BookViewSet(SparseFieldsetMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Book.objects.select_related("category").all()
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # ?query= 由 BookFilter 走全文檢索；category/status 篩選也在 BookFilter
+    filter_backends = [DjangoFilterBackend, SearchFilter, BookOrderingFilter]
     filterset_class = BookFilter
     search_fields = ["title", "author", "category__name"]
     ordering_fields = ["id", "title", "author", "available_copies", "total_copies"]
@@ -59,38 +75,75 @@ class BookViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]
         return super().get_permissions()
 
-    def list(self, request, *args, **kwargs):
-        """支援 ?query= 模糊搜尋 + category/status 篩選"""
-        queryset = self.get_queryset()
-
-        # 模糊搜尋
-        query = request.query_params.get("query")
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query)
-                | Q(author__icontains=query)
-                | Q(category__name__icontains=query)
-            )
-
-        # 額外篩選
-        category = request.query_params.get("category")
-        if category:
-            queryset = queryset.filter(category_id=category)
+    def wants_user_state(self) -> bool:
+        """?with=user_state（只在 list / retrieve 生效）。"""
+        if not hasattr(self, "_with"):
+            self._with = []
+            if self.request.method in ("GET", "HEAD") and self.action in ("list", "retrieve"):
+                self._with = user_state.parse_with(self.request.query_params.get(user_state.WITH_PARAM))
+        return user_state.USER_STATE in self._with
 
-        status_param = request.query_params.get("status")
-        if status_param:
-            queryset = queryset.filter(status=status_param)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.wants_user_state():
+            queryset = user_state.annotate_user_state(queryset, self.request.user)
+        return queryset
 
-        queryset = self.filter_queryset(queryset)
+    def get_serializer_class(self):
+        if self.wants_user_state():
+            return BookUserStateSerializer
+        return super().get_serializer_class()
 
-        # 分頁處理
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+    def is_catalog_cacheable(self, request) -> bool:
+        # 使用者狀態因人而異、預約佇列長度不影響 catalog version：這兩者不進共用快取、不給 ETag
+        return self.action != "availability" and not self.wants_user_state()
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def list(self, request, *args, **kwargs):
+        # 覆寫了 ListModelMixin.list，回應快取需在這裡自行包上
+        return self._cached_response(self._list, request, *args, **kwargs)
+
+    def _list(self, request, *args, **kwargs):
+        """?facets=category,status 時在分頁結果旁附上 facets 計數（同一組篩選條件）。"""
+        names = facets.parse_facets(request.query_params.get("facets"))
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = book_list_rows(self.get_fieldset(), self.get_serializer_class())
+        if rows is not None and self.paginator.cursor_query_param not in request.query_params:
+            # 頁碼分頁走快速路徑；keyset 分頁需要 model 實例取排序鍵，仍用 serializer
+            page = self.paginate_queryset(queryset.values_list(*rows.columns))
+            data = rows.map(page)
+        else:
+            page = self.paginate_queryset(queryset)
+            data = self.get_serializer(page, many=True).data
+        response = self.get_paginated_response(data)
+        if names:
+            response.data["facets"] = facets.cached_facet_counts(queryset, names, request.query_params)
+        return response
+
+    @action(
+        detail=False,
+        methods=["get", "post"],
+        pagination_class=None,
+        filter_backends=[],
+        permission_classes=[permissions.AllowAny],
+    )
+    def availability(self, request):
+        """多本書的即時庫存：GET ?ids=1,2,3 或 POST {"ids": [1, 2, 3]}，回傳 {id: {available, total, status, queue_length}}。"""
+        if request.method == "POST":
+            ids = request.data.get("ids") if isinstance(request.data, dict) else None
+            if not isinstance(ids, list):
+                ids = [ids] if ids is not None else []
+        else:
+            ids = request.query_params.getlist("ids")
+        return Response(availability.availability(availability.parse_ids(ids)))
+
+    @action(detail=False, methods=["get"], pagination_class=None, filter_backends=[])
+    def suggest(self, request):
+        """自動完成：?q= 前綴、?limit= 筆數（預設 8、上限 20），資料來自行程內索引，不查詢資料庫。"""
+        try:
+            limit = min(max(int(request.query_params.get("limit", 8)), 1), 20)
+        except ValueError:
+            limit = 8
+        return Response(suggest.suggest(request.query_params.get("q", ""), limit))
 
 
 class BookDetailView(generics.RetrieveAPIView):
@@ -115,3 +168,30 @@ class AdminBookDeleteView(generics.DestroyAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.IsAdminUser]
+
+
+class _IgnoreAcceptNegotiation(BaseContentNegotiation):
+    """匯出固定回 CSV / NDJSON，不因 Accept: text/csv 之類的標頭回 406。"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportView(APIView):
+    """GET /api/export/<resource>.<fmt>：管理員串流匯出 books / loans / favorites（見 books/exporter.py）。"""
+    permission_classes = [permissions.IsAdminUser]
+    content_negotiation_class = _IgnoreAcceptNegotiation
+
+    def get(self, request, resource, fmt):
+        if resource not in exporter.EXPORTS or fmt not in exporter.FORMATS:
+            raise NotFound(f"不支援的匯出：{resource}.{fmt}")
+        response = StreamingHttpResponse(
+            (chunk.encode("utf-8") for chunk in exporter.stream(resource, fmt)),
+            content_type=exporter.FORMATS[fmt],
+        )
+        response["Content-Disposition"] = f'attachment; filename="{resource}-{timezone.localdate():%Y%m%d}.{fmt}"'
+        response["Cache-Control"] = "no-store"
+        return response
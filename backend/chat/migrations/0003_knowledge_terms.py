@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_terms(apps, schema_editor):
+    """為既有片段建立倒排索引與 token_count。"""
+    from chat.services.lexical import term_counts
+
+    KnowledgeChunk = apps.get_model("chat", "KnowledgeChunk")
+    KnowledgeTerm = apps.get_model("chat", "KnowledgeTerm")
+    batch = []
+    for chunk in KnowledgeChunk.objects.only("id", "text").iterator(chunk_size=500):
+        counts = term_counts(chunk.text)
+        KnowledgeChunk.objects.filter(id=chunk.id).update(token_count=sum(counts.values()))
+        batch.extend(KnowledgeTerm(chunk_id=chunk.id, term=t, tf=n) for t, n in counts.items())
+        if len(batch) >= 5000:
+            KnowledgeTerm.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        KnowledgeTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_knowledge_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='token_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='KnowledgeTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('tf', models.PositiveIntegerField(default=1)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='chat.knowledgechunk')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'chunk'), name='uniq_knowledge_term_chunk')],
+            },
+        ),
+        migrations.RunPython(backfill_terms, migrations.RunPython.noop),
+    ]
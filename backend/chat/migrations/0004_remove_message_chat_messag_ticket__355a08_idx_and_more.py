@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_knowledge_terms'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='chat_messag_ticket__355a08_idx',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['ticket', 'created_at', 'id'], name='chat_messag_ticket__86df30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['updated_at', 'id'], name='chat_ticket_updated_8f4187_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='chat_ticket_user_id_ef2f80_idx'),
+        ),
+    ]
@@ -54,6 +54,9 @@ class Ticket(models.Model):
         ordering = ["-updated_at", "-id"]
         indexes = [
             models.Index(fields=["status", "created_at"]),
+            # 工單列表（-updated_at, -id）與 keyset 分頁
+            models.Index(fields=["updated_at", "id"]),
+            models.Index(fields=["user", "updated_at", "id"]),
         ]
 
     def __str__(self) -> str:  # pragma: no cover
@@ -88,7 +91,7 @@ class Message(models.Model):
     class Meta:
         ordering = ["created_at", "id"]
         indexes = [
-            models.Index(fields=["ticket", "created_at"]),
+            models.Index(fields=["ticket", "created_at", "id"]),
         ]
 
     def __str__(self) -> str:  # pragma: no cover
@@ -100,8 +103,12 @@ class KnowledgeDoc(models.Model):
     title = models.CharField(max_length=200)
     source = models.CharField(max_length=200, blank=True, default="")  # 例如: handbook.md
     meta = models.JSONField(default=dict, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="")  # 全文 sha256，未變動即略過
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["source"])]
+
     def __str__(self) -> str:  # pragma: no cover
         return self.title
 
@@ -112,6 +119,8 @@ class KnowledgeChunk(models.Model):
     vec = models.JSONField(default=list, blank=True)  # 存 float list；小型專案足夠
     order = models.PositiveIntegerField(default=0)
     meta = models.JSONField(default=dict, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="")  # 片段 sha256，用來沿用向量
+    token_count = models.PositiveIntegerField(default=0)  # BM25 長度正規化用
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -122,3 +131,18 @@ class KnowledgeChunk(models.Model):
 
     def __str__(self) -> str:  # pragma: no cover
         return f"chunk#{self.id} of {self.doc_id}"
+
+
+class KnowledgeTerm(models.Model):
+    """片段的詞彙倒排索引（posting）：一個詞在一個片段出現 tf 次。"""
+    term = models.CharField(max_length=64)
+    chunk = models.ForeignKey(KnowledgeChunk, on_delete=models.CASCADE, related_name="terms")
+    tf = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["term", "chunk"], name="uniq_knowledge_term_chunk"),
+        ]
+
+    def __str__(self) -> str:  # pragma: no cover
+        return f"{self.term}@{self.chunk_id}×{self.tf}"
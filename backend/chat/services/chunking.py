@@ -0,0 +1,131 @@
+# chat/services/chunking.py
+"""RAG 文件切片。
+
+單次 regex 掃描找出句界（中日韓句號、Latin 句點後接空白、換行），
+再依目標／上限大小貪婪打包句子；過長的句子會在上限處硬切，
+相鄰片段可保留少量句子作為重疊。大小可用字元或估算 token 計算。
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import List, Tuple
+
+CHUNK_UNIT = os.getenv("RAG_CHUNK_UNIT", "chars")  # chars | tokens
+CHUNK_TARGET = int(os.getenv("RAG_CHUNK_TARGET", "500"))
+CHUNK_MAX = int(os.getenv("RAG_CHUNK_MAX", "800"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "0"))
+
+# 句界：CJK 終止符（可帶右引號／括號）、Latin 終止符後接空白、或換行。
+_BOUNDARY_RE = re.compile(
+    r"[。！？；…]+[」』”’）)]*"
+    r"|[.!?;]+[\"'”’)]*(?=\s)"
+    r"|\n+"
+)
+# 粗估 token：每個 CJK 字一個、每個 Latin 單字／數字一個、其他符號各一個。
+_TOKEN_RE = re.compile(
+    r"[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]"
+    r"|[A-Za-z0-9_]+"
+    r"|[^\sA-Za-z0-9_]"
+)
+
+Span = Tuple[int, int, int]  # (start, end, size)
+
+
+def _size(text: str, start: int, end: int, unit: str) -> int:
+    if unit == "tokens":
+        return sum(1 for _ in _TOKEN_RE.finditer(text, start, end))
+    return end - start
+
+
+def _hard_split(text: str, start: int, end: int, limit: int, unit: str) -> List[Span]:
+    """把超過上限的句子在 limit 處硬切；token 模式沿 token 邊界切。"""
+    out: List[Span] = []
+    if unit == "tokens":
+        cut, count = start, 0
+        for m in _TOKEN_RE.finditer(text, start, end):
+            if count == limit:
+                out.append((cut, m.start(), count))
+                cut, count = m.start(), 0
+            count += 1
+        if count:
+            out.append((cut, end, count))
+        return out
+    for pos in range(start, end, limit):
+        stop = min(pos + limit, end)
+        out.append((pos, stop, stop - pos))
+    return out
+
+
+def _sentences(text: str, limit: int, unit: str) -> List[Span]:
+    spans: List[Span] = []
+    start = 0
+    for m in _BOUNDARY_RE.finditer(text):
+        end = m.end()
+        if end > start:
+            spans.extend(_split_if_needed(text, start, end, limit, unit))
+        start = end
+    if start < len(text):
+        spans.extend(_split_if_needed(text, start, len(text), limit, unit))
+    return spans
+
+
+def _split_if_needed(text: str, start: int, end: int, limit: int, unit: str) -> List[Span]:
+    size = _size(text, start, end, unit)
+    if size <= limit:
+        return [(start, end, size)]
+    return _hard_split(text, start, end, limit, unit)
+
+
+def chunk_text(
+    text: str,
+    *,
+    target: int | None = None,
+    max_size: int | None = None,
+    overlap: int | None = None,
+    unit: str | None = None,
+) -> List[str]:
+    """將文字切成片段：每段累積到 target 即收尾、絕不超過 max_size，並保留 overlap 的尾句。
+
+    整體為 O(n)：句界與 token 都只掃描一次，打包只移動指標；重疊最多回看 overlap 大小。
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+
+    unit = unit or CHUNK_UNIT
+    max_size = max(int(max_size or CHUNK_MAX), 1)
+    target = min(max(int(target or CHUNK_TARGET), 1), max_size)
+    overlap = int(CHUNK_OVERLAP if overlap is None else overlap)
+    overlap = max(min(overlap, target // 2), 0)
+
+    spans = _sentences(text, max_size, unit)
+    out: List[str] = []
+    first, size, pending = 0, 0, False
+    for i, (_, _, s) in enumerate(spans):
+        if pending and size + s > max_size:
+            first, size = _emit(text, spans, first, i, overlap, out)
+        if size + s > max_size:
+            # 重疊句加上新句仍超過上限時放棄重疊。
+            first, size = i, 0
+        size += s
+        pending = True
+        if size >= target:
+            first, size = _emit(text, spans, first, i + 1, overlap, out)
+            pending = False
+    if pending:
+        _emit(text, spans, first, len(spans), 0, out)
+    return out
+
+
+def _emit(text: str, spans: List[Span], first: int, stop: int, overlap: int,
+          out: List[str]) -> Tuple[int, int]:
+    """輸出 spans[first:stop]，回傳下一段的起點與已帶入的重疊大小。"""
+    piece = text[spans[first][0]:spans[stop - 1][1]].strip()
+    if piece:
+        out.append(piece)
+    nxt, carried = stop, 0
+    while overlap and nxt - 1 > first and carried + spans[nxt - 1][2] <= overlap:
+        nxt -= 1
+        carried += spans[nxt][2]
+    return nxt, carried
@@ -0,0 +1,107 @@
+# chat/services/lexical.py
+"""知識庫的詞彙倒排索引（BM25）。
+
+斷詞見 config.tokenizer.tokenize（CJK bigram + Latin 單字）。
+索引存於 KnowledgeTerm(term, chunk, tf)，匯入時隨片段一起增量寫入，片段刪除時串聯刪除。
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from django.core.cache import cache
+from django.db.models import Avg, Count
+
+from config.tokenizer import tokenize
+
+from ..models import KnowledgeChunk, KnowledgeTerm
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 一次查詢最多讀取的 posting 數；依 df 由稀有到常見挑選詞彙，常見詞超出預算即略過。
+POSTINGS_BUDGET = int(os.getenv("RAG_BM25_POSTINGS_BUDGET", "20000"))
+MAX_DF_RATIO = 0.5
+DF_CACHE_TIMEOUT = 60 * 60
+
+
+def term_counts(text: str) -> Counter:
+    return Counter(tokenize(text))
+
+
+def index_chunks(chunks: Iterable[Tuple[int, Counter]]) -> int:
+    """為已存在的片段寫入 posting；chunks 為 (chunk_id, term Counter)。回傳寫入筆數。"""
+    rows = [
+        KnowledgeTerm(chunk_id=chunk_id, term=term, tf=tf)
+        for chunk_id, counts in chunks
+        for term, tf in counts.items()
+    ]
+    KnowledgeTerm.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def collection_stats(version: int) -> Tuple[int, float]:
+    key = f"rag:bm25_stats:{version}"
+    stats = cache.get(key)
+    if stats is None:
+        agg = KnowledgeChunk.objects.aggregate(n=Count("id"), avgdl=Avg("token_count"))
+        stats = (agg["n"] or 0, float(agg["avgdl"] or 0.0))
+        cache.set(key, stats, timeout=None)
+    return stats
+
+
+def _document_frequencies(terms: set, version: int) -> Dict[str, int]:
+    """各詞的 df，依 corpus_version 快取；只對快取缺少的詞做一次 GROUP BY。"""
+    keys = {f"rag:df:{version}:{hashlib.md5(t.encode('utf-8')).hexdigest()}": t for t in terms}
+    cached = cache.get_many(list(keys))
+    dfs = {keys[k]: v for k, v in cached.items()}
+    missing = [t for t in terms if t not in dfs]
+    if missing:
+        found = dict(
+            KnowledgeTerm.objects.filter(term__in=missing)
+            .values("term").annotate(df=Count("id")).values_list("term", "df")
+        )
+        fresh = {t: found.get(t, 0) for t in missing}
+        cache.set_many(
+            {k: fresh[t] for k, t in keys.items() if t in fresh}, timeout=DF_CACHE_TIMEOUT
+        )
+        dfs.update(fresh)
+    return {t: df for t, df in dfs.items() if df}
+
+
+def bm25_search(query: str, *, limit: int, version: int) -> List[Tuple[int, float]]:
+    """回傳 [(chunk_id, bm25 分數)]，分數由高到低，最多 limit 筆。"""
+    terms = set(tokenize(query))
+    if not terms or limit <= 0:
+        return []
+    n_docs, avgdl = collection_stats(version)
+    if not n_docs:
+        return []
+
+    dfs = _document_frequencies(terms, version)
+    # 出現在過半片段的詞 idf 趨近 0，視為停用詞；其餘依 df 由稀有到常見挑到預算用完。
+    max_df = max(int(n_docs * MAX_DF_RATIO), 1)
+    selected: List[str] = []
+    budget = POSTINGS_BUDGET
+    for term, df in sorted(dfs.items(), key=lambda kv: kv[1]):
+        if df > max_df or (selected and df > budget):
+            break
+        selected.append(term)
+        budget -= df
+    if not selected:
+        return []
+
+    idf = {t: math.log(1 + (n_docs - dfs[t] + 0.5) / (dfs[t] + 0.5)) for t in selected}
+    avgdl = avgdl or 1.0
+    scores: Dict[int, float] = {}
+    postings = KnowledgeTerm.objects.filter(term__in=selected).values_list(
+        "term", "chunk_id", "tf", "chunk__token_count"
+    )
+    for term, chunk_id, tf, dl in postings.iterator(chunk_size=5000):
+        norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * (dl or 0) / avgdl)
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + idf[term] * tf * (BM25_K1 + 1) / norm
+
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    return ranked[:limit]
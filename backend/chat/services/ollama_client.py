@@ -42,6 +42,7 @@ OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434")
 # 預設切到 qwen3:8b（可由 .env 覆寫）
 DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "qwen3:8b")
 EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+EMBED_BATCH_SIZE = int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "32"))
 
 
 def chat_once(messages: List[Dict], model: str = DEFAULT_MODEL) -> str:
@@ -93,31 +94,45 @@ def chat_stream(messages: List[Dict], model: str = DEFAULT_MODEL) -> Iterator[st
     raise RuntimeError(message)
 
 
-def embed_texts(texts: List[str], model: str = EMBED_MODEL) -> List[List[float]]:
+def embed_texts(
+    texts: List[str],
+    model: str = EMBED_MODEL,
+    batch_size: int = EMBED_BATCH_SIZE,
+) -> List[List[float]]:
     """Get embeddings from Ollama embeddings API. Returns a list of vectors.
-    用單一請求批量處理（Ollama 支援單條；這裡逐條呼叫以簡化）。
+    以 /v1/embeddings 的陣列 input 每批送出 batch_size 條；舊版 Ollama 不支援時
+    退回 /api/embeddings 逐條呼叫。回傳順序與輸入一致。
     """
     out: List[List[float]] = []
+    if not texts:
+        return out
+    step = max(int(batch_size or 1), 1)
     with httpx.Client(timeout=CLIENT_TIMEOUT) as client:
-        for t in texts:
-            try:
-                r = client.post(
-                    f"{OLLAMA_URL}/v1/embeddings",
-                    json={"model": model, "input": t},
-                )
-                r.raise_for_status()
-                vec = _extract_embedding(r.json())
-                if vec is not None:
-                    out.append(vec)
-                    continue
-            except httpx.HTTPStatusError as exc:
-                if exc.response.status_code != 404:
-                    raise
+        for start in range(0, len(texts), step):
+            out.extend(_embed_batch(client, texts[start:start + step], model))
+    return out
+
+
+def _embed_batch(client: httpx.Client, batch: List[str], model: str) -> List[List[float]]:
+    try:
+        r = client.post(
+            f"{OLLAMA_URL}/v1/embeddings",
+            json={"model": model, "input": batch},
+        )
+        r.raise_for_status()
+        vecs = _extract_embeddings(r.json())
+        if len(vecs) == len(batch):
+            return vecs
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code != 404:
+            raise
 
-            r = client.post(f"{OLLAMA_URL}/api/embeddings", json={"model": model, "prompt": t})
-            r.raise_for_status()
-            vec = _extract_embedding(r.json())
-            out.append(vec or [])
+    out: List[List[float]] = []
+    for t in batch:
+        r = client.post(f"{OLLAMA_URL}/api/embeddings", json={"model": model, "prompt": t})
+        r.raise_for_status()
+        vec = _extract_embedding(r.json())
+        out.append(vec or [])
     return out
 
 
@@ -305,6 +320,20 @@ def _extract_embedding(data: Optional[Dict]) -> Optional[List[float]]:
     return None
 
 
+def _extract_embeddings(data: Optional[Dict]) -> List[List[float]]:
+    """Collect every vector from a batched embeddings payload, ordered by index."""
+    if not isinstance(data, dict):
+        return []
+
+    embeddings = data.get("embeddings")
+    if isinstance(embeddings, list) and all(isinstance(e, list) for e in embeddings):
+        return embeddings
+
+    items = [item for item in (data.get("data") or []) if isinstance(item, dict)]
+    items.sort(key=lambda item: item.get("index", 0))
+    return [item["embedding"] for item in items if isinstance(item.get("embedding"), list)]
+
+
 def _extract_error_message(response: httpx.Response) -> Optional[str]:
     try:
         data = response.json()
@@ -1,51 +1,306 @@
 # chat/services/rag_store.py
 from __future__ import annotations
+import hashlib
+import heapq
+import os
+import time
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from operator import itemgetter, mul
 from typing import List, Dict, Tuple
 from math import sqrt
+import httpx
+from django.core.cache import cache
 from django.db import transaction
 from ..models import KnowledgeDoc, KnowledgeChunk
-from .ollama_client import embed_texts
-
-def _cosine(a: List[float], b: List[float]) -> float:
-    if not a or not b or len(a) != len(b): return 0.0
-    dot = sum(x*y for x, y in zip(a, b))
-    na = sqrt(sum(x*x for x in a)); nb = sqrt(sum(y*y for y in b))
-    if na == 0 or nb == 0: return 0.0
-    return dot / (na * nb)
-
-def _chunk(text: str, max_len: int = 500) -> List[str]:
-    text = (text or "").strip()
-    if not text: return []
-    out, buf, count = [], [], 0
-    for ch in text:
-        buf.append(ch); count += 1
-        if count >= max_len and ch in "。！？\n\r":
-            out.append("".join(buf).strip()); buf, count = [], 0
-    if buf: out.append("".join(buf).strip())
-    return out
+from .ollama_client import EMBED_BATCH_SIZE, embed_texts
+from .chunking import chunk_text as _chunk
+from .lexical import bm25_search, collection_stats, index_chunks, term_counts
+
+try:
+    import numpy
+except ImportError:  # 選用套件：沒有時以純 Python 逐列計算
+    numpy = None
+
+CORPUS_VERSION_KEY = "rag:corpus_version"
+RRF_K = 60
+CANDIDATES = int(os.getenv("RAG_CANDIDATES", "50"))  # 各路檢索取前幾名進入融合
+# 沒有 numpy 時純 Python 逐列計算的片段數上限，超過時改為等距抽樣（另加 BM25 候選）
+VECTOR_SCAN_MAX = int(os.getenv("RAG_VECTOR_SCAN_MAX", "20000"))
+SYNC_ATTEMPTS = 5  # sync_document 寫入時發現文件已被改過，重新比對的次數上限
+
+_vector_cache: Dict[str, object] = {}
+
+
+@dataclass
+class UpsertResult:
+    doc_id: int
+    created: bool = False
+    changed: bool = False
+    embedded: int = 0
+    reused: int = 0
+    deleted: int = 0
+
+
+def corpus_version() -> int:
+    """知識庫版本號；任何文件新增／變更都會換新值，下游快取可直接拿來當 key。"""
+    version = cache.get(CORPUS_VERSION_KEY)
+    if version is None:
+        # 快取遺失時改用時間戳初始化，避免回到舊值而撞上過期的下游快取。
+        version = time.time_ns()
+        cache.add(CORPUS_VERSION_KEY, version, timeout=None)
+        version = cache.get(CORPUS_VERSION_KEY, version)
+    return version
+
+
+def bump_corpus_version() -> None:
+    cache.set(CORPUS_VERSION_KEY, time.time_ns(), timeout=None)
+
+def _content_hash(text: str) -> str:
+    """全文／片段的 sha256，用來判斷內容是否變動。"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
 
-@transaction.atomic
 def upsert_document(title: str, content: str, source: str = "", meta: Dict | None = None) -> int:
-    doc = KnowledgeDoc.objects.create(title=title, source=source, meta=meta or {})
-    chunks = _chunk(content)
-    vecs = embed_texts(chunks) if chunks else []
-    for i, (txt, vec) in enumerate(zip(chunks, vecs)):
-        KnowledgeChunk.objects.create(doc=doc, text=txt, vec=vec, order=i,
-                                      meta={"title": title, "source": source})
-    return doc.id
+    """以 source 為鍵新增或更新文件；只重新嵌入內容有變的片段。回傳文件 id。"""
+    return sync_document(title=title, content=content, source=source, meta=meta).doc_id
+
+
+def sync_document(*, title: str, content: str, source: str = "", meta: Dict | None = None,
+                  batch_size: int = EMBED_BATCH_SIZE, force: bool = False) -> UpsertResult:
+    """upsert_document 的實作，回傳嵌入／沿用／刪除的片段數供匯入指令統計。
+
+    - 同一 source 只保留一份文件（舊版重複建立的文件會一併清掉）
+    - 全文 hash 與標題都未變時直接返回；force=True 仍會重新切片比對
+    - 片段以內容 hash 比對：未變的保留原列與向量、只更新順序，新增的批次嵌入，消失的刪除
+    - 嵌入（呼叫 embedding 服務）在交易外進行；寫入時才鎖住文件並確認全文 hash 與比對時相同，
+      期間被其他流程改過就重新比對，最多 SYNC_ATTEMPTS 次
+    """
+    meta = meta or {}
+    doc_hash = _content_hash(content)
+    pieces = [(order, txt, _content_hash(txt)) for order, txt in enumerate(_chunk(content))]
+    vectors: Dict[str, List[float]] = {}
+    for _ in range(SYNC_ATTEMPTS):
+        docs = list(KnowledgeDoc.objects.filter(source=source).order_by("-id")) if source else []
+        doc = docs[0] if docs else None
+        if doc is not None and not force and doc.content_hash == doc_hash \
+                and doc.title == title and doc.meta == meta:
+            if len(docs) > 1:
+                KnowledgeDoc.objects.filter(source=source).exclude(id=doc.id).delete()
+                transaction.on_commit(bump_corpus_version)
+            return UpsertResult(doc_id=doc.id)
+        _, fresh = _diff(_chunk_pool(doc), pieces)
+        _embed_missing([(txt, h) for _, txt, h in fresh], vectors, batch_size)
+        result = _apply(doc, title=title, source=source, meta=meta, doc_hash=doc_hash,
+                        pieces=pieces, vectors=vectors, batch_size=batch_size)
+        if result is not None:
+            return result
+    raise RuntimeError(f"知識文件 {source} 持續被其他流程更新，請稍後重試。")
+
+
+def _chunk_pool(doc: KnowledgeDoc | None) -> Dict[str, List[KnowledgeChunk]]:
+    """既有片段依 hash 分組（舊資料沒有 hash 時以內文補算），同一段文字可能出現多次。"""
+    pool: Dict[str, List[KnowledgeChunk]] = {}
+    if doc is None:
+        return pool
+    for ch in doc.chunks.only("id", "text", "order", "content_hash", "meta").order_by("order", "id"):
+        pool.setdefault(ch.content_hash or _content_hash(ch.text), []).append(ch)
+    return pool
+
+
+def _diff(pool: Dict[str, List[KnowledgeChunk]], pieces: List[Tuple[int, str, str]]):
+    """回傳 (沿用的既有片段, 需要新建的 (order, text, hash))；沿用後 pool 剩下的就是要刪除的片段。"""
+    keep: List[Tuple[int, str, KnowledgeChunk]] = []
+    fresh: List[Tuple[int, str, str]] = []
+    for order, txt, h in pieces:
+        bucket = pool.get(h)
+        if bucket:
+            keep.append((order, h, bucket.pop(0)))
+        else:
+            fresh.append((order, txt, h))
+    return keep, fresh
+
+
+def _embed_missing(texts: List[Tuple[str, str]], vectors: Dict[str, List[float]], batch_size: int) -> None:
+    """嵌入 vectors 裡還沒有的 (text, hash)；重試時沿用前一輪已取得的向量。"""
+    todo = list({h: txt for txt, h in texts if h not in vectors}.items())
+    step = max(int(batch_size or 1), 1)
+    for start in range(0, len(todo), step):
+        batch = todo[start:start + step]
+        vectors.update(zip((h for h, _ in batch), embed_texts([txt for _, txt in batch], batch_size=step)))
+
+
+def _revision(doc: KnowledgeDoc | None) -> Tuple[int, str] | None:
+    return None if doc is None else (doc.id, doc.content_hash)
+
+
+@transaction.atomic
+def _apply(seen: KnowledgeDoc | None, *, title: str, source: str, meta: Dict, doc_hash: str,
+           pieces: List[Tuple[int, str, str]], vectors: Dict[str, List[float]],
+           batch_size: int) -> UpsertResult | None:
+    """鎖住文件後寫入片段差異；文件在比對後被改過（或缺少向量）時回傳 None 讓呼叫端重來。"""
+    doc = None
+    if source:
+        docs = list(KnowledgeDoc.objects.select_for_update().filter(source=source).order_by("-id"))
+        if docs:
+            doc = docs[0]
+    if _revision(doc) != _revision(seen):
+        return None
+    pool = _chunk_pool(doc)
+    keep, fresh = _diff(pool, pieces)
+    if any(h not in vectors for _, _, h in fresh):
+        return None
+
+    if source and len(docs) > 1:
+        KnowledgeDoc.objects.filter(id__in=[d.id for d in docs[1:]]).delete()
+    result = UpsertResult(doc_id=0, changed=True)
+    if doc is None:
+        doc = KnowledgeDoc.objects.create(title=title, source=source, meta=meta)
+        result.created = True
+    result.doc_id = doc.id
+
+    chunk_meta = {"title": title, "source": source}
+    removed = [ch.id for bucket in pool.values() for ch in bucket]
+    if removed:
+        result.deleted = KnowledgeChunk.objects.filter(id__in=removed).delete()[0]
+    if keep:
+        for order, h, ch in keep:
+            ch.order, ch.content_hash, ch.meta = order, h, chunk_meta
+        KnowledgeChunk.objects.bulk_update([ch for _, _, ch in keep], ["order", "content_hash", "meta"],
+                                           batch_size=500)
+        result.reused = len(keep)
+
+    step = max(int(batch_size or 1), 1)
+    for start in range(0, len(fresh), step):
+        batch = fresh[start:start + step]
+        counts = [term_counts(txt) for _, txt, _ in batch]
+        created = KnowledgeChunk.objects.bulk_create([
+            KnowledgeChunk(doc=doc, text=txt, vec=vectors[h], order=order, content_hash=h,
+                           token_count=sum(c.values()), meta=chunk_meta)
+            for (order, txt, h), c in zip(batch, counts)
+        ])
+        index_chunks((ch.id, c) for ch, c in zip(created, counts))
+        result.embedded += len(batch)
+
+    doc.title, doc.meta, doc.content_hash = title, meta, doc_hash
+    doc.save(update_fields=["title", "meta", "content_hash"])
+    transaction.on_commit(bump_corpus_version)
+    return result
+
+def _unit(vec: List[float]) -> array | None:
+    norm = sqrt(sum(x * x for x in vec)) if vec else 0.0
+    if not norm:
+        return None
+    return array("f", (x / norm for x in vec))
+
+
+def _vector_blocks(version: int) -> Dict[int, Tuple[object, object]]:
+    """依 corpus_version 快取的單位向量，{維度: (ids, 向量)}；版本變動才重新載入。
+
+    ids 依片段 id 遞增；向量為連續的 float32 區塊（有 numpy 時是 n × 維度的矩陣，
+    否則是逐列接起來的 array("f")）。
+    """
+    if _vector_cache.get("version") != version:
+        raw: Dict[int, Tuple[array, array]] = {}
+        for chunk_id, vec in KnowledgeChunk.objects.order_by("id").values_list("id", "vec").iterator(chunk_size=2000):
+            if numpy is None:
+                vec = _unit(vec or [])  # 有 numpy 時整批正規化
+            if not vec:
+                continue
+            ids, rows = raw.setdefault(len(vec), (array("q"), array("f")))
+            ids.append(chunk_id)
+            rows.extend(vec)
+        blocks = {dim: _normalized(ids, rows, dim) for dim, (ids, rows) in raw.items()}
+        _vector_cache.update(version=version, blocks=blocks)
+    return _vector_cache["blocks"]
+
+
+def _normalized(ids: array, rows: array, dim: int) -> Tuple[object, object]:
+    if numpy is None:
+        return ids, rows
+    matrix = numpy.frombuffer(rows, dtype=numpy.float32).reshape(-1, dim)
+    norms = numpy.linalg.norm(matrix, axis=1)
+    keep = norms > 0
+    return numpy.frombuffer(ids, dtype=numpy.int64)[keep], matrix[keep] / norms[keep, None]
+
+
+def _vector_search(qvec: List[float], *, limit: int, version: int,
+                   candidates: List[int] = ()) -> List[Tuple[int, float]]:
+    """全部片段中與 qvec 餘弦相似度最高的 limit 筆（只取 > 0）。
+
+    沒有 numpy 且片段數超過 VECTOR_SCAN_MAX 時，只計算等距抽樣的片段與 candidates。
+    """
+    q = _unit(qvec)
+    block = _vector_blocks(version).get(len(q)) if q is not None else None
+    if block is None or limit <= 0:
+        return []
+    ids, rows = block
+    if numpy is not None:
+        scores = rows @ numpy.frombuffer(q, dtype=numpy.float32)
+        n = min(limit, len(scores))
+        if not n:
+            return []
+        top = numpy.argpartition(scores, -n)[-n:]
+        top = top[numpy.argsort(-scores[top], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    dim, n = len(q), len(ids)
+    positions = range(n)
+    if n > VECTOR_SCAN_MAX:
+        sample = set(range(0, n, -(-n // VECTOR_SCAN_MAX)))
+        for cid in candidates:
+            i = bisect_left(ids, cid)
+            if i < n and ids[i] == cid:
+                sample.add(i)
+        positions = sorted(sample)
+    view = memoryview(rows)
+    scored = ((ids[i], sum(map(mul, q, view[i * dim:(i + 1) * dim]))) for i in positions)
+    return heapq.nlargest(limit, ((cid, s) for cid, s in scored if s > 0), key=itemgetter(1))
+
+
+def _fuse(*rankings: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion：score = Σ 1 / (RRF_K + rank)。"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (cid, _) in enumerate(ranking, 1):
+            fused[cid] = fused.get(cid, 0.0) + 1.0 / (RRF_K + rank)
+    return sorted(fused.items(), key=itemgetter(1), reverse=True)
+
 
 def search_topk(query: str, k: int = 4) -> List[Dict]:
-    qs = KnowledgeChunk.objects.all().select_related("doc")
-    if not qs.exists(): return []
-    qvec = embed_texts([query])[0]
-    scored: List[Tuple[float, KnowledgeChunk]] = []
-    for ch in qs.iterator():
-        s = _cosine(qvec, ch.vec or [])
-        if s > 0: scored.append((s, ch))
-    scored.sort(key=lambda x: x[0], reverse=True)
+    """BM25 與向量相似度各取候選，以 RRF 融合後回傳前 k 筆（meta 附兩種分數）。
+
+    向量一路在全部片段中獨立取前幾名（numpy 矩陣乘法）；沒有 numpy 且片段數超過
+    RAG_VECTOR_SCAN_MAX 時改為抽樣計算，BM25 候選一律計分。
+    """
+    version = corpus_version()
+    n_chunks, _ = collection_stats(version)
+    if not n_chunks: return []
+    pool = max(k, CANDIDATES)
+
+    lexical = bm25_search(query, limit=pool, version=version)
+    try:
+        qvec = embed_texts([query])[0]
+    except (httpx.HTTPError, RuntimeError, IndexError):
+        qvec = []  # embedding 服務不可用時退回純 BM25
+    candidates = [cid for cid, _ in lexical]
+    vector = _vector_search(qvec, limit=pool, version=version, candidates=candidates) if qvec else []
+
+    bm25_scores, vec_scores = dict(lexical), dict(vector)
+    fused = _fuse(lexical, vector)
+    chunks = KnowledgeChunk.objects.select_related("doc").in_bulk([cid for cid, _ in fused[:k * 2]])
     out: List[Dict] = []
-    for score, ch in scored[:k]:
+    for cid, score in fused:
+        ch = chunks.get(cid)
+        if ch is None: continue  # 快取中的片段已被刪除
         out.append({"text": ch.text,
                     "meta": {"title": ch.meta.get("title") or ch.doc.title,
-                             "score": round(score, 3), "doc": ch.doc_id}})
+                             "score": round(score, 4), "doc": ch.doc_id,
+                             "bm25": _round(bm25_scores.get(cid)),
+                             "vector": _round(vec_scores.get(cid))}})
+        if len(out) >= k: break
     return out
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 3)
@@ -1,3 +1,5 @@
+import io
+
 import pytest
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -95,6 +97,28 @@ def test_staff_can_list_all_and_filter_mine(staff_client, staff_user, user):
     assert data_mine["results"][0]["id"] == mine.id
 
 
+def test_message_list_supports_cursor_pagination(auth_client, user):
+    ticket = Ticket.objects.create(user=user, subject="分頁")
+    ids = [Message.objects.create(ticket=ticket, content=f"第 {i} 則", sender=user).id for i in range(5)]
+    url = reverse("chat-messages")
+
+    first = auth_client.get(url, {"ticket_id": ticket.id, "cursor": "", "page_size": 3}).json()
+    assert "count" not in first
+    second = auth_client.get(first["next"]).json()
+
+    assert [m["id"] for m in first["results"] + second["results"]] == ids
+    assert second["next"] is None
+
+
+def test_message_list_supports_sparse_fieldsets(auth_client, user):
+    ticket = Ticket.objects.create(user=user, subject="欄位")
+    Message.objects.create(ticket=ticket, content="hello", sender=user)
+
+    data = auth_client.get(reverse("chat-messages"), {"ticket_id": ticket.id, "fields": "id,content"}).json()
+
+    assert data["results"] == [{"id": data["results"][0]["id"], "content": "hello"}]
+
+
 def test_message_post_requires_owner(auth_client, user, other_user):
     ticket = Ticket.objects.create(user=user, subject="續借問題")
     url = reverse("chat-messages")
@@ -261,3 +285,212 @@ def test_assistant_reply_with_tool(monkeypatch, user):
     assert meta["tool_action"] == "lookup_book"
     assert meta["used_rag"] is True
     assert calls[1][-1]["content"].startswith('[TOOL_RESULT] {"title": "Python Cookbook"}')
+
+
+@pytest.mark.service
+def test_ingest_knowledge_skips_unchanged_files_and_reuses_vectors(monkeypatch, tmp_path):
+    from django.core.management import call_command
+    from chat.models import KnowledgeChunk, KnowledgeDoc
+
+    embedded = []
+
+    def fake_embed(texts, **kwargs):
+        embedded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    monkeypatch.setattr("chat.services.rag_store.embed_texts", fake_embed)
+    (tmp_path / "rules").mkdir()
+    handbook = tmp_path / "rules" / "handbook.md"
+    handbook.write_text("# 借閱規則\n每人最多借五本。", encoding="utf-8")
+    (tmp_path / "ignored.pdf").write_text("not text", encoding="utf-8")
+
+    call_command("ingest_knowledge", str(tmp_path), stdout=io.StringIO())
+
+    doc = KnowledgeDoc.objects.get()
+    assert doc.source == "rules/handbook.md"
+    assert doc.title == "借閱規則"
+    assert doc.content_hash
+    assert KnowledgeChunk.objects.filter(doc=doc).count() == 1
+    first_round = len(embedded)
+    assert first_round == 1
+
+    call_command("ingest_knowledge", str(tmp_path), stdout=io.StringIO())
+    assert len(embedded) == first_round
+    assert KnowledgeDoc.objects.count() == 1
+
+    call_command("ingest_knowledge", str(tmp_path), "--force", stdout=io.StringIO())
+    assert len(embedded) == first_round
+    assert KnowledgeChunk.objects.filter(doc=doc).count() == 1
+
+
+@pytest.mark.service
+def test_upsert_document_reembeds_only_changed_chunks(monkeypatch, django_capture_on_commit_callbacks):
+    from chat.models import KnowledgeChunk, KnowledgeDoc
+    from chat.services import rag_store
+
+    embedded = []
+
+    def fake_embed(texts, **kwargs):
+        embedded.extend(texts)
+        return [[1.0, float(len(t))] for t in texts]
+
+    monkeypatch.setattr("chat.services.rag_store.embed_texts", fake_embed)
+    monkeypatch.setattr("chat.services.rag_store._chunk", lambda text: text.split("\n\n"))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        doc_id = rag_store.upsert_document("館規", "開館時間\n\n借閱上限\n\n逾期罰款", source="rules.md")
+    version = rag_store.corpus_version()
+    kept = KnowledgeChunk.objects.get(doc_id=doc_id, text="開館時間")
+    assert embedded == ["開館時間", "借閱上限", "逾期罰款"]
+
+    embedded.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        again = rag_store.upsert_document("館規", "開館時間\n\n借閱上限五本\n\n逾期罰款", source="rules.md")
+
+    assert again == doc_id
+    assert KnowledgeDoc.objects.count() == 1
+    assert embedded == ["借閱上限五本"]
+    texts = list(KnowledgeChunk.objects.filter(doc_id=doc_id).order_by("order").values_list("text", flat=True))
+    assert texts == ["開館時間", "借閱上限五本", "逾期罰款"]
+    assert KnowledgeChunk.objects.filter(id=kept.id).exists()
+    assert rag_store.corpus_version() != version
+
+    embedded.clear()
+    version = rag_store.corpus_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        rag_store.upsert_document("館規", "開館時間\n\n借閱上限五本\n\n逾期罰款", source="rules.md")
+    assert embedded == []
+    assert rag_store.corpus_version() == version
+
+
+@pytest.mark.service
+def test_sync_document_embeds_outside_the_transaction_and_retries(monkeypatch):
+    from django.db import connection
+    from chat.models import KnowledgeChunk, KnowledgeDoc
+    from chat.services import rag_store
+
+    depth = len(connection.atomic_blocks)  # 測試本身的交易
+    embedded = []
+
+    def fake_embed(texts, **kwargs):
+        assert len(connection.atomic_blocks) == depth, "嵌入時不應持有交易與文件鎖"
+        embedded.extend(texts)
+        if "借閱上限" in texts:
+            # 嵌入期間另一個流程先更新了同一份文件
+            rag_store.sync_document(title="館規", content="開館時間\n\n逾期罰款", source="rules.md")
+        return [[1.0, float(len(t))] for t in texts]
+
+    monkeypatch.setattr("chat.services.rag_store.embed_texts", fake_embed)
+    monkeypatch.setattr("chat.services.rag_store._chunk", lambda text: text.split("\n\n"))
+    rag_store.sync_document(title="館規", content="開館時間", source="rules.md")
+
+    result = rag_store.sync_document(title="館規", content="開館時間\n\n借閱上限\n\n逾期罰款", source="rules.md")
+
+    # 第一輪比對後文件已變：重新比對，沿用已嵌入的「借閱上限」與對方寫入的「逾期罰款」，不再呼叫嵌入
+    assert embedded == ["開館時間", "借閱上限", "逾期罰款", "逾期罰款"]
+    assert (result.embedded, result.reused, result.deleted) == (1, 2, 0)
+    doc = KnowledgeDoc.objects.get()
+    assert doc.content_hash == rag_store._content_hash("開館時間\n\n借閱上限\n\n逾期罰款")
+    texts = list(KnowledgeChunk.objects.filter(doc=doc).order_by("order").values_list("text", flat=True))
+    assert texts == ["開館時間", "借閱上限", "逾期罰款"]
+
+
+@pytest.mark.unit
+def test_chunk_text_splits_cjk_and_latin_sentences_within_max():
+    from chat.services.chunking import chunk_text
+
+    text = "開館時間為九點。週一休館！Books are due in 14 days. Renew once online? 最後一句"
+    chunks = chunk_text(text, target=12, max_size=30)
+
+    assert chunks == [
+        "開館時間為九點。週一休館！",
+        "Books are due in 14 days.",
+        "Renew once online?",
+        "最後一句",
+    ]
+
+
+@pytest.mark.unit
+def test_chunk_text_hard_caps_text_without_punctuation():
+    from chat.services.chunking import chunk_text
+
+    chunks = chunk_text("館" * 10_000, target=500, max_size=800)
+
+    assert len(chunks) == 13
+    assert all(len(c) <= 800 for c in chunks)
+
+
+@pytest.mark.unit
+def test_chunk_text_overlap_and_token_unit():
+    from chat.services.chunking import chunk_text
+
+    overlapped = chunk_text("一二。三四。五六。七八。", target=6, max_size=8, overlap=3)
+    assert overlapped == ["一二。三四。", "三四。五六。", "五六。七八。"]
+
+    words = " ".join(f"w{i}" for i in range(25))
+    by_tokens = chunk_text(words, target=10, max_size=10, unit="tokens")
+    assert [len(c.split()) for c in by_tokens] == [10, 10, 5]
+
+
+@pytest.mark.unit
+def test_tokenize_uses_cjk_bigrams_and_latin_words():
+    from config.tokenizer import tokenize
+
+    assert tokenize("借閱規則") == ["借閱", "閱規", "規則"]
+    assert tokenize("Room A-12 館") == ["room", "a-12", "a", "12", "館"]
+
+
+@pytest.mark.service
+def test_search_topk_fuses_bm25_and_vector_scores(monkeypatch, django_capture_on_commit_callbacks):
+    from chat.models import KnowledgeTerm
+    from chat.services import rag_store
+
+    def fake_embed(texts, **kwargs):
+        # 向量只看「自習」這個詞，模擬語意模型找不到編號類查詢。
+        return [[1.0, 0.0] if "自習" in t else [0.0, 1.0] for t in texts]
+
+    monkeypatch.setattr("chat.services.rag_store.embed_texts", fake_embed)
+    monkeypatch.setattr("chat.services.rag_store._chunk", lambda text: text.split("\n\n"))
+    with django_capture_on_commit_callbacks(execute=True):
+        rag_store.upsert_document(
+            "空間", "自習室開放到晚上十點\n\n討論室 R-204 需事先預約\n\n館內禁止飲食", source="space.md"
+        )
+    assert KnowledgeTerm.objects.filter(term="r-204").count() == 1
+
+    hits = rag_store.search_topk("R-204 預約", k=2)
+
+    assert hits[0]["text"] == "討論室 R-204 需事先預約"
+    assert hits[0]["meta"]["bm25"] > 0
+    assert hits[0]["meta"]["title"] == "空間"
+    assert {"score", "vector", "doc"} <= hits[0]["meta"].keys()
+
+    semantic = rag_store.search_topk("自習", k=1)
+    assert semantic[0]["text"] == "自習室開放到晚上十點"
+    assert semantic[0]["meta"]["vector"] == 1.0
+
+
+@pytest.mark.service
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_vector_search_covers_chunks_without_bm25_hits(monkeypatch, django_capture_on_commit_callbacks, with_numpy):
+    from chat.services import rag_store
+
+    def fake_embed(texts, **kwargs):
+        return [[1.0, 0.2] if "自習" in t or "讀書" in t else [0.0, 1.0] for t in texts]
+
+    if not with_numpy:
+        monkeypatch.setattr("chat.services.rag_store.numpy", None)
+    elif rag_store.numpy is None:
+        pytest.skip("numpy 未安裝")
+    monkeypatch.setattr("chat.services.rag_store.embed_texts", fake_embed)
+    monkeypatch.setattr("chat.services.rag_store._chunk", lambda text: text.split("\n\n"))
+    monkeypatch.setattr("chat.services.rag_store.VECTOR_SCAN_MAX", 2)
+    with django_capture_on_commit_callbacks(execute=True):
+        rag_store.upsert_document(
+            "空間", "館內禁止飲食\n\n討論室 R-204 需事先預約\n\n自習室開放到晚上十點", source="space.md"
+        )
+
+    # 「讀書」沒有任何 BM25 命中，片段數超過 RAG_VECTOR_SCAN_MAX 時向量一路仍要獨立找到語意相近的片段
+    hits = rag_store.search_topk("讀書", k=1)
+    assert hits[0]["text"] == "自習室開放到晚上十點"
+    assert hits[0]["meta"]["bm25"] is None
+    assert hits[0]["meta"]["vector"] == 1.0
@@ -9,11 +9,13 @@ from django.http import StreamingHttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status, serializers
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from config.fields import FieldsetSerializerMixin, parse_fieldset, project_queryset
+from config.pagination import CursorOptInPagination
+
 from .models import Ticket, Message
 
 # ---- 提示詞與進階助理 ----
@@ -94,7 +96,7 @@ class MessageCreateSerializer(serializers.Serializer):
         return value
 
 
-class MessageOutSerializer(serializers.ModelSerializer):
+class MessageOutSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = ["id", "ticket", "content", "is_ai", "response_meta", "created_at"]
@@ -104,7 +106,7 @@ class MessageOutSerializer(serializers.ModelSerializer):
 # 分頁
 # ==========================
 
-class DefaultPagination(PageNumberPagination):
+class DefaultPagination(CursorOptInPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
@@ -165,10 +167,13 @@ class MessageCollectionView(APIView):
             return Response({"detail": "Not your ticket"}, status=status.HTTP_403_FORBIDDEN)
 
         qs = Message.objects.filter(ticket=ticket).select_related("sender").order_by("created_at", "id")
+        fieldset = parse_fieldset(request, MessageOutSerializer)
+        if fieldset is not None:
+            qs = project_queryset(qs, MessageOutSerializer, fieldset)
 
         paginator = DefaultPagination()
         page = paginator.paginate_queryset(qs, request)
-        data = MessageOutSerializer(page, many=True).data
+        data = MessageOutSerializer(page, many=True, fields=fieldset).data
         return paginator.get_paginated_response(data)
 
     def post(self, request):
@@ -0,0 +1,61 @@
+# config/etag.py
+"""ETag / If-None-Match 條件式 GET。
+
+View 提供 get_etag_validator()：一個便宜的版本字串（版本號、count + max(id) 之類的
+單一彙總查詢），與網址、回應格式（與使用者）一起雜湊成強 ETag。
+檢查在 initial()（認證、權限、內容協商之後）進行，If-None-Match 相符時直接回 304，
+不執行列表查詢與序列化。
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Optional
+
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class NotModified(Exception):
+    pass
+
+
+class ConditionalGetMixin:
+    # 回應內容因使用者而異時為 True：ETag 納入使用者 id 並加上 Vary: Authorization
+    etag_per_user = True
+
+    etag: Optional[str] = None
+
+    def get_etag_validator(self, request) -> Optional[str]:
+        """回傳 None 表示此請求不產生 ETag。"""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method not in ("GET", "HEAD"):
+            return
+        validator = self.get_etag_validator(request)
+        if validator is None:
+            return
+        parts = [validator, request.get_full_path(), request.accepted_media_type or ""]
+        if self.etag_per_user:
+            parts.append(str(request.user.pk or ""))
+        self.etag = '"%s"' % hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if self.etag in if_none_match or "*" in if_none_match:
+            raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = self.etag
+            if self.etag_per_user:
+                patch_vary_headers(response, ["Authorization"])
+        return response
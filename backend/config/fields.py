@@ -0,0 +1,123 @@
+# config/fields.py
+"""稀疏欄位（sparse fieldsets）：?fields=id,title,available_copies 或 ?exclude=category。
+
+- serializer 端：FieldsetSerializerMixin 接受 fields=（要保留的欄位），其餘欄位移除；
+- ORM 端：project_queryset() 把保留下來的欄位下推成 .only()，並只保留這些欄位
+  用得到的 select_related（例如不要 book_title 就不 join books_book）；
+- view 端：SparseFieldsetMixin 讓 GenericAPIView 在 GET 時自動套用以上兩者。
+
+欄位的 source 是 queryset 的 annotation 時照常保留；其他非 model 欄位（SerializerMethodField…）時不做 .only()，
+只縮減輸出。只套用在最外層 serializer，巢狀的 serializer 仍輸出完整欄位。
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def readable_fields(serializer_class) -> List[str]:
+    return [name for name, field in serializer_class().fields.items() if not field.write_only]
+
+
+def parse_fieldset(request, serializer_class) -> Optional[Tuple[str, ...]]:
+    """依 ?fields= / ?exclude= 算出要輸出的欄位（保持 serializer 的順序）；兩者皆無時回傳 None。"""
+    fields = _split(request.query_params.get(FIELDS_PARAM))
+    exclude = _split(request.query_params.get(EXCLUDE_PARAM))
+    if not fields and not exclude:
+        return None
+    available = readable_fields(serializer_class)
+    unknown = [name for name in (*fields, *exclude) if name not in available]
+    if unknown:
+        raise ValidationError({FIELDS_PARAM: f"未知的欄位：{', '.join(unknown)}（可用 {', '.join(available)}）"})
+    wanted = set(fields or available) - set(exclude)
+    return tuple(name for name in available if name in wanted)
+
+
+def _select_related_paths(tree, prefix: str = "") -> Iterable[str]:
+    for name, children in tree.items():
+        path = f"{prefix}{name}"
+        yield path
+        yield from _select_related_paths(children, f"{path}__")
+
+
+def project_queryset(queryset, serializer_class, fieldset: Iterable[str]):
+    """把欄位集合下推到 queryset：.only() 需要的欄位、只保留需要的 select_related。"""
+    model = queryset.model
+    serializer_fields = serializer_class().fields
+    only = {model._meta.pk.name}
+    relations = set()
+    for name in fieldset:
+        field = serializer_fields[name]
+        parts = field.source.split(".")
+        if parts[0] in queryset.query.annotations:
+            continue  # annotation 不是欄位，.only() 不需要（也不能）列出
+        try:
+            model_field = model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            return queryset  # annotation / 方法等，無法判斷需要哪些欄位
+        only.add(parts[0])
+        if model_field.is_relation and (isinstance(field, serializers.BaseSerializer) or len(parts) > 1):
+            if not (model_field.many_to_one or model_field.one_to_one):
+                return queryset
+            relations.add(parts[0])
+            if len(parts) > 1:
+                only.add("__".join(parts))
+
+    existing = queryset.query.select_related
+    if existing is True:
+        paths = sorted(relations)
+    else:
+        paths = [p for p in _select_related_paths(existing or {}) if p.split("__")[0] in relations]
+        paths += [r for r in relations if r not in paths]
+    queryset = queryset.select_related(None)
+    if paths:
+        queryset = queryset.select_related(*paths)
+    return queryset.only(*only)
+
+
+class FieldsetSerializerMixin:
+    """serializer 多接受 fields=（欄位名稱序列），只輸出這些欄位。"""
+
+    def __init__(self, *args, fields: Optional[Iterable[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            keep = set(fields)
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """GenericAPIView 的 GET 支援 ?fields= / ?exclude=。"""
+
+    def get_fieldset(self) -> Optional[Tuple[str, ...]]:
+        if not hasattr(self, "_fieldset"):
+            self._fieldset = None
+            if self.request.method in ("GET", "HEAD"):
+                self._fieldset = parse_fieldset(self.request, self.get_serializer_class())
+        return self._fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault("fields", fieldset)
+        return super().get_serializer(*args, **kwargs)
+
+    def sparse_queryset(self, queryset):
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return queryset
+        return project_queryset(queryset, self.get_serializer_class(), fieldset)
+
+    def filter_queryset(self, queryset):
+        return self.sparse_queryset(super().filter_queryset(queryset))
@@ -0,0 +1,197 @@
+# config/pagination.py
+"""共用分頁：預設頁碼分頁，帶 ?cursor= 時改用 keyset（seek）分頁。
+
+keyset 模式沿用 queryset 的排序欄位（不足以唯一時自動補上 id），
+cursor 是上一頁最後一筆的排序鍵值（base64 JSON），下一頁以
+`a > x OR (a = x AND b > y)` 的條件接續，不做 OFFSET，也不做 COUNT(*)，
+因此不論翻到多深，每頁成本都相同（需搭配與排序鍵相同的複合索引）。
+
+    GET /api/books/?cursor=              → 第一頁
+    GET /api/books/?cursor=<next 內的值>  → 下一頁
+
+回應格式：{"next": <url 或 null>, "results": [...]}
+
+頁碼模式的 count 也不一定做完整的 COUNT(*)：先以 LIMIT 數到
+API_EXACT_COUNT_THRESHOLD 筆，未達門檻就是精確值；超過門檻且查詢沒有任何過濾
+（WHERE）時，在 PostgreSQL 上改用查詢規劃器的估計列數（即 pg_class.reltuples），
+並在回應加上 count_is_approximate=true。有過濾條件時（全文檢索、LIKE、trigram 等）
+規劃器的估計常遠低於實際筆數，會讓仍有資料的頁碼回 404，因此一律做完整計數；
+其他資料庫沒有估計值，也做完整計數。
+"""
+from __future__ import annotations
+
+import base64
+import datetime
+import decimal
+import json
+from functools import reduce
+from operator import or_
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _exact_count_threshold() -> int:
+    return int(getattr(settings, "API_EXACT_COUNT_THRESHOLD", 10000))
+
+
+def estimate_count(queryset) -> Optional[int]:
+    """資料庫對 queryset 筆數的估計；不支援時回傳 None。"""
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountPaginator(Paginator):
+    """未過濾的 queryset count 超過門檻時改用估計值，approximate 標示是否為估計。"""
+
+    approximate = False
+
+    @cached_property
+    def count(self) -> int:
+        threshold = _exact_count_threshold()
+        if threshold <= 0 or not hasattr(self.object_list, "query"):
+            return super().count
+        bounded = self.object_list.order_by()[:threshold + 1].count()
+        if bounded <= threshold:
+            return bounded
+        if self.object_list.query.where:
+            return super().count
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return super().count
+        self.approximate = True
+        return max(estimate, bounded)
+
+
+class CursorOptInPagination(PageNumberPagination):
+    """REST_FRAMEWORK 的預設分頁；各 app 的 DefaultPagination 繼承後調整 page_size。"""
+    django_paginator_class = EstimatedCountPaginator
+    cursor_query_param = "cursor"
+
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request) or 20  # 未設定 PAGE_SIZE 時的保底
+        keys = self._keys(queryset)
+        queryset = queryset.order_by(*keys)
+        position = self._decode(queryset.model, keys, request.query_params.get(self.cursor_query_param))
+        if position is not None:
+            queryset = queryset.filter(self._after(keys, position))
+
+        rows = list(queryset[:page_size + 1])
+        self.next_position: Optional[List[Any]] = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = [self._value(rows[-1], key) for key in keys]
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            response = super().get_paginated_response(data)
+            response.data["count_is_approximate"] = self.page.paginator.approximate
+            return response
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        response["properties"]["count_is_approximate"] = {"type": "boolean"}
+        response["description"] = "帶 ?cursor= 時只回傳 next 與 results（不含 count/previous）。"
+        return response
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, self._encode(self.next_position)
+        )
+
+    # --- keyset 細節 ---
+
+    def _keys(self, queryset) -> List[str]:
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        keys: List[str] = []
+        for item in ordering:
+            if not isinstance(item, str) or "__" in item or item.lstrip("-") == "?":
+                raise ValidationError({"cursor": "此排序方式不支援 cursor 分頁。"})
+            name = item.lstrip("-")
+            if name == "pk":
+                item = item.replace("pk", "id")
+            elif name not in queryset.query.annotations:
+                try:
+                    queryset.model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    raise ValidationError({"cursor": "此排序方式不支援 cursor 分頁。"})
+            keys.append(item)
+        if not any(key.lstrip("-") == "id" for key in keys):
+            # 排序鍵需唯一，否則同值的列會在換頁時漏掉或重複
+            keys.append("-id" if keys and keys[-1].startswith("-") else "id")
+        return keys
+
+    def _after(self, keys: List[str], values: List[Any]) -> Q:
+        conditions = []
+        for i, key in enumerate(keys):
+            name = key.lstrip("-")
+            op = "lt" if key.startswith("-") else "gt"
+            cond = Q(**{f"{name}__{op}": values[i]})
+            for prev_key, prev_value in zip(keys[:i], values[:i]):
+                cond &= Q(**{prev_key.lstrip("-"): prev_value})
+            conditions.append(cond)
+        # 額外的首鍵範圍條件讓資料庫能直接在索引上做 range scan
+        first = keys[0].lstrip("-")
+        bound = Q(**{f"{first}__{'lte' if keys[0].startswith('-') else 'gte'}": values[0]})
+        return bound & reduce(or_, conditions)
+
+    def _value(self, obj, key: str):
+        name = key.lstrip("-")
+        try:
+            name = obj._meta.get_field(name).attname
+        except FieldDoesNotExist:
+            pass
+        value = getattr(obj, name)
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+    def _encode(self, values: List[Any]) -> str:
+        raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def _decode(self, model, keys: List[str], token: Optional[str]):
+        if not token:
+            return None
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+            if not isinstance(values, list) or len(values) != len(keys) or None in values:
+                raise ValueError(token)
+            out = []
+            for key, value in zip(keys, values):
+                try:
+                    field = model._meta.get_field(key.lstrip("-"))
+                except FieldDoesNotExist:
+                    out.append(value)
+                else:
+                    out.append(field.to_python(value))
+            return out
+        except (ValueError, TypeError, UnicodeDecodeError, DjangoValidationError):
+            raise ValidationError({"cursor": "無效的 cursor。"})
@@ -0,0 +1,80 @@
+# config/renderers.py
+"""以 orjson 編碼／解碼 JSON 的 DRF renderer 與 parser。
+
+輸出與 DRF 預設 JSONRenderer（UNICODE_JSON、COMPACT_JSON）相同：UTF-8、不轉義非 ASCII、
+緊湊分隔符，U+2028／U+2029 一律轉義；datetime、Decimal、lazy 翻譯字串、UUID、
+QuerySet 等交給 DRF 的 JSONEncoder.default 處理，結果一致。以下情況直接改用 DRF 預設
+實作，確保行為與錯誤訊息不變：
+
+- 未安裝 orjson（已列在 pyproject.toml／requirements.txt，只有自行精簡相依時才會發生）；
+- 要求縮排（Accept: application/json; indent=4、Browsable API）或關閉了 UNICODE/COMPACT_JSON；
+- orjson 無法編碼的資料（超過 64 位元的整數等）。
+
+已知差異：極小的浮點數寫法不同（1e-05 → 0.00001，數值相同）；NaN／Infinity
+在 STRICT_JSON 下 DRF 會拋錯，orjson 則輸出 null。
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+
+try:
+    import orjson
+except ImportError:  # 選用套件
+    orjson = None
+
+_LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+
+def _orjson_options() -> int:
+    # datetime／dataclass 交給 default()，與 DRF 的 JSONEncoder 相同格式；非字串 key 比照 json 轉成字串
+    return orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def __init__(self):
+        super().__init__()
+        self._default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self._default, option=_orjson_options())
+        except TypeError:
+            # orjson.JSONEncodeError 是 TypeError 的子類別；交回 DRF 以得到相同的結果或錯誤
+            return super().render(data, accepted_media_type, renderer_context)
+        for raw, escaped in _LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace("_", "-") not in ("utf-8", "utf8"):
+            return super().parse(stream, media_type, parser_context)
+        raw = stream.read()
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+        # orjson 不接受的輸入（格式錯誤、超過 64 位元的整數…）交給標準庫，結果與錯誤訊息都與 DRF 相同
+        try:
+            return json.loads(raw.decode(encoding))
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
@@ -0,0 +1,116 @@
+# config/row_mapper.py
+"""唯讀列表的快速序列化：values_list() 的 tuple 直接轉成 dict。
+
+compile_row_mapper() 依 serializer 的可讀欄位決定要查的欄位（columns），並以
+operator.itemgetter 組出 row → dict 的函式（巢狀物件另有一個閉包），輸出的 key
+順序與值都和 serializer 相同，但不建立 model 實例、也不跑 DRF 逐欄位的
+to_representation。
+
+只支援「值不需轉換」的欄位：整數、字串、選項、布林、浮點，以及一層巢狀的
+ModelSerializer；遇到其他欄位（日期、SerializerMethodField、點號 source…）回傳 None，
+呼叫端應退回一般的 serializer。
+"""
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from rest_framework import serializers
+
+PLAIN_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.BooleanField,
+    serializers.FloatField,
+)
+
+
+class RowMapper:
+    def __init__(self, columns: Tuple[str, ...], func: Callable[[Sequence[Any]], Dict[str, Any]]):
+        self.columns = columns
+        self._func = func
+
+    def __call__(self, row: Sequence[Any]) -> Dict[str, Any]:
+        return self._func(row)
+
+    def map(self, rows) -> list:
+        func = self._func
+        return [func(row) for row in rows]
+
+
+def _plain_source(field) -> Optional[str]:
+    if not isinstance(field, PLAIN_FIELDS) or "." in field.source or field.source == "*":
+        return None
+    return field.source
+
+
+def _getter(indexes: List[int]) -> Callable[[Sequence[Any]], Tuple[Any, ...]]:
+    """itemgetter 只取一個索引時回傳單值，這裡一律回傳 tuple。"""
+    if len(indexes) == 1:
+        (index,) = indexes
+        return lambda row: (row[index],)
+    return itemgetter(*indexes)
+
+
+def _nested(names: Tuple[str, ...], indexes: List[int], present: int) -> Callable[[Sequence[Any]], Any]:
+    get = _getter(indexes)
+
+    def build(row):
+        # 關聯為 NULL 時整個巢狀物件輸出 None（與 serializer 相同）
+        return dict(zip(names, get(row))) if row[present] is not None else None
+
+    return build
+
+
+def compile_row_mapper(serializer_class, fields: Optional[Sequence[str]] = None) -> Optional[RowMapper]:
+    """fields 給定時只輸出這些最外層欄位（見 config/fields.py 的 ?fields=）。"""
+    columns: List[str] = []
+
+    def column(name: str) -> int:
+        if name not in columns:
+            columns.append(name)
+        return columns.index(name)
+
+    names: List[str] = []
+    # 每個輸出欄位的取值方式：欄位索引（int），或巢狀物件的建構函式
+    parts: List[Any] = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only or (fields is not None and name not in fields):
+            continue
+        if isinstance(field, serializers.ModelSerializer) and not getattr(field, "many", False):
+            if "." in field.source:
+                return None
+            sub_names, indexes = [], []
+            for sub_name, sub_field in field.fields.items():
+                if sub_field.write_only:
+                    continue
+                source = _plain_source(sub_field)
+                if source is None:
+                    return None
+                sub_names.append(sub_name)
+                indexes.append(column(f"{field.source}__{source}"))
+            present = column(f"{field.source}__{field.Meta.model._meta.pk.name}")
+            names.append(name)
+            parts.append(_nested(tuple(sub_names), indexes, present))
+            continue
+        source = _plain_source(field)
+        if source is None:
+            return None
+        names.append(name)
+        parts.append(column(source))
+
+    keys = tuple(names)
+    if not keys:
+        return RowMapper(tuple(columns), lambda row: {})
+    plain = [part for part in parts if isinstance(part, int)]
+    if len(plain) == len(parts):
+        get = _getter(plain)
+        return RowMapper(tuple(columns), lambda row: dict(zip(keys, get(row))))
+
+    getters = tuple(itemgetter(part) if isinstance(part, int) else part for part in parts)
+
+    def mapper(row):
+        return {key: get(row) for key, get in zip(keys, getters)}
+
+    return RowMapper(tuple(columns), mapper)
@@ -4,6 +4,7 @@ import os
 from datetime import timedelta
 from dotenv import load_dotenv
 import dj_database_url
+from corsheaders.defaults import default_headers as default_cors_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
@@ -17,6 +18,13 @@ ALLOWED_HOSTS = [h for h in os.getenv("ALLOWED_HOSTS", "*").split(",") if h]
 LOAN_DAYS_DEFAULT = int(os.getenv("LOAN_DAYS_DEFAULT", 14)) # 預設借期 14 天
 LOAN_MAX_RENEWALS = int(os.getenv("LOAN_MAX_RENEWALS", 1)) # 每筆最多續借 1 次
 LOAN_RENEW_DAYS = int(os.getenv("LOAN_RENEW_DAYS", 14)) # 每次續借延長 14 天
+BOOK_SEARCH_ENGINE = os.getenv("BOOK_SEARCH_ENGINE", "database") # database | memory
+BOOK_SEARCH_MAX_HITS = int(os.getenv("BOOK_SEARCH_MAX_HITS", 1000)) # memory 引擎最多回傳的命中數
+BOOK_SUGGEST_MAX_KEYS = int(os.getenv("BOOK_SUGGEST_MAX_KEYS", 500000)) # 自動完成索引的 key 數上限
+BOOK_FUZZY_THRESHOLD = float(os.getenv("BOOK_FUZZY_THRESHOLD", 0.6)) # ?fuzzy=1 的相似度門檻（非 PostgreSQL）
+BOOK_FACETS_CACHE_SECONDS = int(os.getenv("BOOK_FACETS_CACHE_SECONDS", 300)) # ?facets= 計數的快取秒數
+BOOK_AVAILABILITY_CACHE_SECONDS = int(os.getenv("BOOK_AVAILABILITY_CACHE_SECONDS", 30)) # /api/books/availability/ 每本書的快取秒數（借還書與預約即失效；0 = 停用）
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 2000)) # 匯出（export_catalog、/api/export/）伺服器端游標每次取回的列數
 # CSRF / CORS（前後端分離：預設允許 Vite/localhost:5173）
 # 若上線請改成你的網域
 CSRF_TRUSTED_ORIGINS = [
@@ -94,6 +102,27 @@ DATABASES = {
     "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600),
 }
 
+# ---------------------------------------------------------------------------
+# Cache（locmem:// 預設；file:///路徑 或 redis://host:6379/1 可跨行程共用）
+# ---------------------------------------------------------------------------
+CACHE_URL = os.getenv("CACHE_URL", "locmem://")
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    _cache_backend = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}
+elif CACHE_URL.startswith("file://"):
+    _cache_backend = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_URL[len("file://"):],
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000))},
+    }
+else:
+    _cache_backend = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "library",
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 10000))},
+    }
+CACHES = {"default": {**_cache_backend, "KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "library")}}
+BOOK_RESPONSE_CACHE_SECONDS = int(os.getenv("BOOK_RESPONSE_CACHE_SECONDS", 3600)) # 書目回應快取的保存上限（0 = 停用）
+
 # 自訂使用者模型（建議 users/models.py 定義 User）
 AUTH_USER_MODEL = "users.User"
 
@@ -121,9 +150,20 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    # JSON 編解碼改用 orjson（未安裝時與 DRF 預設相同），見 config/renderers.py
+    "DEFAULT_RENDERER_CLASSES": [
+        "config.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "config.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_PAGINATION_CLASS": "config.pagination.CursorOptInPagination",
     "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", 20)),
 }
+API_EXACT_COUNT_THRESHOLD = int(os.getenv("API_EXACT_COUNT_THRESHOLD", 10000)) # 超過此筆數改用估計 count（PostgreSQL）；0 = 一律精確
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(
@@ -140,6 +180,9 @@ SIMPLE_JWT = {
 
 # CORS 設定（視需求更改）
 CORS_ALLOW_CREDENTIALS = True
+# 條件式 GET：前端需讀得到 ETag、送得出 If-None-Match
+CORS_EXPOSE_HEADERS = ["ETag"]
+CORS_ALLOW_HEADERS = [*default_cors_headers, "if-none-match"]
 CORS_ALLOWED_ORIGINS = [
     *(o for o in os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:5173").split(",") if o),
 ]
@@ -3,7 +3,13 @@ Test settings.
 
 Overrides the default database configuration so pytest runs against a local
 SQLite file instead of requiring the Postgres service defined in .env.
+Set TEST_DATABASE_URL (e.g. postgresql://postgres@localhost/library) to run the
+suite, including the Postgres-only COPY import tests, against a real Postgres.
 """
+import os
+
+import dj_database_url
+
 from .settings import *  # noqa: F401,F403
 
 TEST_DB_PATH = BASE_DIR / "test_db.sqlite3"  # type: ignore[name-defined]
@@ -14,6 +20,8 @@ DATABASES = {
         "NAME": str(TEST_DB_PATH),
     },
 }
+if os.getenv("TEST_DATABASE_URL"):
+    DATABASES["default"] = dj_database_url.parse(os.environ["TEST_DATABASE_URL"])
 
 # Use a faster password hasher during tests.
 PASSWORD_HASHERS = [
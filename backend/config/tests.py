@@ -0,0 +1,106 @@
+import datetime
+import decimal
+import io
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from config import renderers
+from config.renderers import FastJSONParser, FastJSONRenderer
+
+
+def _payloads():
+    aware = datetime.datetime(2025, 3, 1, 8, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+    taipei = datetime.timezone(datetime.timedelta(hours=8))
+    return [
+        {"id": 1, "title": "三體", "author": "劉慈欣", "available": True, "category": None},
+        [{"emoji": "📚", "quote": 'say "hi"\n\t\\', "sep": "a\u2028b\u2029c"}],
+        {
+            "created_at": aware,
+            "whole_second": aware.replace(microsecond=0),
+            "local": aware.astimezone(taipei),
+            "naive": datetime.datetime(2025, 3, 1, 8, 30),
+            "date": datetime.date(2025, 3, 1),
+            "time": datetime.time(9, 15, 30, 500),
+            "duration": datetime.timedelta(days=1, seconds=3.5),
+        },
+        {"price": decimal.Decimal("12.50"), "label": gettext_lazy("Active"), "uuid": uuid.UUID(int=42)},
+        {1: "int key", None: "none key", 2.5: "float key"},
+        {"tuple": (1, 2), "nested": {"deep": [[], {}, [None, False]]}, "float": 0.1, "neg": -3},
+        {"big": 2**70, "items": [2**63 - 1, -(2**63)]},
+        ReturnDict({"id": 3, "results": ReturnList([{"id": 1}], serializer=None)}, serializer=None),
+        "plain string",
+        [],
+    ]
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_output_matches_default_renderer_byte_for_byte(self):
+        for data in _payloads():
+            with self.subTest(data=data):
+                self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indent_and_none_follow_default_renderer(self):
+        data = {"id": 1, "items": [1, 2]}
+        for media_type in ("application/json; indent=4", "application/json; indent=0"):
+            self.assertEqual(
+                FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type)
+            )
+        self.assertEqual(
+            FastJSONRenderer().render(data, "text/html", {"indent": 4}),
+            JSONRenderer().render(data, "text/html", {"indent": 4}),
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_unencodable_values_raise_like_default_renderer(self):
+        with self.assertRaises(TypeError):
+            JSONRenderer().render({"value": object()})
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({"value": object()})
+
+    def test_small_floats_decode_to_same_values(self):
+        data = {"score": 1e-05, "tiny": 5e-324, "huge": 1e22}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None):
+            for data in _payloads():
+                self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+            self.assertEqual(FastJSONParser().parse(io.BytesIO(b'{"a": [1]}')), {"a": [1]})
+
+
+class FastJSONParserTests(SimpleTestCase):
+    def parse(self, parser, raw: bytes):
+        return parser.parse(io.BytesIO(raw), "application/json", {"encoding": "utf-8"})
+
+    def test_parses_like_default_parser(self):
+        for raw in (
+            '{"title": "三體", "ids": [1, 2], "ok": true, "none": null}'.encode(),
+            b'[1.5, -2, "\\u2028"]',
+            b'{"big": 1180591620717411303424}',
+            b'{"dup": 1, "dup": 2}',
+        ):
+            with self.subTest(raw=raw):
+                self.assertEqual(self.parse(FastJSONParser(), raw), self.parse(JSONParser(), raw))
+
+    def test_rejects_invalid_input_like_default_parser(self):
+        for raw in (b"{bad json", b'{"x": NaN}', b'{"x": Infinity}', b"\xff\xfe"):
+            with self.subTest(raw=raw):
+                with self.assertRaises(ParseError) as expected:
+                    self.parse(JSONParser(), raw)
+                with self.assertRaises(ParseError) as actual:
+                    self.parse(FastJSONParser(), raw)
+                self.assertEqual(str(actual.exception.detail), str(expected.exception.detail))
+
+    def test_api_responses_use_fast_renderer(self):
+        from rest_framework.settings import api_settings
+
+        self.assertIs(api_settings.DEFAULT_RENDERER_CLASSES[0], FastJSONRenderer)
+        self.assertIs(api_settings.DEFAULT_PARSER_CLASSES[0], FastJSONParser)
@@ -0,0 +1,41 @@
+# config/tokenizer.py
+"""CJK 友善的斷詞（不依賴 Django），books 的全文檢索與 chat 的 BM25 檢索共用。
+
+CJK 連續字切成 bigram（單字保留單字），Latin 單字／數字整段保留，
+含 - _ . / 的編號（例如 LIB-2024-07）同時保留整段與各段。
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import List
+
+TERM_MAX_LEN = 64
+
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_RUN_RE = re.compile(rf"[{_CJK}]+|[0-9a-zß-öø-ɏ]+(?:[-_./][0-9a-zß-öø-ɏ]+)*")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+_SEP_RE = re.compile(r"[-_./]")
+
+
+def tokenize(text: str, *, edges: bool = False) -> List[str]:
+    """CJK bigram + Latin 單字斷詞（NFKC 正規化、轉小寫）。
+
+    edges=True 時每段 CJK 另外輸出結尾單字，讓前綴比對也能找到落在段尾的單字。
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    out: List[str] = []
+    for m in _RUN_RE.finditer(text):
+        run = m.group()
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                out.append(run)
+            else:
+                out.extend(run[i:i + 2] for i in range(len(run) - 1))
+                if edges:
+                    out.append(run[-1])
+        else:
+            out.append(run[:TERM_MAX_LEN])
+            if _SEP_RE.search(run):
+                out.extend(p[:TERM_MAX_LEN] for p in _SEP_RE.split(run) if p)
+    return out
@@ -10,6 +10,14 @@ os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{default
 _ERROR_LOG_PATH = Path(__file__).resolve().parent / "error.log"
 
 
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    """快取（書目回應、facets、索引版本）不隨測試交易回滾，每個測試前清空。"""
+    from django.core.cache import cache
+
+    cache.clear()
+
+
 @pytest.hookimpl(tryfirst=True)
 def pytest_sessionstart(session):
     """Reset backend/error.log at the beginning of every pytest session."""
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 
 from books.serializers import BookSerializer
+from config.fields import FieldsetSerializerMixin
 from .models import Favorite
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     book = BookSerializer(read_only=True)
 
     class Meta:
@@ -71,3 +71,34 @@ def test_delete_favorite_is_idempotent(auth_client, user, book):
 
     resp = auth_client.delete(url)
     assert resp.status_code == 204
+
+
+def test_list_favorites_supports_conditional_get(auth_client, user, book):
+    url = reverse("favorite-list")
+    etag = auth_client.get(url)["ETag"]
+
+    assert auth_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    Favorite.objects.create(user=user, book=book)
+    resp = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+
+
+def test_list_favorites_supports_sparse_fieldsets(auth_client, user, book, django_assert_num_queries):
+    Favorite.objects.create(user=user, book=book)
+    url = reverse("favorite-list")
+
+    # ETag 的聚合查詢 + 列表本身；不要 book 時列表查詢不 join 書籍與分類
+    with django_assert_num_queries(2) as ctx:
+        data = auth_client.get(url, {"fields": "id,created_at"}).json()
+    assert set(data[0]) == {"id", "created_at"}
+    list_sql = ctx.captured_queries[-1]["sql"]
+    assert "books_book" not in list_sql
+    assert '"user_id"' not in list_sql.split("FROM")[0]
+
+    with django_assert_num_queries(2) as ctx:
+        data = auth_client.get(url, {"exclude": "created_at"}).json()
+    assert set(data[0]) == {"id", "book"}
+    assert data[0]["book"]["title"] == "Test Book"
+    assert "books_category" in ctx.captured_queries[-1]["sql"]
@@ -1,17 +1,26 @@
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from books.cache import catalog_version
 from books.models import Book
+from config.etag import ConditionalGetMixin
+from config.fields import SparseFieldsetMixin
 from .models import Favorite
 from .serializers import FavoriteSerializer
 
 
-class FavoriteListView(generics.ListAPIView):
+class FavoriteListView(SparseFieldsetMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = FavoriteSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_etag_validator(self, request):
+        # 收藏只會新增／刪除；內嵌的書籍資料隨 catalog version 變動
+        agg = Favorite.objects.filter(user=request.user).aggregate(n=Count("id"), last=Max("id"))
+        return f"{catalog_version()}:{agg['n']}:{agg['last']}"
+
     def get_queryset(self):
         return (
             Favorite.objects.filter(user=self.request.user)
@@ -21,7 +30,7 @@ class FavoriteListView(generics.ListAPIView):
 
     def list(self, request, *args, **kwargs):
         """Override to disable pagination and return plain list."""
-        queryset = self.get_queryset()
+        queryset = self.sparse_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)  # 👈 不再使用 paginator
 
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_books_book_title_eba785_idx'),
+        ('loans', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['type', 'created_at', 'id'], name='loans_loan_type_19dcf7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['user', 'type', 'created_at', 'id'], name='loans_loan_user_id_9185ff_idx'),
+        ),
+    ]
@@ -44,6 +44,9 @@ class Loan(models.Model):
             models.Index(fields=["status", "type"]),
             models.Index(fields=["user", "status"]),
             models.Index(fields=["book", "status"]),
+            # 借閱／預約列表（-created_at, -id）與 keyset 分頁
+            models.Index(fields=["type", "created_at", "id"]),
+            models.Index(fields=["user", "type", "created_at", "id"]),
         ]
         constraints = [
             models.UniqueConstraint(
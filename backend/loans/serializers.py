@@ -1,9 +1,11 @@
 from rest_framework import serializers
+
+from config.fields import FieldsetSerializerMixin
 from .models import Loan
 from . import services
 from books.models import Book
 
-class LoanListSerializer(serializers.ModelSerializer):
+class LoanListSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     book_title = serializers.CharField(source="book.title", read_only=True)
 
 
@@ -1,11 +1,13 @@
 from dataclasses import dataclass
 from django.db import transaction
-from django.db.models import F
 from django.utils import timezone
 from django.conf import settings
 
 from .models import Loan
+from books.availability import invalidate_availability_on_commit
+from books.cache import bump_catalog_version_on_commit
 from books.models import Book
+from books.services import adjust_stock
 from notifications.services import create_notification
 
 
@@ -30,25 +32,21 @@ class LoanResult:
 @transaction.atomic
 def loan_book(*, user, book: Book, now=None) -> LoanResult:
     now = now or timezone.now()
-    b = Book.objects.select_for_update().get(pk=book.pk)
-    if b.available_copies <= 0:
-        raise NotEnoughCopies("No copies available")
-
+    # 先建立借閱再扣庫存：書的列鎖只從扣庫存那條 UPDATE 持有到提交，
+    # 沒有可借複本時整個交易回滾，借閱紀錄一併消失
     loan = Loan.objects.create(
         user=user,
-        book=b,
+        book=book,
         type=Loan.Type.LOAN,
         status=Loan.Status.ACTIVE,
         loaned_at=now,
         due_at=now + timezone.timedelta(days=getattr(settings, "LOAN_DAYS_DEFAULT", 14)),
     )
-
-    Book.objects.filter(pk=b.pk).update(available_copies=F("available_copies") - 1)
-    b.refresh_from_db(fields=["available_copies"])
-
-    new_status = "unavailable" if b.available_copies == 0 else "available"
-    if b.status != new_status:
-        Book.objects.filter(pk=b.pk).update(status=new_status)
+    stock = adjust_stock(book.pk, -1)
+    if stock is None:
+        raise NotEnoughCopies("No copies available")
+    book.available_copies, book.status, _ = stock
+    bump_catalog_version_on_commit()  # 庫存變動不經 Book.save，需自行讓書目快取失效
 
     return LoanResult(loan=loan, created=True)
 
@@ -71,43 +69,42 @@ def return_loan(*, loan: Loan, now=None) -> Loan:
     if loan.type != Loan.Type.LOAN or loan.status != Loan.Status.ACTIVE:
         raise InvalidState("Only active loan can be returned")
 
-    b = Book.objects.select_for_update().get(pk=loan.book_id)
-
-    loan.status = Loan.Status.RETURNED
-    loan.returned_at = now
-    loan.save(update_fields=["status", "returned_at", "updated_at"])
-
-    # +1 可用數量
-    Book.objects.filter(pk=b.pk).update(available_copies=F("available_copies") + 1)
-    b.refresh_from_db(fields=["available_copies"])
+    # 條件式轉換：同一筆借閱同時被歸還兩次時只有一次成功（沒有書的列鎖可依賴）
+    returned = Loan.objects.filter(pk=loan.pk, type=Loan.Type.LOAN, status=Loan.Status.ACTIVE).update(
+        status=Loan.Status.RETURNED, returned_at=now, updated_at=now
+    )
+    if not returned:
+        raise InvalidState("Only active loan can be returned")
+    loan.status, loan.returned_at, loan.updated_at = Loan.Status.RETURNED, now, now
+    invalidate_availability_on_commit(loan.book_id)  # update() 不觸發 Loan 的 post_save
 
-    # 嘗試自動轉出預約
+    # 嘗試自動轉出預約：還回的複本直接借給下一位，庫存不變，不必寫 books_book
     next_res = (
-        Loan.objects.select_for_update(skip_locked=True)
-        .filter(book_id=b.pk, type=Loan.Type.RESERVATION, status=Loan.Status.PENDING)
+        Loan.objects.select_for_update(skip_locked=True, of=("self",))  # 只鎖預約列，不鎖 join 進來的書
+        .select_related("user", "book")
+        .filter(book_id=loan.book_id, type=Loan.Type.RESERVATION, status=Loan.Status.PENDING)
         .order_by("created_at")
         .first()
     )
-    if next_res:
-        next_res.type = Loan.Type.LOAN
-        next_res.status = Loan.Status.ACTIVE
-        next_res.loaned_at = now
-        next_res.due_at = now + timezone.timedelta(days=getattr(settings, "LOAN_DAYS_DEFAULT", 14))
-        next_res.save(update_fields=["type", "status", "loaned_at", "due_at", "updated_at"])
-        Book.objects.filter(pk=b.pk).update(available_copies=F("available_copies") - 1)
-        b.refresh_from_db(fields=["available_copies"])
-
-        # 通知預約者可借書
-        create_notification(
-            user=next_res.user,
-            notif_type="reservation_available",
-            message=f"您預約的《{b.title}》已可借閱。",
-            loan=next_res,
-        )
-
-    new_status = "unavailable" if b.available_copies == 0 else "available"
-    if b.status != new_status:
-        Book.objects.filter(pk=b.pk).update(status=new_status)
+    if next_res is None:
+        # +1 可用數量
+        adjust_stock(loan.book_id, 1)
+        bump_catalog_version_on_commit()
+        return loan
+
+    next_res.type = Loan.Type.LOAN
+    next_res.status = Loan.Status.ACTIVE
+    next_res.loaned_at = now
+    next_res.due_at = now + timezone.timedelta(days=getattr(settings, "LOAN_DAYS_DEFAULT", 14))
+    next_res.save(update_fields=["type", "status", "loaned_at", "due_at", "updated_at"])
+
+    # 通知預約者可借書
+    create_notification(
+        user=next_res.user,
+        notif_type="reservation_available",
+        message=f"您預約的《{next_res.book.title}》已可借閱。",
+        loan=next_res,
+    )
 
     return loan
 
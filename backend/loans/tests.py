@@ -2,7 +2,9 @@ from itertools import count
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from books.models import Book, Category
@@ -118,6 +120,41 @@ class LoanServiceTests(TestCase):
         with self.assertRaises(services.InvalidState):
             services.return_loan(loan=invalid_loan, now=timezone.now())
 
+    def test_loan_book_updates_stock_in_one_statement_without_lock(self):
+        book = self.make_book(total_copies=2, available_copies=2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            services.loan_book(user=self.user, book=book, now=timezone.now())
+
+        sql = [query["sql"] for query in ctx.captured_queries]
+        self.assertFalse([q for q in sql if "FOR UPDATE" in q])
+        self.assertEqual(len([q for q in sql if q.lstrip().startswith("UPDATE") and "books_book" in q]), 1)
+        self.assertEqual((book.available_copies, book.status), (1, "available"))
+
+    def test_loan_book_without_copies_rolls_back_loan(self):
+        book = self.make_book(total_copies=1, available_copies=1)
+        services.loan_book(user=self.user, book=book, now=timezone.now())
+        other = get_user_model().objects.create_user(email="other@example.com", password="TestPass123!")
+
+        with self.assertRaises(services.NotEnoughCopies):
+            services.loan_book(user=other, book=book, now=timezone.now())
+
+        self.assertFalse(Loan.objects.filter(user=other).exists())
+        book.refresh_from_db()
+        self.assertEqual((book.available_copies, book.status), (0, "unavailable"))
+
+    def test_return_loan_twice_releases_one_copy(self):
+        book = self.make_book(total_copies=2, available_copies=2)
+        loan = services.loan_book(user=self.user, book=book, now=timezone.now()).loan
+        stale = Loan.objects.get(pk=loan.pk)
+
+        services.return_loan(loan=loan, now=timezone.now())
+        with self.assertRaises(services.InvalidState):
+            services.return_loan(loan=stale, now=timezone.now())
+
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 2)
+
     def test_renew_loan_extends_due_date_until_limit(self):
         book = self.make_book()
         loaned_at = timezone.now()
@@ -3,6 +3,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
+from config.fields import SparseFieldsetMixin
+
 from .models import Loan
 from .serializers import (
     LoanListSerializer,
@@ -15,7 +17,8 @@ from .permissions import IsOwnerOrAdmin
 from . import services
 
 
-class LoanViewSet(mixins.CreateModelMixin,
+class LoanViewSet(SparseFieldsetMixin,
+                  mixins.CreateModelMixin,
                   mixins.ListModelMixin,
                   viewsets.GenericViewSet):
     queryset = Loan.objects.all().select_related("book")
@@ -33,7 +36,7 @@ class LoanViewSet(mixins.CreateModelMixin,
         status_q = self.request.query_params.get("status")
         if status_q:
             qs = qs.filter(status=status_q)
-        return qs.order_by("-created_at")
+        return qs.order_by("-created_at", "-id")
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsOwnerOrAdmin])
     def return_(self, request, pk=None):
@@ -48,7 +51,8 @@ class LoanViewSet(mixins.CreateModelMixin,
         return Response(LoanActionSerializer(loan).data)
 
 
-class ReservationViewSet(mixins.CreateModelMixin,
+class ReservationViewSet(SparseFieldsetMixin,
+                         mixins.CreateModelMixin,
                          mixins.ListModelMixin,
                          viewsets.GenericViewSet):
     queryset = Loan.objects.all().select_related("book")
@@ -66,7 +70,7 @@ class ReservationViewSet(mixins.CreateModelMixin,
         status_q = self.request.query_params.get("status")
         if status_q:
             qs = qs.filter(status=status_q)
-        return qs.order_by("-created_at")
+        return qs.order_by("-created_at", "-id")
 
 
 class AdminLoanViewSet(mixins.RetrieveModelMixin,
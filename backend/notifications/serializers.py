@@ -1,8 +1,10 @@
 from rest_framework import serializers
+
+from config.fields import FieldsetSerializerMixin
 from .models import Notification
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = [
@@ -192,6 +192,28 @@ class NotificationAPIViewTests(APITestCase):
         self.assertEqual(len(read_response.data), 1)
         self.assertEqual(read_response.data[0]["message"], "Already read notification.")
 
+    def test_list_answers_if_none_match_with_304_until_notifications_change(self):
+        notification = Notification.objects.create(
+            user=self.user,
+            type="loan_due_soon",
+            message="Cached notification.",
+        )
+        url = reverse("api-notification-list")
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.user)
+        services.mark_as_read(notification_id=notification.id, user=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
     def test_read_endpoint_marks_notification(self):
         notification = Notification.objects.create(
             user=self.user,
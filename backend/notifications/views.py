@@ -1,13 +1,17 @@
+from django.db.models import Count, Max, Q
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from config.etag import ConditionalGetMixin
+from config.fields import SparseFieldsetMixin
+
 from .models import Notification
 from .serializers import NotificationSerializer
 from .services import mark_as_read, mark_all_as_read
 
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(SparseFieldsetMixin, ConditionalGetMixin, generics.ListAPIView):
     """列出目前登入者的通知；支援 ?is_read=true/false 篩選"""
 
     serializer_class = NotificationSerializer
@@ -24,6 +28,13 @@ class NotificationListView(generics.ListAPIView):
                 qs = qs.filter(is_read=False)
         return qs
 
+    def get_etag_validator(self, request):
+        # 通知只會新增、刪除或標為已讀，三個計數即可判斷內容是否變動
+        agg = self.get_queryset().aggregate(
+            n=Count("id"), last=Max("id"), read=Count("id", filter=Q(is_read=True))
+        )
+        return f"{agg['n']}:{agg['last']}:{agg['read']}"
+
 
 class NotificationReadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -13,6 +13,21 @@ export async function listBooks(params?: ListBooksParams) {
   return data
 }
 
+export type BookSuggestion = {
+  text: string
+  type: 'title' | 'author' | 'category'
+  count: number
+}
+
+// 自動完成：後端以行程內前綴索引回應，不做 COUNT 與分頁
+export async function suggestBooks(q: string, limit = 8, signal?: AbortSignal) {
+  const { data } = await http.get<BookSuggestion[]>(`/api/books/suggest/`, {
+    params: { q, limit },
+    signal,
+  })
+  return data
+}
+
 export async function getBook(id: number) {
   const { data } = await http.get<Book>(`/api/books/${id}/`)
   return data
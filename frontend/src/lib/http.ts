@@ -21,6 +21,42 @@ http.interceptors.request.use((config) => {
   return config
 })
 
+// ---- 條件式 GET：記住 ETag，下次帶 If-None-Match，304 時沿用上次的資料 ----
+const ETAG_CACHE_LIMIT = 200
+const etagCache = new Map<string, { etag: string; data: unknown }>()
+
+// 不以使用者區分：後端的 ETag 已含使用者，換帳號後舊 ETag 不會相符，只會拿到 200
+function etagKey(config: InternalAxiosRequestConfig) {
+  return http.getUri(config)
+}
+
+http.interceptors.request.use((config) => {
+  if ((config.method ?? 'get').toLowerCase() !== 'get') return config
+  const cached = etagCache.get(etagKey(config))
+  if (cached) {
+    ;(config.headers as any)['If-None-Match'] = cached.etag
+    config.validateStatus = (status) => (status >= 200 && status < 300) || status === 304
+  }
+  return config
+})
+
+http.interceptors.response.use((res) => {
+  if ((res.config.method ?? 'get').toLowerCase() !== 'get') return res
+  const key = etagKey(res.config)
+  if (res.status === 304) {
+    const cached = etagCache.get(key)
+    if (cached) return { ...res, status: 200, data: cached.data }
+    return res
+  }
+  const etag = res.headers?.etag as string | undefined
+  if (etag) {
+    etagCache.delete(key)
+    etagCache.set(key, { etag, data: res.data })
+    if (etagCache.size > ETAG_CACHE_LIMIT) etagCache.delete(etagCache.keys().next().value as string)
+  }
+  return res
+})
+
 // ---- Refresh Token 機制 ----
 let isRefreshing = false
 let queue: Array<(token: string | null) => void> = []
@@ -3,6 +3,8 @@
 /** 後端的標準分頁回應格式 */
 export type Paginated<T> = {
   count: number
+  /** count 超過門檻時為資料庫估計值 */
+  count_is_approximate?: boolean
   next?: string | null
   previous?: string | null
   results: T[]